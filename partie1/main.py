@@ -139,8 +139,11 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
 import json
+import math
 import os
 
+from cles_api import FICHIER_CLES, RegistreCles
+
 
 class Personnage(BaseModel):
     id: int
@@ -175,6 +178,11 @@ app.add_middleware(
 # Token de sécurité valide
 TOKEN_VALIDE = "mon_super_token_secret"
 
+# Registre des clés d'API (empreintes et limites par clé) ; tant qu'aucun
+# registre n'existe, seul TOKEN_VALIDE est accepté, limité comme une clé
+# (DEBIT_CLE_DEFAUT / RAFALE_CLE_DEFAUT, 0 pour ne pas le limiter)
+registre_cles = RegistreCles(FICHIER_CLES, cle_par_defaut=TOKEN_VALIDE)
+
 def charger_personnages():
     try:
         if not os.path.exists("personnages.json"):
@@ -189,12 +197,20 @@ def charger_personnages():
 
 # Fonction pour vérifier le token
 async def verifier_token(token: Optional[str] = Header(None)):
-    if token is None or token != TOKEN_VALIDE:
+    client = registre_cles.client(token) if token is not None else None
+    if client is None:
         raise HTTPException(
             status_code=401,
             detail="Token d'accès invalide ou manquant",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    attente = client.consommer()
+    if attente:
+        raise HTTPException(
+            status_code=429,
+            detail="Trop de requêtes pour cette clé d'API",
+            headers={"Retry-After": str(math.ceil(attente))},
+        )
     return token
     
 @app.get("/personnages", response_model=List[Personnage], tags=["Personnages"])
@@ -0,0 +1,221 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
+
+journal = logging.getLogger(__name__)
+
+# Les fichiers d'un artefact servi sont « touchés » au plus toutes les
+# INTERVALLE_RAFRAICHISSEMENT secondes ; le nettoyage ne supprime que les
+# fichiers non touchés depuis AGE_MINIMAL secondes (par aucun worker)
+INTERVALLE_RAFRAICHISSEMENT = 60.0
+AGE_MINIMAL = 300.0
+
+class Artefact:
+    """
+    Corps JSON d'une réponse rendu une seule fois pour une version du store,
+    avec ses variantes compressées.
+    """
+
+    def __init__(self, version: int, corps: bytes, repertoire: str, nom: str, seuil_fichier: int):
+        self.version = version
+        empreinte = hashlib.blake2b(corps, digest_size=12).hexdigest()
+        self.etags = {"identity": f'"{empreinte}"', "gzip": f'"{empreinte}-gzip"'}
+
+        variantes = {"identity": corps, "gzip": gzip.compress(corps, compresslevel=6, mtime=0)}
+
+        # Les gros corps sont servis depuis un fichier (sendfile / pathsend quand
+        # le serveur le permet), les petits directement depuis la mémoire
+        self.contenus: Dict[str, Optional[bytes]] = {}
+        self.fichiers: Dict[str, str] = {}
+        for encodage, contenu in variantes.items():
+            if len(contenu) >= seuil_fichier:
+                suffixe = ".json.gz" if encodage == "gzip" else ".json"
+                chemin = os.path.join(repertoire, f"{nom}.{empreinte}{suffixe}")
+                if not os.path.exists(chemin):
+                    temporaire = f"{chemin}.{os.getpid()}.tmp"
+                    with open(temporaire, "wb") as f:
+                        f.write(contenu)
+                    os.replace(temporaire, chemin)
+                self.fichiers[encodage] = chemin
+                self.contenus[encodage] = None
+            else:
+                self.contenus[encodage] = contenu
+        self._touche = time.time()
+
+    def rafraichir(self) -> bool:
+        """
+        Remet à jour la date de modification des fichiers de l'artefact, pour
+        que le nettoyage (de ce worker ou d'un autre) les garde tant qu'ils
+        sont servis.
+
+        Returns:
+            False si un fichier a disparu (l'artefact doit être refait)
+        """
+        maintenant = time.time()
+        if not self.fichiers or maintenant - self._touche < INTERVALLE_RAFRAICHISSEMENT:
+            return True
+        try:
+            for chemin in self.fichiers.values():
+                os.utime(chemin)
+        except OSError:
+            return False
+        self._touche = maintenant
+        return True
+
+
+class ArtefactsReponse:
+    """
+    Garde l'artefact de la version courante d'une réponse non filtrée.
+    Le rendu est fait une fois par version, puis servi tel quel à toutes les
+    lectures suivantes. Depuis la boucle d'événements, le rendu (encodage,
+    compression, écriture du fichier) est fait dans un thread, une seule fois
+    pour toutes les requêtes concurrentes ; preparer le lance dès l'écriture,
+    sans attendre la première lecture.
+    """
+
+    def __init__(self, nom: str, repertoire: str = ".artefacts", seuil_fichier: int = 64 * 1024):
+        self.nom = nom
+        self.repertoire = repertoire
+        self.seuil_fichier = seuil_fichier
+        self._courant: Optional[Artefact] = None
+        self._precedent: Optional[Artefact] = None  # peut encore être en cours d'envoi
+        self._verrou = threading.Lock()
+        self._tache: Optional[Tuple[int, asyncio.Future]] = None
+
+    def obtenir(self, version: int, rendre: Callable[[], bytes]) -> Artefact:
+        """
+        Renvoie l'artefact de la version demandée, en le rendant si besoin.
+
+        Args:
+            version: Version courante du store
+            rendre: Fonction produisant le corps JSON canonique
+        """
+        artefact = self._courant
+        if _valide(artefact, version):
+            return artefact
+
+        with self._verrou:
+            artefact = self._courant
+            if not _valide(artefact, version):
+                os.makedirs(self.repertoire, exist_ok=True)
+                nouveau = Artefact(version, rendre(), self.repertoire, self.nom, self.seuil_fichier)
+                if artefact is not None and artefact.version != version:
+                    self._precedent = artefact
+                artefact = self._courant = nouveau
+                self._nettoyer()
+            return artefact
+
+    def _lancer(self, version: int, rendre: Callable[[], bytes]) -> asyncio.Future:
+        if self._tache is None or self._tache[0] != version:
+            tache = asyncio.ensure_future(run_in_threadpool(self.obtenir, version, rendre))
+            tache.add_done_callback(self._terminer)
+            self._tache = (version, tache)
+        return self._tache[1]
+
+    def _terminer(self, tache: asyncio.Future) -> None:
+        if self._tache is not None and self._tache[1] is tache:
+            self._tache = None
+        if not tache.cancelled() and tache.exception() is not None:
+            journal.error("Erreur lors du rendu de l'artefact %s: %s", self.nom, tache.exception())
+
+    async def obtenir_async(self, version: int, rendre: Callable[[], bytes]) -> Artefact:
+        """
+        Comme obtenir, mais un rendu nécessaire est fait dans un thread, sans
+        bloquer la boucle d'événements.
+        """
+        artefact = self._courant
+        if _valide(artefact, version):
+            return artefact
+        return await asyncio.shield(self._lancer(version, rendre))
+
+    def preparer(self, version: int, rendre: Callable[[], bytes]) -> None:
+        """
+        Lance le rendu d'une nouvelle version en tâche de fond (depuis la
+        boucle d'événements), par exemple juste après une écriture.
+        """
+        if not _valide(self._courant, version):
+            self._lancer(version, rendre)
+
+    def _nettoyer(self) -> None:
+        """
+        Supprime les fichiers des versions antérieures à la précédente. Un
+        FileResponse n'ouvre son fichier qu'à l'envoi : les fichiers de la
+        version courante et de la précédente sont toujours gardés, et ceux
+        d'un autre worker tant qu'il les rafraîchit (AGE_MINIMAL).
+        """
+        limite = time.time() - AGE_MINIMAL
+        garder = set()
+        for artefact in (self._courant, self._precedent):
+            if artefact is not None:
+                garder.update(artefact.fichiers.values())
+        for fichier in os.listdir(self.repertoire):
+            chemin = os.path.join(self.repertoire, fichier)
+            if not fichier.startswith(f"{self.nom}.") or chemin in garder:
+                continue
+            try:
+                if os.path.getmtime(chemin) < limite:
+                    os.remove(chemin)
+            except OSError:
+                pass
+
+
+# Fonction pour vérifier qu'un artefact correspond à la version et que ses fichiers existent
+def _valide(artefact: Optional[Artefact], version: int) -> bool:
+    return artefact is not None and artefact.version == version and artefact.rafraichir()
+
+
+# Fonction pour choisir l'encodage à partir de l'en-tête Accept-Encoding
+def choisir_encodage(accept_encoding: Optional[str]) -> str:
+    if not accept_encoding:
+        return "identity"
+
+    qualites = {}
+    for element in accept_encoding.split(","):
+        morceaux = element.strip().split(";")
+        codage = morceaux[0].strip().lower()
+        qualite = 1.0
+        for parametre in morceaux[1:]:
+            cle, _, valeur = parametre.strip().partition("=")
+            if cle.strip() == "q":
+                try:
+                    qualite = float(valeur)
+                except ValueError:
+                    qualite = 0.0
+        if codage:
+            qualites[codage] = qualite
+
+    qualite_gzip = qualites.get("gzip", qualites.get("x-gzip", qualites.get("*", 0.0)))
+    if qualite_gzip > 0 and qualite_gzip >= qualites.get("identity", 0.001):
+        return "gzip"
+    return "identity"
+
+
+# Fonction pour construire la réponse HTTP d'un artefact
+def reponse_artefact(request: Request, artefact: Artefact) -> Response:
+    """
+    Sert les octets pré-rendus avec le bon Content-Encoding, ou 304 si le
+    client possède déjà cette version.
+    """
+    encodage = choisir_encodage(request.headers.get("accept-encoding"))
+    entetes = {"ETag": artefact.etags[encodage], "Vary": "Accept-Encoding"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and entetes["ETag"] in [etag.strip() for etag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=entetes)
+
+    if encodage != "identity":
+        entetes["Content-Encoding"] = encodage
+
+    contenu = artefact.contenus[encodage]
+    if contenu is None:
+        return FileResponse(artefact.fichiers[encodage], media_type="application/json", headers=entetes)
+    return Response(content=contenu, media_type="application/json", headers=entetes)
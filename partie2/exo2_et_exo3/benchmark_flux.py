@@ -0,0 +1,108 @@
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Any, AsyncIterator, Callable, Dict, List, Tuple
+
+from flux import TAILLE_LOT_FLUX, reponse_flux
+from serialisation import encoder_json
+from store_scores import StoreScores
+
+TAILLES = [100_000, 1_000_000]
+
+VILLES = ["Dallas", "Trenton", "Ponchatoula", "Piscataway", "Austin", "Denver"]
+ETATS = ["TX", "NJ", "LA", "CO", "CA", "NY"]
+AVIS = ["excellent", "bon", "moyen", "faible"]
+
+
+# Fonction pour générer des scores déjà validés
+def generer_scores(nombre: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "name": f"Organisation {i}",
+            "city": random.choice(VILLES),
+            "state": random.choice(ETATS),
+            "avis": random.choice(AVIS),
+            "score": random.randint(1, 100),
+            "category": f"E{random.randint(10, 99)}",
+        }
+        for i in range(nombre)
+    ]
+
+
+async def complet(store: StoreScores) -> AsyncIterator[bytes]:
+    """
+    Réponse habituelle : toute la liste filtrée est encodée avant l'envoi.
+    """
+    yield store.requete({"state": None}, tri="score")
+
+
+def en_flux(store: StoreScores, mode: str) -> AsyncIterator[bytes]:
+    scores, positions = store.positions_requete({"state": None}, tri="score")
+    reponse = reponse_flux(
+        mode,
+        positions,
+        lambda p: encoder_json(scores[p]),
+        lambda lot: encoder_json([scores[p] for p in lot]),
+    )
+    return reponse.body_iterator
+
+
+async def consommer(generer: Callable[[], AsyncIterator[bytes]]) -> Tuple[float, float, int]:
+    """
+    Consomme la réponse comme le ferait le serveur ; renvoie le temps jusqu'au
+    premier morceau, le temps total et le nombre d'octets envoyés.
+    """
+    debut = time.perf_counter()
+    premier = None
+    octets = 0
+    async for morceau in generer():
+        if premier is None:
+            premier = time.perf_counter() - debut
+        octets += len(morceau)  # le morceau est ensuite libéré, comme après l'envoi
+    return premier, time.perf_counter() - debut, octets
+
+
+def mesurer(store: StoreScores, generer: Callable[[], AsyncIterator[bytes]]) -> Tuple[float, float, int, int]:
+    """
+    Temps mesurés sans tracemalloc (qui ralentit les allocations), puis pic
+    de mémoire allouée pendant une seconde exécution.
+    """
+    store._cache.version = None  # pas de résultat en cache
+    premier, total, octets = asyncio.run(consommer(generer))
+    store._cache.version = None
+    tracemalloc.start()
+    asyncio.run(consommer(generer))
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return premier, total, pic, octets
+
+
+def main_benchmark():
+    random.seed(0)
+    for taille in TAILLES:
+        with tempfile.TemporaryDirectory() as dossier:
+            fichier = os.path.join(dossier, "scores.json")
+            with open(fichier, "w", encoding="utf-8") as f:
+                json.dump(generer_scores(taille), f)
+            store = StoreScores(fichier)
+            store.scores()  # chargement et index hors mesure
+
+            print(f"=== GET /scores?tri=score : {taille:,} scores, lots de {TAILLE_LOT_FLUX} ===")
+            for nom, generer in [
+                ("Complet      ", lambda: complet(store)),
+                ("Flux JSON    ", lambda: en_flux(store, "json")),
+                ("Flux NDJSON  ", lambda: en_flux(store, "ndjson")),
+            ]:
+                premier, total, pic, octets = mesurer(store, generer)
+                print(
+                    f"  {nom}: premier octet {premier * 1000:8.1f} ms, total {total * 1000:8.1f} ms, "
+                    f"pic mémoire {pic / 1e6:7.1f} Mo, {octets / 1e6:.1f} Mo envoyés"
+                )
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,98 @@
+import asyncio
+import random
+import time
+from typing import Any, Callable, Dict, List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from pydantic import TypeAdapter
+
+import serialisation
+from main import Personnage, Score
+
+TAILLES = [10_000, 100_000]
+REPETITIONS = 3
+
+VILLES = ["Dallas", "Trenton", "Ponchatoula", "Piscataway", "Austin", "Denver"]
+ETATS = ["TX", "NJ", "LA", "CO", "CA", "NY"]
+AVIS = ["excellent", "bon", "moyen", "faible"]
+
+
+# Fonction pour générer des scores déjà validés
+def generer_scores(nombre: int) -> List[Dict[str, Any]]:
+    return [
+        Score(
+            name=f"Organisation {i}",
+            city=random.choice(VILLES),
+            state=random.choice(ETATS),
+            avis=random.choice(AVIS),
+            score=random.randint(1, 100),
+            category=f"E{random.randint(10, 99)}",
+        ).model_dump()
+        for i in range(nombre)
+    ]
+
+
+# Fonction pour générer des personnages déjà validés
+def generer_personnages(nombre: int) -> List[Dict[str, Any]]:
+    return [
+        Personnage(
+            id=i,
+            nom=f"Personnage {i}",
+            profession=random.choice(["Sorcière", "Rôdeur du Nord", "Hobbit", "Jedi"]),
+            age=random.randint(10, 900),
+            pouvoir="Guérison",
+        ).model_dump()
+        for i in range(nombre)
+    ]
+
+
+def mesurer(fonction: Callable[[], bytes]) -> float:
+    """
+    Renvoie le meilleur temps (en secondes) sur plusieurs exécutions.
+    """
+    meilleur = float("inf")
+    for _ in range(REPETITIONS):
+        debut = time.perf_counter()
+        fonction()
+        meilleur = min(meilleur, time.perf_counter() - debut)
+    return meilleur
+
+
+def comparer(nom: str, modele, lignes: List[Dict[str, Any]]) -> None:
+    champ = create_model_field("reponse", List[modele], mode="serialization")
+    adaptateur = TypeAdapter(List[modele])
+    instances = adaptateur.validate_python(lignes)
+
+    # Chemin actuel : validation via response_model puis JSONResponse
+    def chemin_fastapi() -> bytes:
+        contenu = asyncio.run(serialize_response(field=champ, response_content=lignes))
+        return JSONResponse(contenu).body
+
+    chemins = {
+        "FastAPI response_model + JSONResponse": chemin_fastapi,
+        "TypeAdapter.dump_json (instances)": lambda: adaptateur.dump_json(instances),
+        "pydantic_core.to_json (dicts)": lambda: serialisation.pydantic_core.to_json(lignes),
+    }
+    if serialisation.orjson is not None:
+        chemins["orjson.dumps (dicts)"] = lambda: serialisation.orjson.dumps(lignes)
+
+    print(f"\n=== {nom} : {len(lignes)} lignes ===")
+    reference = None
+    for libelle, fonction in chemins.items():
+        duree = mesurer(fonction)
+        if reference is None:
+            reference = duree
+        print(f"  {libelle:<40} {duree * 1000:9.1f} ms  x{reference / duree:5.1f}")
+
+
+def main():
+    print(f"orjson disponible: {'oui' if serialisation.orjson is not None else 'non'}")
+    for taille in TAILLES:
+        comparer("Scores", Score, generer_scores(taille))
+        comparer("Personnages", Personnage, generer_personnages(taille))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,622 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from itertools import groupby
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from rechargement import RechargementUnique
+from serialisation import encoder_json
+
+journal = logging.getLogger(__name__)
+
+# Format binaire d'une génération de catalogue :
+#   en-tête fixe  : MAGIC (4 octets) + taille de la méta JSON (u32)
+#   méta JSON     : génération, nombre de lignes, index, emplacement des sections
+#   sections      : alignées sur 8 octets
+#     - "corps"   : tableau JSON complet "[ligne0,ligne1,...]"
+#     - "bornes"  : début/fin (u64) de chaque ligne dans le corps
+#     - index entier (clé, âge...) : valeurs triées (i64) + positions (u32) -> bisect
+#     - index texte (profession...) : valeurs distinctes (JSON) + plages (u64)
+#       dans un tableau de positions (u32) regroupées par valeur -> table de hachage
+#     - index trigrammes (nom...) : même disposition que l'index texte, une
+#       entrée par trigramme du champ, plus le nombre de trigrammes (u16) par ligne
+MAGIC = b"CAT2"
+ENTETE = struct.Struct("<4sI")
+ALIGNEMENT = 8
+
+
+def _aligner(taille: int) -> int:
+    return (taille + ALIGNEMENT - 1) // ALIGNEMENT * ALIGNEMENT
+
+
+def normaliser_texte(valeur: Any) -> str:
+    """
+    Forme utilisée comme clé des index texte (insensible à la casse).
+    """
+    return str(valeur).casefold()
+
+
+def trigrammes(valeur: Any) -> List[str]:
+    """
+    Trigrammes distincts d'un texte (casse et accents ignorés), chaque mot
+    étant entouré d'espaces comme dans pg_trgm : "chat" -> "  c", " ch",
+    "cha", "hat", "at ".
+    """
+    texte = unicodedata.normalize("NFKD", str(valeur).casefold())
+    texte = "".join(c if c.isalnum() else " " for c in texte if not unicodedata.combining(c))
+    resultat = set()
+    for mot in texte.split():
+        mot = f"  {mot} "
+        for i in range(len(mot) - 2):
+            resultat.add(mot[i:i + 3])
+    return sorted(resultat)
+
+
+def _paires_index(lignes: List[Dict[str, Any]], champ: str, normaliser, positions) -> List[Tuple[Any, int]]:
+    paires = []
+    for position in positions:
+        valeur = lignes[position].get(champ)
+        if valeur is not None:
+            paires.append((normaliser(valeur), position))
+    paires.sort()
+    return paires
+
+
+def _paires_incrementales(precedent, champ, lignes, nouvelles, normaliser) -> List[Tuple[Any, int]]:
+    """
+    Reprend l'index de la génération précédente tel quel (ses lignes sont
+    inchangées et aux mêmes positions) et y insère par bisect les entrées des
+    lignes ajoutées depuis, au lieu de tout retrier.
+    """
+    paires = list(precedent.paires_index(champ))
+    for paire in _paires_index(lignes, champ, normaliser, nouvelles):
+        insort(paires, paire, key=itemgetter(0))
+    return paires
+
+
+def _sections_groupees(prefixe: str, groupes: Iterable[Tuple[Any, Iterable[int]]]) -> Dict[str, bytes]:
+    """
+    Écrit des positions regroupées par valeur : valeurs distinctes, plages et positions.
+    """
+    valeurs, plages, positions = [], array("Q"), array("I")
+    for valeur, groupe in groupes:
+        valeurs.append(valeur)
+        plages.append(len(positions))
+        positions.extend(groupe)
+        plages.append(len(positions))
+    return {
+        f"{prefixe}:valeurs": json.dumps(valeurs, ensure_ascii=False).encode("utf-8"),
+        f"{prefixe}:plages": plages.tobytes(),
+        f"{prefixe}:positions": positions.tobytes(),
+    }
+
+
+def _groupes_trigrammes(lignes, champ, positions, precedent=None) -> Tuple[Dict[str, array], array]:
+    """
+    Index de trigrammes : positions de chaque trigramme (croissantes, puisque
+    les lignes sont parcourues dans l'ordre) et nombre de trigrammes par ligne.
+    Les lignes ajoutées complètent les listes de la génération précédente.
+    """
+    groupes: Dict[str, array] = {}
+    nombres = array("H")
+    if precedent is not None:
+        numeros, plages, tableau = precedent._trigrammes[champ]
+        for valeur, i in numeros.items():
+            groupes[valeur] = array("I", tableau[plages[2 * i]:plages[2 * i + 1]])
+        nombres.frombytes(precedent._nombres_trigrammes[champ].tobytes())
+
+    for position in positions:
+        valeur = lignes[position].get(champ)
+        termes = trigrammes(valeur) if valeur is not None else []
+        for terme in termes:
+            liste = groupes.get(terme)
+            if liste is None:
+                liste = groupes[terme] = array("I")
+            liste.append(position)
+        nombres.append(min(len(termes), 0xFFFF))
+    return groupes, nombres
+
+
+# Fonction pour sérialiser une génération de catalogue
+def serialiser_catalogue(
+    lignes: List[Dict[str, Any]],
+    cle: str,
+    generation: int,
+    index_entiers: Sequence[str] = (),
+    index_textes: Sequence[str] = (),
+    index_trigrammes: Sequence[str] = (),
+    precedent: Optional["Catalogue"] = None,
+) -> bytes:
+    """
+    Sérialise des lignes déjà validées en une génération immuable du catalogue.
+
+    Args:
+        lignes: Lignes validées (dictionnaires)
+        cle: Nom du champ entier servant d'identifiant
+        generation: Numéro de génération
+        index_entiers: Champs entiers indexés pour les recherches par intervalle
+        index_textes: Champs texte indexés pour les recherches par égalité
+        index_trigrammes: Champs texte indexés pour la recherche approchée
+        precedent: Génération précédente, dont les index sont réutilisés
+            quand les lignes ont seulement été ajoutées
+
+    Returns:
+        Le contenu binaire de la génération
+    """
+    index_entiers = [cle] + [champ for champ in index_entiers if champ != cle]
+    if precedent is not None and (
+        precedent.index_entiers != index_entiers
+        or precedent.index_textes != list(index_textes)
+        or precedent.index_trigrammes != list(index_trigrammes)
+    ):
+        precedent = None
+
+    # Corps JSON complet, en notant les bornes de chaque ligne
+    morceaux = [b"["]
+    bornes = []
+    position = 1
+    for i, ligne in enumerate(lignes):
+        if i:
+            morceaux.append(b",")
+            position += 1
+        encodee = encoder_json(ligne)
+        morceaux.append(encodee)
+        bornes.append(position)
+        bornes.append(position + len(encodee))
+        position += len(encodee)
+    morceaux.append(b"]")
+    corps = b"".join(morceaux)
+
+    sections = {
+        "corps": corps,
+        "bornes": array("Q", bornes).tobytes(),
+    }
+
+    # Cas courant d'un rechargement : le fichier a seulement grandi. Si le corps
+    # précédent est un préfixe du nouveau (comparaison d'octets), les index
+    # précédents restent valables et on n'y insère que les lignes ajoutées.
+    nouvelles = range(len(lignes))
+    if precedent is not None and 0 < len(precedent) <= len(lignes):
+        ancien = precedent.corps()
+        fin = len(ancien) - 1
+        if corps[fin:fin + 1] in (b",", b"]") and memoryview(corps)[:fin] == ancien[:fin]:
+            nouvelles = range(len(precedent), len(lignes))
+    incremental = len(nouvelles) < len(lignes) and len(nouvelles) * 8 <= len(lignes)
+
+    def paires(champ, normaliser):
+        if not incremental:
+            return _paires_index(lignes, champ, normaliser, range(len(lignes)))
+        return _paires_incrementales(precedent, champ, lignes, nouvelles, normaliser)
+
+    for champ in index_entiers:
+        paires_champ = paires(champ, int)
+        sections[f"entier:{champ}:valeurs"] = array("q", (v for v, _ in paires_champ)).tobytes()
+        sections[f"entier:{champ}:positions"] = array("I", (p for _, p in paires_champ)).tobytes()
+
+    for champ in index_textes:
+        groupes = (
+            (valeur, sorted(position for _, position in groupe))
+            for valeur, groupe in groupby(paires(champ, normaliser_texte), key=itemgetter(0))
+        )
+        sections.update(_sections_groupees(f"texte:{champ}", groupes))
+
+    for champ in index_trigrammes:
+        if incremental:
+            groupes, nombres = _groupes_trigrammes(lignes, champ, nouvelles, precedent)
+        else:
+            groupes, nombres = _groupes_trigrammes(lignes, champ, range(len(lignes)))
+        sections.update(_sections_groupees(f"trigramme:{champ}", sorted(groupes.items())))
+        sections[f"trigramme:{champ}:nombres"] = nombres.tobytes()
+
+    # Calcul des emplacements (relatifs au début des sections)
+    emplacements = {}
+    decalage = 0
+    for nom, contenu in sections.items():
+        emplacements[nom] = [decalage, len(contenu)]
+        decalage = _aligner(decalage + len(contenu))
+
+    meta = json.dumps({
+        "generation": generation,
+        "nb_lignes": len(lignes),
+        "cle": cle,
+        "index_entiers": index_entiers,
+        "index_textes": list(index_textes),
+        "index_trigrammes": list(index_trigrammes),
+        "sections": emplacements,
+    }).encode("utf-8")
+    debut_sections = _aligner(ENTETE.size + len(meta))
+
+    tampon = bytearray(debut_sections + decalage)
+    ENTETE.pack_into(tampon, 0, MAGIC, len(meta))
+    tampon[ENTETE.size:ENTETE.size + len(meta)] = meta
+    for nom, contenu in sections.items():
+        debut = debut_sections + emplacements[nom][0]
+        tampon[debut:debut + len(contenu)] = contenu
+    return bytes(tampon)
+
+
+class Catalogue:
+    """
+    Génération immuable d'un catalogue, lue sans copie depuis un tampon
+    (bytes en mémoire ou fichier projeté avec mmap).
+    """
+
+    def __init__(self, tampon, fichier: Optional[str] = None):
+        self._tampon = tampon
+        self.fichier = fichier
+        vue = memoryview(tampon)
+        magic, taille_meta = ENTETE.unpack_from(vue, 0)
+        if magic != MAGIC:
+            raise ValueError("Format de catalogue inconnu")
+        meta = json.loads(bytes(vue[ENTETE.size:ENTETE.size + taille_meta]))
+        debut_sections = _aligner(ENTETE.size + taille_meta)
+
+        self.generation = meta["generation"]
+        self.nb_lignes = meta["nb_lignes"]
+        self.cle = meta["cle"]
+        self.index_entiers = meta["index_entiers"]
+        self.index_textes = meta["index_textes"]
+        self.index_trigrammes = meta.get("index_trigrammes", [])
+        self._sections = {
+            nom: vue[debut_sections + debut:debut_sections + debut + taille]
+            for nom, (debut, taille) in meta["sections"].items()
+        }
+        self._bornes = self._sections["bornes"].cast("Q")
+
+        self._entiers = {
+            champ: (
+                self._sections[f"entier:{champ}:valeurs"].cast("q"),
+                self._sections[f"entier:{champ}:positions"].cast("I"),
+            )
+            for champ in self.index_entiers
+        }
+
+        # Seule la table valeur -> numéro est construite par worker (O(valeurs distinctes))
+        self._textes = {champ: self._groupes(f"texte:{champ}") for champ in self.index_textes}
+        self._trigrammes = {champ: self._groupes(f"trigramme:{champ}") for champ in self.index_trigrammes}
+        self._nombres_trigrammes = {
+            champ: self._sections[f"trigramme:{champ}:nombres"].cast("H") for champ in self.index_trigrammes
+        }
+
+    def _groupes(self, prefixe: str):
+        valeurs = json.loads(bytes(self._sections[f"{prefixe}:valeurs"]))
+        return (
+            {valeur: i for i, valeur in enumerate(valeurs)},
+            self._sections[f"{prefixe}:plages"].cast("Q"),
+            self._sections[f"{prefixe}:positions"].cast("I"),
+        )
+
+    def __len__(self) -> int:
+        return self.nb_lignes
+
+    def corps(self) -> memoryview:
+        """
+        Renvoie le tableau JSON complet, sans copie.
+        """
+        return self._sections["corps"]
+
+    def ligne_brute(self, position: int) -> memoryview:
+        """
+        Renvoie le JSON d'une ligne, sans copie.
+        """
+        return self._sections["corps"][self._bornes[2 * position]:self._bornes[2 * position + 1]]
+
+    def ligne(self, position: int) -> Dict[str, Any]:
+        return json.loads(bytes(self.ligne_brute(position)))
+
+    def lignes(self) -> List[Dict[str, Any]]:
+        if not self.nb_lignes:
+            return []
+        return json.loads(bytes(self.corps()))
+
+    def corps_partiel(self, positions: Iterable[int]) -> bytes:
+        """
+        Assemble le tableau JSON d'un sous-ensemble de lignes à partir de leurs
+        octets déjà encodés (ni décodage ni ré-encodage).
+        """
+        return b"[" + b",".join([self.ligne_brute(p) for p in positions]) + b"]"
+
+    def position(self, valeur: int) -> Optional[int]:
+        """
+        Recherche la position d'une ligne par sa clé (bisect sur les clés triées).
+        """
+        valeurs, positions = self._entiers[self.cle]
+        i = bisect_left(valeurs, valeur)
+        if i < len(valeurs) and valeurs[i] == valeur:
+            return positions[i]
+        return None
+
+    def positions_intervalle(self, champ: str, minimum: Optional[int] = None, maximum: Optional[int] = None) -> Sequence[int]:
+        """
+        Positions des lignes dont le champ est dans [minimum, maximum], triées par valeur.
+        """
+        valeurs, positions = self._entiers[champ]
+        debut = 0 if minimum is None else bisect_left(valeurs, minimum)
+        fin = len(valeurs) if maximum is None else bisect_right(valeurs, maximum)
+        return positions[debut:max(debut, fin)]
+
+    def positions_egales(self, champ: str, valeur: Any) -> Sequence[int]:
+        """
+        Positions des lignes dont le champ vaut la valeur (sans tenir compte de la casse).
+        """
+        return self._plage(self._textes[champ], normaliser_texte(valeur))
+
+    def positions_trigramme(self, champ: str, trigramme: str) -> Sequence[int]:
+        """
+        Positions (croissantes) des lignes dont le champ contient le trigramme.
+        """
+        return self._plage(self._trigrammes[champ], trigramme)
+
+    def nombre_trigrammes(self, champ: str, position: int) -> int:
+        return self._nombres_trigrammes[champ][position]
+
+    @staticmethod
+    def _plage(groupes, valeur: Any) -> Sequence[int]:
+        numeros, plages, positions = groupes
+        i = numeros.get(valeur)
+        if i is None:
+            return ()
+        return positions[plages[2 * i]:plages[2 * i + 1]]
+
+    def paires_index(self, champ: str) -> Iterator[Tuple[Any, int]]:
+        """
+        Parcourt un index dans l'ordre : couples (valeur, position).
+        """
+        if champ in self._entiers:
+            valeurs, positions = self._entiers[champ]
+            yield from zip(valeurs, positions)
+            return
+        numeros, plages, positions = self._textes[champ]
+        for valeur, i in numeros.items():
+            for position in positions[plages[2 * i]:plages[2 * i + 1]]:
+                yield valeur, position
+
+    def obtenir(self, valeur: int) -> Optional[Dict[str, Any]]:
+        position = self.position(valeur)
+        if position is None:
+            return None
+        return self.ligne(position)
+
+
+# Fonction pour projeter une génération depuis un fichier (lecture seule, partagée)
+def attacher_catalogue(fichier: str) -> Catalogue:
+    with open(fichier, "rb") as f:
+        projection = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return Catalogue(projection, fichier)
+
+
+class GestionnaireCatalogue:
+    """
+    Fournit la génération courante d'un catalogue construit depuis un fichier JSON.
+
+    En mode partagé, un seul processus construit chaque génération dans un
+    fichier projeté en mémoire (mmap) ; les autres workers s'y attachent sans
+    copie. Le fichier pointeur "<nom>.courant" indique la génération à utiliser :
+    chaque worker le consulte et bascule dès qu'il change.
+
+    Les vérifications et reconstructions concurrentes sont regroupées : une
+    seule à la fois, les autres appelants attendent son résultat ou reçoivent
+    la génération précédente (voir RechargementUnique).
+    """
+
+    def __init__(
+        self,
+        source: str,
+        nom: str,
+        cle: str = "id",
+        valider: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+        index_entiers: Sequence[str] = (),
+        index_textes: Sequence[str] = (),
+        index_trigrammes: Sequence[str] = (),
+        partage: bool = False,
+        repertoire: str = ".catalogues",
+        intervalle: float = 0.5,
+    ):
+        self.source = source
+        self.nom = nom
+        self.cle = cle
+        self.valider = valider
+        self.index_entiers = index_entiers
+        self.index_textes = index_textes
+        self.index_trigrammes = index_trigrammes
+        self.partage = partage
+        self.repertoire = repertoire
+        self.intervalle = intervalle  # Délai minimal entre deux vérifications du fichier source
+
+        self._courant: Optional[Catalogue] = None
+        self._signature_source = None
+        self._derniere_verification = 0.0
+        self._rechargement = RechargementUnique()
+
+    @property
+    def _pointeur(self) -> str:
+        return os.path.join(self.repertoire, f"{self.nom}.courant")
+
+    @property
+    def _verrou(self) -> str:
+        return os.path.join(self.repertoire, f"{self.nom}.verrou")
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.source)
+        except OSError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size]
+
+    # Fonction pour lire et valider le fichier source
+    def _lire_source(self) -> List[Dict[str, Any]]:
+        try:
+            if not os.path.exists(self.source):
+                return []
+
+            with open(self.source, "r", encoding="utf-8") as f:
+                lignes = json.load(f)
+
+        except Exception as e:
+            journal.error("Erreur lors du chargement de %s: %s", self.source, e)
+            return []
+
+        if self.valider is None:
+            return lignes
+
+        valides = []
+        for ligne in lignes:
+            try:
+                valides.append(self.valider(ligne))
+            except Exception as e:
+                journal.warning("Ligne ignorée dans %s: %s", self.source, e)
+        return valides
+
+    def _serialiser(self, lignes: List[Dict[str, Any]], generation: int) -> bytes:
+        return serialiser_catalogue(
+            lignes,
+            self.cle,
+            generation,
+            index_entiers=self.index_entiers,
+            index_textes=self.index_textes,
+            index_trigrammes=self.index_trigrammes,
+            precedent=self._courant,
+        )
+
+    def _verifie(self) -> bool:
+        return self._courant is not None and time.monotonic() - self._derniere_verification < self.intervalle
+
+    def _actualiser(self) -> None:
+        if self.partage:
+            self._actualiser_partage()
+        else:
+            self._actualiser_memoire()
+        self._derniere_verification = time.monotonic()
+
+    def courant(self) -> Catalogue:
+        """
+        Renvoie la génération courante, en la reconstruisant (ou en basculant
+        vers une génération plus récente) si le fichier source a changé.
+        """
+        if not self._verifie():
+            self._rechargement.executer(self._actualiser, self._verifie, self._courant is not None)
+        return self._courant
+
+    async def courant_async(self) -> Catalogue:
+        """
+        Comme courant, mais la vérification et l'éventuelle reconstruction
+        sont faites dans un thread, sans bloquer la boucle d'événements.
+        """
+        if not self._verifie():
+            await self._rechargement.executer_async(self._actualiser, self._verifie, self._courant is not None)
+        return self._courant
+
+    # Mode par défaut : chaque worker garde sa propre copie en mémoire
+    def _actualiser_memoire(self) -> None:
+        signature = self._signature()
+        if self._courant is not None and signature == self._signature_source:
+            return
+        generation = self._courant.generation + 1 if self._courant is not None else 1
+        lignes = self._lire_source()
+        self._courant = Catalogue(self._serialiser(lignes, generation))
+        self._signature_source = signature
+
+    # Mode partagé : génération construite une fois, projetée par tous les workers
+    def _lire_pointeur(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._pointeur, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _actualiser_partage(self) -> None:
+        pointeur = self._lire_pointeur()
+        signature = self._signature()
+
+        if pointeur is None or pointeur.get("source") != signature:
+            if self._construire_generation(pointeur, signature):
+                pointeur = self._lire_pointeur()
+            elif pointeur is None and self._courant is None:
+                # Un autre worker construit la première génération : on l'attend
+                pointeur = self._attendre_pointeur()
+
+        if pointeur is None:
+            # Aucune génération partagée disponible : repli sur une copie locale
+            if self._courant is None:
+                self._actualiser_memoire()
+            return
+
+        if self._courant is None or self._courant.generation != pointeur["generation"]:
+            try:
+                self._courant = attacher_catalogue(os.path.join(self.repertoire, pointeur["fichier"]))
+            except (OSError, ValueError) as e:
+                journal.error("Impossible d'attacher le catalogue %s: %s", self.nom, e, extra={"generation": pointeur["generation"]})
+                if self._courant is None:
+                    self._actualiser_memoire()
+
+    def _attendre_pointeur(self, delai: float = 10.0) -> Optional[Dict[str, Any]]:
+        limite = time.monotonic() + delai
+        while time.monotonic() < limite:
+            time.sleep(0.05)
+            pointeur = self._lire_pointeur()
+            if pointeur is not None:
+                return pointeur
+        return None
+
+    def _construire_generation(self, pointeur: Optional[Dict[str, Any]], signature) -> bool:
+        """
+        Construit une nouvelle génération si ce processus obtient le verrou.
+
+        Returns:
+            True si la génération a été construite par ce processus
+        """
+        os.makedirs(self.repertoire, exist_ok=True)
+        try:
+            descripteur = os.open(self._verrou, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # Verrou abandonné par un processus arrêté en cours de construction
+            try:
+                if time.time() - os.path.getmtime(self._verrou) > 60:
+                    os.remove(self._verrou)
+            except OSError:
+                pass
+            return False
+
+        try:
+            os.close(descripteur)
+            generation = pointeur["generation"] + 1 if pointeur else 1
+            fichier = f"{self.nom}.{generation}.cat"
+            chemin = os.path.join(self.repertoire, fichier)
+
+            contenu = self._serialiser(self._lire_source(), generation)
+            with open(chemin + ".tmp", "wb") as f:
+                f.write(contenu)
+            os.replace(chemin + ".tmp", chemin)
+
+            with open(self._pointeur + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"generation": generation, "fichier": fichier, "source": signature}, f)
+            os.replace(self._pointeur + ".tmp", self._pointeur)
+
+            self._nettoyer(generation)
+            return True
+        finally:
+            try:
+                os.remove(self._verrou)
+            except OSError:
+                pass
+
+    def _nettoyer(self, generation: int) -> None:
+        """
+        Supprime les générations antérieures à la précédente (les workers
+        qui n'ont pas encore basculé gardent la précédente).
+        """
+        for fichier in os.listdir(self.repertoire):
+            morceaux = fichier.split(".")
+            if len(morceaux) == 3 and morceaux[0] == self.nom and morceaux[2] == "cat":
+                try:
+                    if int(morceaux[1]) < generation - 1:
+                        os.remove(os.path.join(self.repertoire, fichier))
+                except (ValueError, OSError):
+                    pass
@@ -0,0 +1,194 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import secrets
+import time
+from typing import Any, Dict, Optional
+
+journal = logging.getLogger(__name__)
+
+# Fichier du registre des clés d'API (seules les empreintes y sont stockées)
+FICHIER_CLES = os.environ.get("FICHIER_CLES", "cles_api.json")
+
+# Limite par défaut de chaque clé : requêtes par seconde et rafale maximale
+# (un débit de 0 désactive la limite)
+DEBIT_DEFAUT = 20.0
+RAFALE_DEFAUT = 40
+
+# Limite de la clé par défaut (token d'origine, accepté tant qu'aucun registre
+# n'existe) : elle est limitée comme les autres clés, ce qui borne aussi les
+# clients existants ; DEBIT_CLE_DEFAUT=0 rétablit l'accès sans limite
+DEBIT_CLE_DEFAUT = float(os.environ.get("DEBIT_CLE_DEFAUT", str(DEBIT_DEFAUT)))
+RAFALE_CLE_DEFAUT = int(os.environ.get("RAFALE_CLE_DEFAUT", str(RAFALE_DEFAUT)))
+
+# Intervalle minimal entre deux vérifications de modification du fichier (secondes)
+INTERVALLE_RECHARGEMENT = 5.0
+
+
+# Fonction pour calculer l'empreinte stockée d'une clé d'API
+def hacher_cle(cle: str) -> str:
+    """
+    Les clés sont générées aléatoirement (forte entropie) : un SHA-256 sans
+    sel suffit et permet de retrouver le client en une recherche de dict.
+    """
+    return hashlib.sha256(cle.encode("utf-8")).hexdigest()
+
+
+class ClientApi:
+    """
+    Client du registre, avec son seau à jetons : le seau se remplit de
+    debit jetons par seconde jusqu'à rafale, chaque requête en consomme un.
+    Les clés admin ont en plus accès aux endpoints d'administration.
+    """
+
+    __slots__ = ("nom", "debit", "rafale", "admin", "jetons", "dernier")
+
+    def __init__(self, nom: str, debit: float = DEBIT_DEFAUT, rafale: int = RAFALE_DEFAUT, admin: bool = False):
+        self.nom = nom
+        self.debit = debit
+        self.rafale = rafale
+        self.admin = admin
+        self.jetons = float(rafale)
+        self.dernier = time.monotonic()
+
+    def consommer(self) -> float:
+        """
+        Consomme un jeton si possible.
+
+        Returns:
+            0 si la requête est acceptée, sinon le nombre de secondes avant
+            qu'un jeton soit disponible
+        """
+        if self.debit <= 0:
+            return 0.0
+        maintenant = time.monotonic()
+        self.jetons = min(self.rafale, self.jetons + (maintenant - self.dernier) * self.debit)
+        self.dernier = maintenant
+        if self.jetons >= 1:
+            self.jetons -= 1
+            return 0.0
+        return (1 - self.jetons) / self.debit
+
+
+class RegistreCles:
+    """
+    Clés d'API autorisées, chargées depuis un fichier JSON :
+    {"cles": [{"nom": ..., "empreinte": sha256, "debit": ..., "rafale": ..., "admin": ...}]}
+
+    La recherche d'un client se fait par l'empreinte de la clé présentée
+    (dict, O(1)). Le fichier est relu s'il a été modifié, au plus une fois
+    par INTERVALLE_RECHARGEMENT ; l'état des seaux des clés conservées est
+    gardé. Une entrée invalide est ignorée (et journalisée) sans empêcher
+    le chargement des autres. Sans fichier, seule la clé par défaut est
+    acceptée (avec les droits admin, comme l'unique token d'origine, et la
+    limite DEBIT_CLE_DEFAUT / RAFALE_CLE_DEFAUT).
+
+    Les seaux sont propres à chaque processus : avec plusieurs workers, la
+    limite effective est multipliée par le nombre de workers.
+    """
+
+    def __init__(self, fichier: Optional[str] = FICHIER_CLES, cle_par_defaut: Optional[str] = None):
+        self.fichier = fichier
+        self.cle_par_defaut = cle_par_defaut
+        self._clients: Dict[str, ClientApi] = {}
+        self._signature = None
+        self._prochaine_verification = 0.0
+        self._charger()
+
+    def _signature_fichier(self):
+        try:
+            stat = os.stat(self.fichier)
+        except (OSError, TypeError):
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _charger(self) -> None:
+        self._signature = self._signature_fichier()
+        entrees = []
+        if self._signature is not None:
+            try:
+                with open(self.fichier, "r", encoding="utf-8") as f:
+                    entrees = json.load(f).get("cles", [])
+            except Exception as e:
+                journal.error("Erreur lors du chargement des clés d'API: %s", e)
+                return  # registre précédent conservé
+
+        if not isinstance(entrees, list):
+            journal.error("Registre des clés d'API invalide: \"cles\" doit être une liste", extra={"fichier": self.fichier})
+            return  # registre précédent conservé
+
+        clients = {}
+        if self.cle_par_defaut is not None and not entrees:
+            clients[hacher_cle(self.cle_par_defaut)] = ClientApi(
+                "defaut", debit=DEBIT_CLE_DEFAUT, rafale=RAFALE_CLE_DEFAUT, admin=True
+            )
+        for position, entree in enumerate(entrees):
+            try:
+                empreinte, nom = entree["empreinte"], entree["nom"]
+                if not isinstance(empreinte, str) or not isinstance(nom, str):
+                    raise ValueError("empreinte et nom doivent être des chaînes")
+                debit = float(entree.get("debit", DEBIT_DEFAUT))
+                rafale = int(entree.get("rafale", RAFALE_DEFAUT))
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                journal.warning("Clé d'API ignorée (entrée %d invalide): %r", position, e, extra={"fichier": self.fichier})
+                continue
+            client = self._clients.get(empreinte)
+            if client is None or client.nom != nom:
+                client = ClientApi(nom)
+            client.debit = debit
+            client.rafale = rafale
+            client.admin = bool(entree.get("admin", False))
+            client.jetons = min(client.jetons, client.rafale)
+            clients[empreinte] = client
+        self._clients = clients
+
+    def client(self, cle: str) -> Optional[ClientApi]:
+        """
+        Renvoie le client correspondant à une clé présentée, ou None.
+        """
+        maintenant = time.monotonic()
+        if maintenant >= self._prochaine_verification:
+            self._prochaine_verification = maintenant + INTERVALLE_RECHARGEMENT
+            if self._signature_fichier() != self._signature:
+                self._charger()
+        return self._clients.get(hacher_cle(cle))
+
+    def statistiques(self) -> Dict[str, Any]:
+        return {
+            "cles": len(self._clients),
+            "clients": [
+                {"nom": client.nom, "debit": client.debit, "rafale": client.rafale, "admin": client.admin, "jetons": round(client.jetons, 2)}
+                for client in self._clients.values()
+            ],
+        }
+
+
+# Fonction pour ajouter une clé au registre (la clé n'est affichée qu'une fois)
+def ajouter_cle(fichier: str, nom: str, debit: float = DEBIT_DEFAUT, rafale: int = RAFALE_DEFAUT, admin: bool = False) -> str:
+    registre = {"cles": []}
+    if os.path.exists(fichier):
+        with open(fichier, "r", encoding="utf-8") as f:
+            registre = json.load(f)
+
+    cle = secrets.token_urlsafe(32)
+    registre["cles"].append({"nom": nom, "empreinte": hacher_cle(cle), "debit": debit, "rafale": rafale, "admin": admin})
+    with open(fichier + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(registre, f, indent=2, ensure_ascii=False)
+    os.replace(fichier + ".tmp", fichier)
+    return cle
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ajoute une clé d'API au registre")
+    parser.add_argument("nom", help="Nom du client")
+    parser.add_argument("--debit", type=float, default=DEBIT_DEFAUT, help="Requêtes par seconde")
+    parser.add_argument("--rafale", type=int, default=RAFALE_DEFAUT, help="Rafale maximale")
+    parser.add_argument("--admin", action="store_true", help="Accès aux endpoints d'administration")
+    parser.add_argument("--fichier", default=FICHIER_CLES, help="Fichier du registre")
+    args = parser.parse_args()
+
+    cle = ajouter_cle(args.fichier, args.nom, args.debit, args.rafale, args.admin)
+    print(f"Clé ajoutée pour {args.nom} (à transmettre au client, elle n'est pas conservée) :")
+    print(cle)
@@ -0,0 +1,71 @@
+from typing import Callable, Iterator, Optional, Sequence
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+# Nombre de lignes encodées et envoyées par morceau
+TAILLE_LOT_FLUX = 1000
+
+TYPE_NDJSON = "application/x-ndjson"
+
+
+# Fonction pour choisir le format de la réponse en flux
+def format_flux(request: Request, flux: bool = False) -> Optional[str]:
+    """
+    Renvoie "ndjson" si le client accepte application/x-ndjson, "json" si le
+    tableau JSON est demandé en flux (paramètre flux), sinon None (réponse
+    habituelle, entièrement construite).
+    """
+    if TYPE_NDJSON in request.headers.get("accept", ""):
+        return "ndjson"
+    if flux:
+        return "json"
+    return None
+
+
+def _lots(positions: Sequence[int], taille: int) -> Iterator[Sequence[int]]:
+    for debut in range(0, len(positions), taille):
+        yield positions[debut:debut + taille]
+
+
+# Fonction pour construire une réponse en flux à partir des positions retenues
+def reponse_flux(
+    mode: str,
+    positions: Sequence[int],
+    rendre_ligne: Callable[[int], bytes],
+    rendre_tableau: Optional[Callable[[Sequence[int]], bytes]] = None,
+    taille_lot: int = TAILLE_LOT_FLUX,
+) -> StreamingResponse:
+    """
+    Encode les lignes par lots au fil de l'envoi : seul le lot en cours est
+    en mémoire, et le premier morceau part sans attendre la fin de l'encodage.
+
+    Args:
+        mode: "ndjson" (une ligne JSON par élément) ou "json" (tableau JSON)
+        positions: Positions des lignes à envoyer, dans l'ordre
+        rendre_ligne: Fonction renvoyant le JSON d'une ligne à partir de sa position
+        rendre_tableau: Fonction optionnelle encodant un lot entier en tableau
+            JSON (un seul appel à l'encodeur par lot, pour le mode "json")
+        taille_lot: Nombre de lignes par morceau
+
+    Returns:
+        La réponse HTTP (transfert par morceaux)
+    """
+
+    def generer_ndjson() -> Iterator[bytes]:
+        for lot in _lots(positions, taille_lot):
+            yield b"\n".join([rendre_ligne(p) for p in lot]) + b"\n"
+
+    def generer_tableau() -> Iterator[bytes]:
+        separateur = b"["
+        for lot in _lots(positions, taille_lot):
+            if rendre_tableau is not None:
+                yield separateur + rendre_tableau(lot)[1:-1]
+            else:
+                yield separateur + b",".join([rendre_ligne(p) for p in lot])
+            separateur = b","
+        yield b"]" if separateur == b"," else b"[]"
+
+    if mode == "ndjson":
+        return StreamingResponse(generer_ndjson(), media_type=TYPE_NDJSON)
+    return StreamingResponse(generer_tableau(), media_type="application/json")
@@ -1,10 +1,22 @@
-from fastapi import FastAPI, HTTPException, Header, Depends
+from fastapi import FastAPI, HTTPException, Header, Depends, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
-import json
+import math
 import os
 
+from artefacts import ArtefactsReponse, reponse_artefact
+from catalogue import GestionnaireCatalogue
+from cles_api import FICHIER_CLES, RegistreCles
+from flux import format_flux, reponse_flux
+from journalisation import configurer_journal
+from organisations import CurseurInvalide, RechercheOrganisations
+from serialisation import REPONSES_RAPIDES, ReponseJSONRapide, encoder_json
+from store_scores import StoreScores
+from usage import TRIS, CompteurUsage, MiddlewareUsage
+
 # Modèles Pydantic
 class Personnage(BaseModel):
     id: int
@@ -21,11 +33,27 @@ class Score(BaseModel):
     score: int
     category: Optional[str] = None
 
+class Organisation(BaseModel):
+    name: str
+    city: Optional[str] = None
+    state: Optional[str] = None
+    income_amount: int = 0
+    ntee_code: Optional[str] = None
+    ein: int
+
+class PageOrganisations(BaseModel):
+    organisations: List[Organisation]
+    suivant: Optional[str] = None
+
+# Journalisation non bloquante (niveaux et format : LOG_NIVEAU, LOG_NIVEAUX, LOG_FORMAT)
+configurer_journal()
+
 # Initialisation de l'application FastAPI
 app = FastAPI(
     title="API de Personnages et Scores",
     description="Une API pour personnages fictifs et scores d'organisations",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ReponseJSONRapide if REPONSES_RAPIDES else JSONResponse,
 )
 
 # Configuration CORS
@@ -49,75 +77,255 @@ app.add_middleware(
 # Token de sécurité valide
 TOKEN_VALIDE = "mon_super_token_secret"
 
+# Registre des clés d'API (empreintes et limites par clé) ; tant qu'aucun
+# registre n'existe, seul TOKEN_VALIDE est accepté, limité comme une clé
+# (DEBIT_CLE_DEFAUT / RAFALE_CLE_DEFAUT, 0 pour ne pas le limiter)
+registre_cles = RegistreCles(FICHIER_CLES, cle_par_defaut=TOKEN_VALIDE)
+
 # Fonction pour vérifier le token
 async def verifier_token(token: Optional[str] = Header(None)):
-    if token is None or token != TOKEN_VALIDE:
+    client = registre_cles.client(token) if token is not None else None
+    if client is None:
         raise HTTPException(
             status_code=401,
             detail="Token d'accès invalide ou manquant",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    attente = client.consommer()
+    if attente:
+        raise HTTPException(
+            status_code=429,
+            detail="Trop de requêtes pour cette clé d'API",
+            headers={"Retry-After": str(math.ceil(attente))},
+        )
     return token
 
-# Fonction pour charger les personnages depuis le fichier JSON
-def charger_personnages():
-    try:
-        if not os.path.exists("personnages.json"):
-            return []
-        
-        with open("personnages.json", "r", encoding="utf-8") as f:
-            return json.load(f)
-        
-    except Exception as e:
-        print(f"Erreur lors du chargement des personnages: {e}")
-        return []
-
-# Fonction pour charger les scores depuis le fichier JSON
-def charger_scores():
-    try:
-        if not os.path.exists("scores.json"):
-            return []
-        
-        with open("scores.json", "r", encoding="utf-8") as f:
-            return json.load(f)
-        
-    except Exception as e:
-        print(f"Erreur lors du chargement des scores: {e}")
-        return []
-
-# Fonction pour sauvegarder les scores
-def sauvegarder_scores(scores):
-    try:
-        with open("scores.json", "w", encoding="utf-8") as f:
-            json.dump(scores, f, indent=2)
-        return True
-    except Exception as e:
-        print(f"Erreur lors de la sauvegarde des scores: {e}")
-        return False
+# Fonction pour vérifier que le token est celui d'un client admin
+async def verifier_admin(token: str = Depends(verifier_token)):
+    if not registre_cles.client(token).admin:
+        raise HTTPException(status_code=403, detail="Accès réservé aux clés d'administration")
+    return token
+
+# Usage par client et par route (requêtes, octets, durée), ajouté
+# périodiquement à la base FICHIER_USAGE, partagée par les workers
+compteur_usage = CompteurUsage()
+app.add_middleware(MiddlewareUsage, compteur=compteur_usage, registre=registre_cles)
+
+@app.on_event("startup")
+async def demarrer_usage():
+    compteur_usage.demarrer()
+
+@app.on_event("shutdown")
+async def arreter_usage():
+    await run_in_threadpool(compteur_usage.arreter)
+
+# Mode catalogue partagé : une seule copie des personnages, projetée (mmap)
+# par tous les workers uvicorn au lieu d'une copie par worker
+CATALOGUE_PARTAGE = os.environ.get("CATALOGUE_PARTAGE", "0") == "1"
+
+# Fonction pour valider un personnage avant de l'ajouter au catalogue
+def valider_personnage(personnage: Dict[str, Any]) -> Dict[str, Any]:
+    return Personnage.model_validate(personnage).model_dump()
+
+catalogue_personnages = GestionnaireCatalogue(
+    "personnages.json",
+    "personnages",
+    cle="id",
+    valider=valider_personnage,
+    index_entiers=("age",),
+    index_textes=("profession",),
+    partage=CATALOGUE_PARTAGE,
+)
+
+# Fonction pour valider un score avant de le garder en mémoire
+def valider_score(score: Dict[str, Any]) -> Dict[str, Any]:
+    return Score.model_validate(score).model_dump()
+
+store_scores = StoreScores("scores.json", valider=valider_score)
+
+# Fonction pour valider une organisation avant de l'ajouter au catalogue
+def valider_organisation(organisation: Dict[str, Any]) -> Dict[str, Any]:
+    return Organisation.model_validate(organisation).model_dump()
+
+# Catalogue des organisations extraites, avec index de trigrammes sur le nom.
+# Toujours persisté dans .catalogues : la génération construite au premier
+# démarrage est réutilisée telle quelle tant que le fichier source ne change pas.
+catalogue_organisations = GestionnaireCatalogue(
+    "associations_chat.json",
+    "organisations",
+    cle="ein",
+    valider=valider_organisation,
+    index_entiers=("income_amount",),
+    index_textes=("state", "ntee_code"),
+    index_trigrammes=("name",),
+    partage=True,
+)
+recherche_organisations = RechercheOrganisations(catalogue_organisations)
+
+# Construction (ou chargement) des index au démarrage plutôt qu'à la première requête
+@app.on_event("startup")
+async def construire_index():
+    catalogue_organisations.courant()
+
+# Corps JSON pré-rendus (et compressés) des listes complètes, par version du store
+artefacts_personnages = ArtefactsReponse("personnages")
+artefacts_scores = ArtefactsReponse("scores")
 
 # Endpoint GET pour récupérer tous les personnages
 @app.get("/personnages", response_model=List[Personnage], tags=["Personnages"])
-async def get_personnages(token: str = Depends(verifier_token)):
+async def get_personnages(
+    request: Request,
+    flux: bool = Query(False, description="Envoie le tableau JSON en flux, par lots"),
+    token: str = Depends(verifier_token),
+):
     """
     Récupère la liste complète des personnages fictifs.
+    Avec Accept: application/x-ndjson (une ligne par personnage) ou flux=true,
+    la réponse est envoyée par morceaux au fil de la lecture du catalogue.
     Nécessite un token d'authentification valide dans l'en-tête.
     """
-    personnages = charger_personnages()
-    if not personnages:
+    catalogue = await catalogue_personnages.courant_async()
+    if not len(catalogue):
         raise HTTPException(status_code=404, detail="Aucun personnage trouvé")
-    return personnages
+    mode = format_flux(request, flux)
+    if mode is not None:
+        return reponse_flux(mode, range(len(catalogue)), catalogue.ligne_brute)
+    artefact = await artefacts_personnages.obtenir_async(catalogue.generation, lambda: bytes(catalogue.corps()))
+    return reponse_artefact(request, artefact)
 
-# Endpoint GET pour récupérer tous les scores
+# Endpoint GET pour récupérer les personnages d'une profession (index par hachage)
+@app.get("/personnages/profession/{profession}", response_model=List[Personnage], tags=["Personnages"])
+async def get_personnages_par_profession(profession: str, token: str = Depends(verifier_token)):
+    """
+    Récupère les personnages exerçant une profession (sans tenir compte de la casse).
+    Nécessite un token d'authentification valide dans l'en-tête.
+    """
+    catalogue = await catalogue_personnages.courant_async()
+    positions = catalogue.positions_egales("profession", profession)
+    return Response(content=catalogue.corps_partiel(positions), media_type="application/json")
+
+# Endpoint GET pour récupérer les personnages dans une tranche d'âge (index trié)
+@app.get("/personnages/age", response_model=List[Personnage], tags=["Personnages"])
+async def get_personnages_par_age(
+    age_min: Optional[int] = Query(None, description="Âge minimum (inclus)"),
+    age_max: Optional[int] = Query(None, description="Âge maximum (inclus)"),
+    token: str = Depends(verifier_token),
+):
+    """
+    Récupère les personnages dont l'âge est compris entre age_min et age_max,
+    triés par âge croissant.
+    Nécessite un token d'authentification valide dans l'en-tête.
+    """
+    catalogue = await catalogue_personnages.courant_async()
+    positions = catalogue.positions_intervalle("age", age_min, age_max)
+    return Response(content=catalogue.corps_partiel(positions), media_type="application/json")
+
+# Endpoint GET pour récupérer un personnage par son identifiant
+@app.get("/personnages/{id}", response_model=Personnage, tags=["Personnages"])
+async def get_personnage(id: int, token: str = Depends(verifier_token)):
+    """
+    Récupère un personnage par son identifiant.
+    Nécessite un token d'authentification valide dans l'en-tête.
+    """
+    catalogue = await catalogue_personnages.courant_async()
+    position = catalogue.position(id)
+    if position is None:
+        raise HTTPException(status_code=404, detail="Personnage non trouvé")
+    return Response(content=bytes(catalogue.ligne_brute(position)), media_type="application/json")
+
+# Endpoint GET pour récupérer les scores, avec filtres optionnels
 @app.get("/scores", response_model=List[Score], tags=["Scores"])
-async def get_scores(token: str = Depends(verifier_token)):
+async def get_scores(
+    request: Request,
+    state: Optional[str] = Query(None, description="État (ex: TX)"),
+    city: Optional[str] = Query(None, description="Ville"),
+    category: Optional[str] = Query(None, description="Catégorie (code NTEE)"),
+    avis: Optional[str] = Query(None, description="Avis (excellent, bon, moyen, faible)"),
+    score_min: Optional[int] = Query(None, description="Score minimum (inclus)"),
+    score_max: Optional[int] = Query(None, description="Score maximum (inclus)"),
+    tri: Optional[str] = Query(None, pattern="^-?score$", description="score (croissant) ou -score (décroissant)"),
+    limite: Optional[int] = Query(None, ge=1, description="Nombre maximum de résultats (top-N avec tri=-score)"),
+    flux: bool = Query(False, description="Envoie le tableau JSON en flux, par lots"),
+    token: str = Depends(verifier_token),
+):
     """
-    Récupère la liste complète des scores.
+    Récupère la liste des scores, éventuellement filtrée.
+    Sans filtre, renvoie la liste complète pré-rendue.
+    Avec Accept: application/x-ndjson (une ligne par score) ou flux=true, les
+    scores sont encodés par lots au fil de l'envoi.
     Nécessite un token d'authentification valide dans l'en-tête.
     """
-    scores = charger_scores()
-    if not scores:
-        return []
-    return scores
+    await store_scores.actualiser_async()
+    filtres = {"state": state, "city": city, "category": category, "avis": avis}
+    mode = format_flux(request, flux)
+    if mode is not None:
+        scores, positions = store_scores.positions_requete(filtres, score_min, score_max, tri, limite)
+        return reponse_flux(
+            mode,
+            positions,
+            lambda p: encoder_json(scores[p]),
+            lambda lot: encoder_json([scores[p] for p in lot]),
+        )
+
+    if all(valeur is None for valeur in (state, city, category, avis, score_min, score_max, tri, limite)):
+        # Copie des scores seulement si la version doit être rendue
+        artefact = await artefacts_scores.obtenir_async(store_scores.version, lambda: encoder_json(store_scores.scores()))
+        return reponse_artefact(request, artefact)
+
+    corps = store_scores.requete(filtres, score_min, score_max, tri, limite)
+    return Response(content=corps, media_type="application/json")
+
+# Endpoint GET pour les statistiques des scores (agrégats tenus à jour à chaque ajout)
+@app.get("/scores/stats", tags=["Scores"])
+async def get_scores_stats(
+    dimension: Optional[str] = Query(None, pattern="^(state|category|avis)$", description="state, category ou avis (toutes par défaut)"),
+    token: str = Depends(verifier_token),
+):
+    """
+    Renvoie le nombre, la somme, la moyenne, le min, le max et les percentiles
+    (p50, p90, p99 estimés en flux) des scores, au total et par état, catégorie et avis.
+    Nécessite un token d'authentification valide dans l'en-tête.
+    """
+    await store_scores.actualiser_async()
+    return Response(content=store_scores.statistiques(dimension), media_type="application/json")
+
+# Endpoint GET pour rechercher des organisations (pagination par curseur)
+@app.get("/organisations", response_model=PageOrganisations, tags=["Organisations"])
+async def get_organisations(
+    q: Optional[str] = Query(None, description="Recherche approchée sur le nom"),
+    state: Optional[str] = Query(None, description="État (ex: TX)"),
+    ntee_code: Optional[str] = Query(None, description="Code NTEE"),
+    revenu_min: Optional[int] = Query(None, description="Revenu minimum (inclus)"),
+    revenu_max: Optional[int] = Query(None, description="Revenu maximum (inclus)"),
+    limite: int = Query(20, ge=1, le=500, description="Taille de la page"),
+    apres: Optional[str] = Query(None, description="Curseur 'suivant' de la page précédente"),
+    token: str = Depends(verifier_token),
+):
+    """
+    Recherche des organisations par nom (recherche approchée par trigrammes,
+    résultats triés par pertinence), état, code NTEE et tranche de revenus.
+    Passer la valeur "suivant" dans "apres" pour obtenir la page suivante.
+    Nécessite un token d'authentification valide dans l'en-tête.
+    """
+    await catalogue_organisations.courant_async()
+    try:
+        corps = recherche_organisations.rechercher(q, state, ntee_code, revenu_min, revenu_max, limite, apres)
+    except CurseurInvalide:
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+    return Response(content=corps, media_type="application/json")
+
+# Endpoint GET pour récupérer une organisation par son EIN
+@app.get("/organisations/{ein}", response_model=Organisation, tags=["Organisations"])
+async def get_organisation(ein: int, token: str = Depends(verifier_token)):
+    """
+    Récupère une organisation par son EIN.
+    Nécessite un token d'authentification valide dans l'en-tête.
+    """
+    catalogue = await catalogue_organisations.courant_async()
+    position = catalogue.position(ein)
+    if position is None:
+        raise HTTPException(status_code=404, detail="Organisation non trouvée")
+    return Response(content=bytes(catalogue.ligne_brute(position)), media_type="application/json")
 
 # Endpoint POST pour ajouter un score
 @app.post("/scores", response_model=Dict[str, Any], tags=["Scores"])
@@ -126,23 +334,33 @@ async def add_score(score: Score, token: str = Depends(verifier_token)):
     Ajoute un nouveau score.
     Nécessite un token d'authentification valide dans l'en-tête.
     """
-    # Charger les scores existants
-    scores = charger_scores()
-    
-    # Vérifier si un score avec le même nom et la même ville existe déjà
-    for existing_score in scores:
-        if existing_score.get("name") == score.name and existing_score.get("city") == score.city:
-            return {"status": "already_exists", "message": "Un score existe déjà pour cette organisation"}
-    
-    # Ajouter le nouveau score
-    scores.append(score.dict())
-    
-    # Sauvegarder les scores
-    if sauvegarder_scores(scores):
+    await store_scores.actualiser_async(perime_accepte=False)
+    statut = store_scores.ajouter(score.model_dump())
+
+    if statut == "already_exists":
+        return {"status": "already_exists", "message": "Un score existe déjà pour cette organisation"}
+    elif statut == "success":
+        # Rendu de la liste complète lancé dès l'écriture, hors de la boucle
+        artefacts_scores.preparer(store_scores.version, lambda: encoder_json(store_scores.scores()))
         return {"status": "success", "message": "Score ajouté avec succès"}
     else:
         raise HTTPException(status_code=500, detail="Erreur lors de la sauvegarde du score")
 
+# Endpoint GET pour l'usage par client et par route
+@app.get("/admin/usage", tags=["Administration"])
+async def get_usage(
+    tri: str = Query("duree", pattern=f"^({'|'.join(TRIS)})$", description="requetes, erreurs, octets ou duree"),
+    route: Optional[str] = Query(None, description="Préfixe de route (ex: /scores)"),
+    limite: int = Query(20, ge=1, le=1000, description="Nombre de lignes"),
+    token: str = Depends(verifier_admin),
+):
+    """
+    Renvoie les couples (client, route) les plus consommateurs, avec leur
+    part du total de la route (requêtes, octets envoyés ou durée cumulée).
+    Nécessite un token d'administration dans l'en-tête.
+    """
+    return await run_in_threadpool(compteur_usage.rapport, tri, route, limite)
+
 # Page d'accueil
 @app.get("/", tags=["Accueil"])
 async def root():
@@ -152,9 +370,16 @@ async def root():
     return {
         "message": "Bienvenue sur l'API! Accédez à /docs pour la documentation.",
         "endpoints": {
-            "personnages": "GET /personnages - Nécessite un token",
-            "scores": "GET /scores - Nécessite un token",
-            "add_score": "POST /scores - Nécessite un token"
+            "personnages": "GET /personnages?flux= - Nécessite un token (Accept: application/x-ndjson pour le flux NDJSON)",
+            "personnage": "GET /personnages/{id} - Nécessite un token",
+            "personnages_par_profession": "GET /personnages/profession/{profession} - Nécessite un token",
+            "personnages_par_age": "GET /personnages/age?age_min=&age_max= - Nécessite un token",
+            "scores": "GET /scores?state=&city=&category=&avis=&score_min=&score_max=&tri=&limite=&flux= - Nécessite un token (Accept: application/x-ndjson pour le flux NDJSON)",
+            "scores_stats": "GET /scores/stats?dimension= - Nécessite un token",
+            "add_score": "POST /scores - Nécessite un token",
+            "organisations": "GET /organisations?q=&state=&ntee_code=&revenu_min=&revenu_max=&limite=&apres= - Nécessite un token",
+            "organisation": "GET /organisations/{ein} - Nécessite un token",
+            "usage": "GET /admin/usage?tri=&route=&limite= - Nécessite un token admin"
         }
     }
 
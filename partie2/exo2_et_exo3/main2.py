@@ -3,8 +3,13 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import json
+import logging
+import math
 import os
 
+from cles_api import FICHIER_CLES, RegistreCles
+from journalisation import configurer_journal
+
 # Modèles Pydantic
 class Personnage(BaseModel):
     id: int
@@ -21,6 +26,10 @@ class Score(BaseModel):
     score: int
     category: Optional[str] = None
 
+# Journalisation non bloquante (niveaux et format : LOG_NIVEAU, LOG_NIVEAUX, LOG_FORMAT)
+configurer_journal()
+journal = logging.getLogger("main2")
+
 # Initialisation de l'application FastAPI
 app = FastAPI(
     title="API de Personnages et Scores",
@@ -49,14 +58,27 @@ app.add_middleware(
 # Token de sécurité valide
 TOKEN_VALIDE = "mon_super_token_secret"
 
+# Registre des clés d'API, partagé avec main.py ; tant qu'aucun registre
+# n'existe, seul TOKEN_VALIDE est accepté, limité comme une clé
+# (DEBIT_CLE_DEFAUT / RAFALE_CLE_DEFAUT, 0 pour ne pas le limiter)
+registre_cles = RegistreCles(FICHIER_CLES, cle_par_defaut=TOKEN_VALIDE)
+
 # Fonction pour vérifier le token
 async def verifier_token(token: Optional[str] = Header(None)):
-    if token is None or token != TOKEN_VALIDE:
+    client = registre_cles.client(token) if token is not None else None
+    if client is None:
         raise HTTPException(
             status_code=401,
             detail="Token d'accès invalide ou manquant",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    attente = client.consommer()
+    if attente:
+        raise HTTPException(
+            status_code=429,
+            detail="Trop de requêtes pour cette clé d'API",
+            headers={"Retry-After": str(math.ceil(attente))},
+        )
     return token
 
 # Fonction pour charger les personnages depuis le fichier JSON
@@ -69,7 +91,7 @@ def charger_personnages():
             return json.load(f)
         
     except Exception as e:
-        print(f"Erreur lors du chargement des personnages: {e}")
+        journal.error("Erreur lors du chargement des personnages: %s", e)
         return []
 
 # Fonction pour charger les scores depuis le fichier JSON
@@ -82,7 +104,7 @@ def charger_scores():
             return json.load(f)
         
     except Exception as e:
-        print(f"Erreur lors du chargement des scores: {e}")
+        journal.error("Erreur lors du chargement des scores: %s", e)
         return []
 
 # Fonction pour sauvegarder les scores
@@ -92,7 +114,7 @@ def sauvegarder_scores(scores):
             json.dump(scores, f, indent=2)
         return True
     except Exception as e:
-        print(f"Erreur lors de la sauvegarde des scores: {e}")
+        journal.error("Erreur lors de la sauvegarde des scores: %s", e)
         return False
 
 # Endpoint GET pour récupérer tous les personnages
@@ -0,0 +1,188 @@
+import heapq
+import math
+from bisect import bisect_left
+from collections import Counter
+from typing import List, Optional, Sequence, Tuple
+
+from catalogue import Catalogue, GestionnaireCatalogue, trigrammes
+from serialisation import encoder_json
+
+# Similarité minimale (trigrammes communs / trigrammes réunis) pour la recherche approchée
+SEUIL_SIMILARITE = 0.3
+
+
+# Fonction pour tester l'appartenance à une liste de positions croissantes
+def _contient(positions: Sequence[int], position: int) -> bool:
+    i = bisect_left(positions, position)
+    return i < len(positions) and positions[i] == position
+
+
+class CurseurInvalide(ValueError):
+    pass
+
+
+class RechercheOrganisations:
+    """
+    Recherche dans le catalogue des organisations : recherche approchée sur
+    le nom (index de trigrammes), filtres par état, code NTEE et tranche de
+    revenus, pagination par curseur (keyset).
+
+    Sans recherche, les résultats suivent l'ordre du catalogue et le curseur
+    est la dernière position renvoyée. Avec une recherche, ils sont triés par
+    similarité décroissante puis par position, et le curseur est ce couple.
+    """
+
+    def __init__(self, gestionnaire: GestionnaireCatalogue, champ: str = "name", seuil: float = SEUIL_SIMILARITE):
+        self.gestionnaire = gestionnaire
+        self.champ = champ
+        self.seuil = seuil
+
+    def rechercher(
+        self,
+        q: Optional[str] = None,
+        state: Optional[str] = None,
+        ntee_code: Optional[str] = None,
+        revenu_min: Optional[int] = None,
+        revenu_max: Optional[int] = None,
+        limite: int = 20,
+        apres: Optional[str] = None,
+    ) -> bytes:
+        """
+        Exécute une recherche et renvoie le corps JSON d'une page de résultats.
+
+        Args:
+            q: Texte recherché dans le nom (approché, casse et accents ignorés)
+            state: État (égalité)
+            ntee_code: Code NTEE (égalité)
+            revenu_min: Revenu minimum (inclus)
+            revenu_max: Revenu maximum (inclus)
+            limite: Taille de la page
+            apres: Curseur renvoyé par la page précédente
+
+        Returns:
+            {"organisations": [...], "suivant": curseur ou null}
+
+        Raises:
+            CurseurInvalide: si le curseur ne correspond pas au type de recherche
+        """
+        catalogue = self.gestionnaire.courant()
+        termes = trigrammes(q) if q else []
+        egalites = [
+            catalogue.positions_egales(champ, valeur)
+            for champ, valeur in (("state", state), ("ntee_code", ntee_code))
+            if valeur is not None
+        ]
+        revenus = None
+        if revenu_min is not None or revenu_max is not None:
+            revenus = catalogue.positions_intervalle("income_amount", revenu_min, revenu_max)
+
+        if termes:
+            positions, suivant = self._par_similarite(catalogue, termes, egalites, revenus, limite, apres)
+        else:
+            positions, suivant = self._par_position(catalogue, egalites, revenus, limite, apres)
+
+        return (
+            b'{"organisations":' + catalogue.corps_partiel(positions)
+            + b',"suivant":' + encoder_json(suivant) + b"}"
+        )
+
+    @staticmethod
+    def _filtre(egalites: List[Sequence[int]], revenus: Optional[Sequence[int]], base=None):
+        """
+        Construit le test des filtres, en omettant la liste déjà parcourue (base).
+        """
+        autres = [liste for liste in egalites if liste is not base]
+        dans_revenus = set(revenus) if revenus is not None and revenus is not base else None
+
+        def accepte(position: int) -> bool:
+            if dans_revenus is not None and position not in dans_revenus:
+                return False
+            return all(_contient(liste, position) for liste in autres)
+
+        return accepte
+
+    def _par_position(self, catalogue: Catalogue, egalites, revenus, limite, apres) -> Tuple[List[int], Optional[str]]:
+        debut = 0
+        if apres is not None:
+            if not apres.startswith("p") or not apres[1:].isdigit():
+                raise CurseurInvalide(apres)
+            debut = int(apres[1:]) + 1
+
+        # On parcourt la plus courte des listes candidates, dans l'ordre des positions
+        candidates = list(egalites)
+        if revenus is not None:
+            candidates.append(revenus)
+        if candidates:
+            base = min(candidates, key=len)
+            accepte = self._filtre(egalites, revenus, base)
+            if base is revenus:
+                base = sorted(revenus)  # triée par revenu dans l'index
+            ordre = base[bisect_left(base, debut):]
+        else:
+            accepte = None
+            ordre = range(debut, len(catalogue))
+
+        positions = []
+        for position in ordre:
+            if accepte is None or accepte(position):
+                if len(positions) == limite:
+                    return positions, f"p{positions[-1]}"
+                positions.append(position)
+        return positions, None
+
+    def _par_similarite(self, catalogue: Catalogue, termes, egalites, revenus, limite, apres) -> Tuple[List[int], Optional[str]]:
+        borne = None
+        if apres is not None:
+            try:
+                similarite, _, position = apres[1:].partition(":")
+                if not apres.startswith("s"):
+                    raise ValueError(apres)
+                borne = (-float(similarite), int(position))
+            except ValueError:
+                raise CurseurInvalide(apres)
+
+        # Une ligne doit partager au moins min_communs trigrammes avec la recherche
+        # pour atteindre le seuil : elle figure donc forcément dans l'une des
+        # (n - min_communs + 1) listes les plus courtes, qui donnent les candidats.
+        nombre = len(termes)
+        min_communs = max(1, math.ceil(self.seuil * nombre))
+        listes = sorted((catalogue.positions_trigramme(self.champ, t) for t in termes), key=len)
+        courtes, longues = listes[:nombre - min_communs + 1], listes[nombre - min_communs + 1:]
+
+        communs = Counter()
+        for liste in courtes:
+            communs.update(liste)
+        candidats = list(communs)
+
+        # Les listes longues sont comptées en bloc si elles restent de la taille
+        # des candidats, sinon seule l'appartenance des candidats est testée (bisect)
+        for liste in longues:
+            if len(liste) <= 8 * len(candidats):
+                communs.update(liste)
+            else:
+                for position in candidats:
+                    if _contient(liste, position):
+                        communs[position] += 1
+
+        accepte = self._filtre(egalites, revenus) if egalites or revenus is not None else None
+        resultats = []
+        for position in candidats:
+            nb = communs[position]
+            if nb < min_communs:
+                continue
+            similarite = nb / (nombre + catalogue.nombre_trigrammes(self.champ, position) - nb)
+            if similarite < self.seuil:
+                continue
+            cle = (-similarite, position)
+            if borne is not None and cle <= borne:
+                continue
+            if accepte is not None and not accepte(position):
+                continue
+            resultats.append(cle)
+
+        page = heapq.nsmallest(limite + 1, resultats)
+        suivant = None
+        if len(page) > limite:
+            page = page[:limite]
+            suivant = f"s{-page[-1][0]!r}:{page[-1][1]}"
+        return [position for _, position in page], suivant
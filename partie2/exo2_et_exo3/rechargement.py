@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import Callable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+journal = logging.getLogger(__name__)
+
+# Pendant un rechargement, les lectures reçoivent la version précédente
+# (stale-while-revalidate) ; avec 0, elles attendent la nouvelle version
+SERVIR_PERIME = os.environ.get("SERVIR_PERIME", "1") == "1"
+
+
+class RechargementUnique:
+    """
+    Regroupe les rechargements concurrents d'une même donnée (single-flight) :
+    le premier appelant recharge, les suivants attendent ce même rechargement
+    au lieu de relire et réanalyser le fichier chacun de leur côté.
+
+    Avec servir_perime, un appelant qui dispose déjà d'une version repart
+    tout de suite avec elle pendant que le rechargement se poursuit.
+    """
+
+    def __init__(self, servir_perime: bool = SERVIR_PERIME):
+        self.servir_perime = servir_perime
+        self._verrou = threading.Lock()  # tenu pendant un rechargement
+        self._tache: Optional[asyncio.Future] = None
+
+    def _recharger_verrouille(self, recharger: Callable[[], None], a_jour: Callable[[], bool]) -> None:
+        try:
+            # Un autre appelant a pu recharger pendant l'attente du verrou
+            if not a_jour():
+                recharger()
+        finally:
+            self._verrou.release()
+
+    def executer(self, recharger: Callable[[], None], a_jour: Callable[[], bool], disponible: bool) -> None:
+        """
+        Recharge si nécessaire, depuis un thread (bloquant).
+
+        Args:
+            recharger: Fonction qui recharge la donnée
+            a_jour: Vérification légère indiquant si la donnée est à jour
+            disponible: True si une version précédente peut être servie
+        """
+        if self._verrou.acquire(blocking=not (self.servir_perime and disponible)):
+            self._recharger_verrouille(recharger, a_jour)
+
+    async def executer_async(self, recharger: Callable[[], None], a_jour: Callable[[], bool], disponible: bool) -> None:
+        """
+        Même chose depuis la boucle d'événements : le rechargement est fait
+        dans un thread, une seule fois pour toutes les requêtes concurrentes,
+        qui attendent la même tâche (ou repartent avec la version précédente).
+        """
+        if self._tache is None:
+            if self._verrou.acquire(blocking=False):
+                # Verrou pris ici : les appels synchrones qui suivent sur la
+                # boucle voient le rechargement en cours et ne le refont pas
+                tache = run_in_threadpool(self._recharger_verrouille, recharger, a_jour)
+            else:
+                # Rechargement déjà lancé par un appel synchrone (autre thread)
+                tache = run_in_threadpool(self.executer, recharger, a_jour, False)
+            self._tache = asyncio.ensure_future(tache)
+            self._tache.add_done_callback(self._terminer)
+
+        if self.servir_perime and disponible:
+            return
+        await asyncio.shield(self._tache)
+
+    def _terminer(self, tache: asyncio.Future) -> None:
+        self._tache = None
+        if not tache.cancelled() and tache.exception() is not None:
+            journal.error("Erreur lors du rechargement: %s", tache.exception())
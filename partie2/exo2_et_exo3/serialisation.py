@@ -0,0 +1,41 @@
+import json
+import os
+from typing import Any
+
+import pydantic_core
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson est optionnel : repli sur pydantic-core
+    orjson = None
+
+# Chemin rapide (optionnel) pour les données déjà validées à l'écriture :
+# encodage orjson / pydantic-core et pas de seconde validation via response_model
+REPONSES_RAPIDES = os.environ.get("REPONSES_RAPIDES", "0") == "1"
+
+
+# Encodeur réutilisé (évite de le reconstruire à chaque appel de json.dumps)
+_encodeur = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+# Fonction pour encoder des données en JSON compact
+def encoder_json(donnees: Any) -> bytes:
+    """
+    Encode en JSON compact, avec le même rendu que JSONResponse de FastAPI.
+    """
+    if REPONSES_RAPIDES:
+        if orjson is not None:
+            return orjson.dumps(donnees)
+        return pydantic_core.to_json(donnees)
+    return _encodeur.encode(donnees).encode("utf-8")
+
+
+class ReponseJSONRapide(JSONResponse):
+    """
+    Classe de réponse par défaut du mode rapide (orjson si disponible).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return encoder_json(content)
+
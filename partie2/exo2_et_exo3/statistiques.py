@@ -0,0 +1,144 @@
+from typing import Any, Dict, Iterable, Optional
+
+# Quantiles suivis pour chaque groupe de scores
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Dimensions de regroupement des statistiques
+DIMENSIONS = ("state", "category", "avis")
+
+
+class EstimateurP2:
+    """
+    Estimation d'un quantile en flux avec l'algorithme P² (Jain & Chlamtac) :
+    cinq marqueurs, mise à jour et lecture en O(1), mémoire constante.
+    """
+
+    def __init__(self, p: float):
+        self.p = p
+        self.hauteurs = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.souhaitees = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def ajouter(self, x: float) -> None:
+        q = self.hauteurs
+        if len(q) < 5:
+            q.append(x)
+            q.sort()
+            return
+
+        # Cellule contenant x (en élargissant les extrêmes si besoin)
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+
+        n = self.positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.souhaitees[i] += self.increments[i]
+
+        # Ajustement des marqueurs intermédiaires
+        for i in (1, 2, 3):
+            d = self.souhaitees[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                parabolique = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if q[i - 1] < parabolique < q[i + 1]:
+                    q[i] = parabolique
+                else:
+                    q[i] = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                n[i] += d
+
+    def valeur(self) -> Optional[float]:
+        q = self.hauteurs
+        if not q:
+            return None
+        if len(q) < 5:
+            # Moins de cinq valeurs : quantile exact
+            return q[min(len(q) - 1, int(round(self.p * (len(q) - 1))))]
+        return q[2]
+
+
+class Agregat:
+    """
+    Agrégats d'un groupe de scores : nombre, somme, min, max et quantiles.
+    """
+
+    def __init__(self):
+        self.nombre = 0
+        self.somme = 0
+        self.minimum = None
+        self.maximum = None
+        self.quantiles = {p: EstimateurP2(p) for p in QUANTILES}
+
+    def ajouter(self, valeur: int) -> None:
+        self.nombre += 1
+        self.somme += valeur
+        if self.minimum is None or valeur < self.minimum:
+            self.minimum = valeur
+        if self.maximum is None or valeur > self.maximum:
+            self.maximum = valeur
+        for estimateur in self.quantiles.values():
+            estimateur.ajouter(valeur)
+
+    def resume(self) -> Dict[str, Any]:
+        resume = {
+            "count": self.nombre,
+            "sum": self.somme,
+            "mean": round(self.somme / self.nombre, 2) if self.nombre else None,
+            "min": self.minimum,
+            "max": self.maximum,
+        }
+        for p, estimateur in self.quantiles.items():
+            valeur = estimateur.valeur()
+            resume[f"p{int(p * 100)}"] = round(valeur, 2) if valeur is not None else None
+        return resume
+
+
+class StatistiquesScores:
+    """
+    Agrégats courants des scores, globaux et par état, catégorie et avis,
+    mis à jour à chaque ajout sans jamais relire les scores stockés.
+    """
+
+    def __init__(self, scores: Iterable[Dict[str, Any]] = ()):
+        self.total = Agregat()
+        self.groupes: Dict[str, Dict[str, Agregat]] = {dimension: {} for dimension in DIMENSIONS}
+        for score in scores:
+            self.ajouter(score)
+
+    def ajouter(self, score: Dict[str, Any]) -> None:
+        valeur = score["score"]
+        self.total.ajouter(valeur)
+        for dimension in DIMENSIONS:
+            groupe = score.get(dimension)
+            if groupe is None:
+                groupe = "inconnu"
+            agregat = self.groupes[dimension].get(groupe)
+            if agregat is None:
+                agregat = self.groupes[dimension][groupe] = Agregat()
+            agregat.ajouter(valeur)
+
+    def resume(self, dimension: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Renvoie les statistiques globales et celles d'une dimension (ou de toutes).
+        """
+        dimensions = DIMENSIONS if dimension is None else (dimension,)
+        return {
+            "total": self.total.resume(),
+            **{
+                f"par_{d}": {groupe: agregat.resume() for groupe, agregat in self.groupes[d].items()}
+                for d in dimensions
+            },
+        }
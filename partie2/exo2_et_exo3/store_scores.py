@@ -0,0 +1,341 @@
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from rechargement import RechargementUnique
+from serialisation import encoder_json
+from statistiques import StatistiquesScores
+
+journal = logging.getLogger(__name__)
+
+# Champs texte indexés (index inversé valeur -> positions)
+CHAMPS_INDEXES = ("state", "city", "category", "avis")
+
+
+def normaliser(valeur: Any) -> str:
+    return str(valeur).casefold()
+
+
+class CacheLRU:
+    """
+    Cache LRU des résultats de requêtes, vidé dès que la version du store change.
+    """
+
+    def __init__(self, taille: int = 256):
+        self.taille = taille
+        self.version = None
+        self._entrees: "OrderedDict[Any, bytes]" = OrderedDict()
+
+    def obtenir(self, version: int, cle: Any) -> Optional[bytes]:
+        if version != self.version:
+            self._entrees.clear()
+            self.version = version
+            return None
+        resultat = self._entrees.get(cle)
+        if resultat is not None:
+            self._entrees.move_to_end(cle)
+        return resultat
+
+    def ajouter(self, version: int, cle: Any, resultat: bytes) -> None:
+        if version != self.version:
+            return
+        self._entrees[cle] = resultat
+        if len(self._entrees) > self.taille:
+            self._entrees.popitem(last=False)
+
+
+class StoreScores:
+    """
+    Scores gardés en mémoire, avec un numéro de version incrémenté à chaque
+    écriture (ajout ou rechargement du fichier modifié de l'extérieur).
+    Les index (inversés par champ, et ordre par score) sont tenus à jour à
+    chaque ajout.
+
+    Un rechargement lit et valide le fichier hors du verrou, une seule fois
+    pour tous les appelants concurrents ; pendant ce temps, les lectures
+    continuent sur la version précédente (voir RechargementUnique).
+    """
+
+    def __init__(
+        self,
+        fichier: str = "scores.json",
+        valider: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+        taille_cache: int = 256,
+    ):
+        self.fichier = fichier
+        self.valider = valider
+        self.version = 0
+
+        self._scores: List[Dict[str, Any]] = []
+        self._cles = set()  # (name, city) déjà présents
+        self._index: Dict[str, Dict[str, List[int]]] = {}
+        self._valeurs_triees: List[int] = []  # scores triés
+        self._positions_triees: List[int] = []  # positions dans le même ordre
+        self._statistiques = StatistiquesScores()
+        self._cache = CacheLRU(taille_cache)
+        self._signature = None
+        self._charge = False
+        self._verrou = threading.Lock()
+        self._rechargement = RechargementUnique()
+
+    def _signature_fichier(self):
+        try:
+            stat = os.stat(self.fichier)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    # Fonction pour charger les scores depuis le fichier JSON
+    def _lire_fichier(self) -> List[Dict[str, Any]]:
+        try:
+            if not os.path.exists(self.fichier):
+                return []
+
+            with open(self.fichier, "r", encoding="utf-8") as f:
+                scores = json.load(f)
+
+        except Exception as e:
+            journal.error("Erreur lors du chargement des scores: %s", e, extra={"fichier": self.fichier})
+            return []
+
+        if self.valider is None:
+            return scores
+
+        valides = []
+        for score in scores:
+            try:
+                valides.append(self.valider(score))
+            except Exception as e:
+                journal.warning("Score ignoré dans %s: %s", self.fichier, e)
+        return valides
+
+    def _a_jour(self) -> bool:
+        return self._charge and self._signature_fichier() == self._signature
+
+    def _recharger(self) -> None:
+        signature = self._signature_fichier()
+        scores = self._lire_fichier()
+        with self._verrou:
+            self._remplacer(scores)
+            self._signature = signature
+            self._charge = True
+
+    def _actualiser(self, perime_accepte: bool = True) -> None:
+        """
+        Recharge le fichier s'il n'a jamais été lu ou s'il a été modifié
+        par un autre processus. À appeler sans tenir le verrou.
+        """
+        if not self._a_jour():
+            self._rechargement.executer(self._recharger, self._a_jour, self._charge and perime_accepte)
+
+    async def actualiser_async(self, perime_accepte: bool = True) -> None:
+        """
+        Comme _actualiser, mais le rechargement est fait dans un thread, sans
+        bloquer la boucle d'événements.
+
+        Args:
+            perime_accepte: False pour attendre la nouvelle version (avant une écriture)
+        """
+        if not self._a_jour():
+            await self._rechargement.executer_async(self._recharger, self._a_jour, self._charge and perime_accepte)
+
+    def _remplacer(self, scores: List[Dict[str, Any]]) -> None:
+        self._scores = scores
+        self._cles = {(s.get("name"), s.get("city")) for s in scores}
+
+        # Reconstruction complète des index (un seul tri, au chargement)
+        self._index = {champ: {} for champ in CHAMPS_INDEXES}
+        for position, score in enumerate(scores):
+            self._indexer_champs(position, score)
+        ordre = sorted(range(len(scores)), key=lambda p: scores[p]["score"])
+        self._valeurs_triees = [scores[p]["score"] for p in ordre]
+        self._positions_triees = ordre
+        self._statistiques = StatistiquesScores(scores)
+        self.version += 1
+
+    def _indexer_champs(self, position: int, score: Dict[str, Any]) -> None:
+        for champ in CHAMPS_INDEXES:
+            valeur = score.get(champ)
+            if valeur is not None:
+                self._index[champ].setdefault(normaliser(valeur), []).append(position)
+
+    def _indexer(self, position: int, score: Dict[str, Any]) -> None:
+        """
+        Mise à jour incrémentale des index pour un nouveau score.
+        """
+        self._indexer_champs(position, score)
+        i = bisect_right(self._valeurs_triees, score["score"])
+        self._valeurs_triees.insert(i, score["score"])
+        self._positions_triees.insert(i, position)
+        self._statistiques.ajouter(score)
+
+    def scores(self) -> List[Dict[str, Any]]:
+        self._actualiser()
+        with self._verrou:
+            return self._scores[:]
+
+    # Fonction pour sauvegarder les scores
+    def _sauvegarder(self, scores: List[Dict[str, Any]]) -> bool:
+        try:
+            with open(self.fichier, "w", encoding="utf-8") as f:
+                json.dump(scores, f, indent=2)
+            return True
+        except Exception as e:
+            journal.error("Erreur lors de la sauvegarde des scores: %s", e, extra={"fichier": self.fichier})
+            return False
+
+    def ajouter(self, score: Dict[str, Any]) -> Optional[str]:
+        """
+        Ajoute un score s'il n'existe pas déjà pour la même organisation.
+
+        Args:
+            score: Score validé
+
+        Returns:
+            "success", "already_exists", ou None si la sauvegarde a échoué
+        """
+        self._actualiser(perime_accepte=False)
+        with self._verrou:
+            cle = (score.get("name"), score.get("city"))
+            if cle in self._cles:
+                return "already_exists"
+
+            self._scores.append(score)
+            if not self._sauvegarder(self._scores):
+                self._scores.pop()
+                return None
+
+            self._cles.add(cle)
+            self._indexer(len(self._scores) - 1, score)
+            self._signature = self._signature_fichier()
+            self.version += 1
+            return "success"
+
+    def statistiques(self, dimension: Optional[str] = None) -> bytes:
+        """
+        Renvoie les statistiques courantes (JSON), lues depuis les agrégats
+        tenus à jour à chaque ajout : le coût ne dépend pas du nombre de scores.
+        """
+        self._actualiser()
+        with self._verrou:
+            version = self.version
+            cle_cache = ("statistiques", dimension)
+            resultat = self._cache.obtenir(version, cle_cache)
+            if resultat is None:
+                resultat = encoder_json(self._statistiques.resume(dimension))
+                self._cache.ajouter(version, cle_cache, resultat)
+            return resultat
+
+    def requete(
+        self,
+        filtres: Dict[str, Optional[str]],
+        score_min: Optional[int] = None,
+        score_max: Optional[int] = None,
+        tri: Optional[str] = None,
+        limite: Optional[int] = None,
+    ) -> bytes:
+        """
+        Exécute une requête filtrée à l'aide des index et renvoie le tableau
+        JSON des scores correspondants. Les résultats sont mis en cache (LRU)
+        jusqu'à la prochaine écriture.
+
+        Args:
+            filtres: Égalités sur les champs indexés (state, city, category, avis)
+            score_min: Score minimum (inclus)
+            score_max: Score maximum (inclus)
+            tri: "score" (croissant), "-score" (décroissant) ou None : ordre
+                d'ajout, ou croissant par score si un intervalle est demandé
+            limite: Nombre maximum de résultats
+
+        Returns:
+            Le corps JSON de la réponse
+        """
+        filtres = {champ: normaliser(valeur) for champ, valeur in filtres.items() if valeur is not None}
+        cle_cache = (tuple(sorted(filtres.items())), score_min, score_max, tri, limite)
+
+        self._actualiser()
+        with self._verrou:
+            version = self.version
+            resultat = self._cache.obtenir(version, cle_cache)
+            if resultat is not None:
+                return resultat
+
+            positions = self._positions(filtres, score_min, score_max, tri, limite)
+            resultat = encoder_json([self._scores[p] for p in positions])
+            self._cache.ajouter(version, cle_cache, resultat)
+            return resultat
+
+    def positions_requete(
+        self,
+        filtres: Dict[str, Optional[str]],
+        score_min: Optional[int] = None,
+        score_max: Optional[int] = None,
+        tri: Optional[str] = None,
+        limite: Optional[int] = None,
+    ) -> Tuple[List[Dict[str, Any]], Sequence[int]]:
+        """
+        Exécute la même requête que requete, mais renvoie les scores et les
+        positions retenues au lieu du corps encodé, pour une réponse en flux
+        (rien n'est encodé ni mis en cache ici).
+
+        La liste des scores n'est modifiée que par ajout en fin (un rechargement
+        la remplace) : les positions restent valides pendant tout le parcours,
+        sans garder le verrou.
+
+        Returns:
+            La liste des scores et les positions, dans l'ordre de la réponse
+        """
+        filtres = {champ: normaliser(valeur) for champ, valeur in filtres.items() if valeur is not None}
+        self._actualiser()
+        with self._verrou:
+            return self._scores, self._positions(filtres, score_min, score_max, tri, limite)
+
+    def _positions(self, filtres, score_min, score_max, tri, limite) -> Sequence[int]:
+        # Intersection des index inversés, en partant de la liste la plus courte
+        listes = sorted(
+            (self._index[champ].get(valeur, []) for champ, valeur in filtres.items()),
+            key=len,
+        )
+        candidats = None
+        if listes:
+            candidats = set(listes[0])
+            for liste in listes[1:]:
+                candidats.intersection_update(liste)
+                if not candidats:
+                    return []
+
+        # Intervalle de scores sur l'ordre maintenu (bisect)
+        debut = 0 if score_min is None else bisect_left(self._valeurs_triees, score_min)
+        fin = len(self._valeurs_triees) if score_max is None else bisect_right(self._valeurs_triees, score_max)
+        if debut >= fin:
+            return []
+
+        # Avec un intervalle de scores, l'ordre maintenu par score sert d'ordre par défaut
+        if tri is None and (score_min is not None or score_max is not None):
+            tri = "score"
+
+        if tri in ("score", "-score"):
+            plage = range(debut, fin) if tri == "score" else range(fin - 1, debut - 1, -1)
+            positions = []
+            for i in plage:
+                position = self._positions_triees[i]
+                if candidats is None or position in candidats:
+                    positions.append(position)
+                    if limite is not None and len(positions) >= limite:
+                        break
+            return positions
+
+        # Ordre d'ajout : les listes des index inversés sont déjà dans cet ordre
+        if candidats is None:
+            # Sans filtre, un range suffit (rien n'est matérialisé)
+            positions = range(len(self._scores))
+            return positions[:limite] if limite is not None else positions
+        elif len(listes) == 1:
+            positions = listes[0]
+        else:
+            positions = [p for p in listes[0] if p in candidats]
+        return list(positions[:limite] if limite is not None else positions)
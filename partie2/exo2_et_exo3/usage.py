@@ -0,0 +1,321 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+journal = logging.getLogger(__name__)
+
+# Base SQLite où les compteurs de tous les workers sont cumulés (et relus
+# par le rapport) ; chaque worker y ajoute périodiquement ses propres deltas
+FICHIER_USAGE = os.environ.get("FICHIER_USAGE", "usage.db")
+
+# Intervalle entre deux écritures dans la base (secondes)
+INTERVALLE_ECRITURE = 60.0
+
+# Nombre maximal de lignes par adresse IP (clients sans clé) ; au-delà, les
+# nouvelles adresses sont cumulées dans le client CLIENT_AUTRES de chaque route
+LIGNES_IP_MAX = int(os.environ.get("USAGE_LIGNES_IP_MAX", "10000"))
+CLIENT_AUTRES = "ip:autres"
+
+# Indices des compteurs d'une ligne (client, route)
+REQUETES, ERREURS, OCTETS_RECUS, OCTETS_ENVOYES, DUREE_MS = range(5)
+
+TRIS = {"requetes": REQUETES, "erreurs": ERREURS, "octets": OCTETS_ENVOYES, "duree": DUREE_MS}
+
+# Méthodes comptées telles quelles ; les autres (choisies par le client) sont regroupées
+METHODES = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+_COLONNES = ("requetes", "erreurs", "octets_recus", "octets_envoyes", "duree_ms")
+
+
+# Fonction pour identifier le client d'une requête
+def identifiant_client(scope: Dict[str, Any], registre) -> str:
+    """
+    Nom du client pour la clé d'API de l'en-tête token, sinon l'adresse IP
+    (routes sans clé, comme les webhooks).
+    """
+    for nom, valeur in scope["headers"]:
+        if nom == b"token":
+            client = registre.client(valeur.decode("latin-1"))
+            return client.nom if client is not None else "cle_invalide"
+    hote = scope.get("client")
+    return f"ip:{hote[0]}" if hote else "inconnu"
+
+
+class CompteurUsage:
+    """
+    Compteurs d'usage par (client, route) : requêtes, erreurs (statut >= 400),
+    octets reçus et envoyés, durée cumulée. Les compteurs ne sont modifiés que
+    par la boucle d'événements (une recherche de dict et quelques additions
+    par requête, sans verrou).
+
+    Un thread ajoute périodiquement à une base SQLite ce qui a été compté
+    depuis sa dernière écriture (en une transaction, additions faites par la
+    base) : plusieurs workers partagent ainsi la même base sans écraser les
+    totaux des autres, et un redémarrage repart de zéro en mémoire sans rien
+    compter deux fois. Le rapport lit la base, plus ce que ce worker n'y a
+    pas encore écrit (les autres workers y apparaissent à leur prochaine
+    écriture).
+
+    Les clients à clé d'API sont bornés par le registre ; les lignes par
+    adresse IP le sont par lignes_ip_max, en mémoire comme dans la base, au-delà
+    duquel les nouvelles adresses sont regroupées sous CLIENT_AUTRES (une
+    ligne par route).
+    """
+
+    def __init__(
+        self,
+        fichier: Optional[str] = FICHIER_USAGE,
+        intervalle: float = INTERVALLE_ECRITURE,
+        lignes_ip_max: int = LIGNES_IP_MAX,
+    ):
+        self.fichier = fichier
+        self.intervalle = intervalle
+        self.lignes_ip_max = lignes_ip_max
+        self.depuis = time.time()
+        self._compteurs: Dict[Tuple[str, str], List[float]] = {}  # depuis le démarrage de ce worker
+        self._ecrits: Dict[Tuple[str, str], List[float]] = {}  # part déjà ajoutée à la base
+        self._lignes_ip = 0
+        self._verrou_ecriture = threading.Lock()
+        self._arret = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if fichier is not None:
+            self._initialiser()
+
+    def _connexion(self) -> sqlite3.Connection:
+        connexion = sqlite3.connect(self.fichier, isolation_level=None, timeout=10.0)
+        connexion.execute("PRAGMA journal_mode=WAL")
+        return connexion
+
+    def _initialiser(self) -> None:
+        try:
+            connexion = self._connexion()
+            try:
+                connexion.execute(
+                    "CREATE TABLE IF NOT EXISTS usage (client TEXT NOT NULL, route TEXT NOT NULL, "
+                    "requetes INTEGER NOT NULL, erreurs INTEGER NOT NULL, octets_recus INTEGER NOT NULL, "
+                    "octets_envoyes INTEGER NOT NULL, duree_ms REAL NOT NULL, PRIMARY KEY (client, route))"
+                )
+                connexion.execute("CREATE TABLE IF NOT EXISTS meta (cle TEXT PRIMARY KEY, valeur REAL NOT NULL)")
+                connexion.execute("INSERT OR IGNORE INTO meta VALUES ('depuis', ?)", (self.depuis,))
+                self.depuis = connexion.execute("SELECT valeur FROM meta WHERE cle = 'depuis'").fetchone()[0]
+            finally:
+                connexion.close()
+        except sqlite3.Error as e:
+            journal.error("Erreur lors de l'ouverture de %s: %s", self.fichier, e)
+
+    def _ligne(self, client: str, route: str) -> List[float]:
+        compteurs = self._compteurs.get((client, route))
+        if compteurs is not None:
+            return compteurs
+        if client.startswith("ip:") and client != CLIENT_AUTRES:
+            if self._lignes_ip >= self.lignes_ip_max:
+                return self._ligne(CLIENT_AUTRES, route)
+            self._lignes_ip += 1
+        compteurs = self._compteurs[(client, route)] = [0, 0, 0, 0, 0.0]
+        return compteurs
+
+    def enregistrer(self, client: str, route: str, statut: int, octets_recus: int, octets_envoyes: int, duree_ms: float) -> None:
+        compteurs = self._ligne(client, route)
+        compteurs[REQUETES] += 1
+        if statut >= 400:
+            compteurs[ERREURS] += 1
+        compteurs[OCTETS_RECUS] += octets_recus
+        compteurs[OCTETS_ENVOYES] += octets_envoyes
+        compteurs[DUREE_MS] += duree_ms
+
+    def _non_ecrits(self) -> Tuple[Dict[Tuple[str, str], List[float]], Dict[Tuple[str, str], List[float]]]:
+        """
+        Renvoie une copie des compteurs et, par ligne, ce qui n'a pas encore
+        été ajouté à la base (lignes inchangées omises).
+        """
+        # dict.copy est atomique sous le GIL : pas de verrou côté requêtes
+        valeurs = {cle: list(compteurs) for cle, compteurs in self._compteurs.copy().items()}
+        deltas = {}
+        for cle, compteurs in valeurs.items():
+            ecrits = self._ecrits.get(cle)
+            delta = compteurs if ecrits is None else [a - b for a, b in zip(compteurs, ecrits)]
+            if delta[REQUETES]:
+                deltas[cle] = delta
+        return valeurs, deltas
+
+    def ecrire(self) -> None:
+        """
+        Ajoute à la base ce qui a été compté depuis la dernière écriture.
+        """
+        if self.fichier is None:
+            return
+        with self._verrou_ecriture:
+            valeurs, deltas = self._non_ecrits()
+            if not deltas:
+                return
+            try:
+                connexion = self._connexion()
+                try:
+                    connexion.execute("BEGIN IMMEDIATE")
+                    lignes_ip = connexion.execute(
+                        "SELECT COUNT(*) FROM usage WHERE client LIKE 'ip:%' AND client != ?", (CLIENT_AUTRES,)
+                    ).fetchone()[0]
+                    for (client, route), delta in deltas.items():
+                        if client.startswith("ip:") and client != CLIENT_AUTRES:
+                            existe = connexion.execute(
+                                "SELECT 1 FROM usage WHERE client = ? AND route = ?", (client, route)
+                            ).fetchone()
+                            if existe is None and lignes_ip >= self.lignes_ip_max:
+                                client = CLIENT_AUTRES
+                            elif existe is None:
+                                lignes_ip += 1
+                        connexion.execute(
+                            "INSERT INTO usage VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (client, route) DO UPDATE SET "
+                            + ", ".join(f"{colonne} = {colonne} + excluded.{colonne}" for colonne in _COLONNES),
+                            (client, route, *delta),
+                        )
+                    connexion.execute("COMMIT")
+                finally:
+                    connexion.close()
+            except sqlite3.Error as e:
+                # Rien n'est marqué écrit : les deltas partiront à la prochaine écriture
+                journal.error("Erreur lors de l'écriture de %s: %s", self.fichier, e)
+                return
+            self._ecrits = valeurs
+
+    def demarrer(self) -> None:
+        def ecrire_periodiquement():
+            while not self._arret.wait(self.intervalle):
+                self.ecrire()
+
+        self._arret.clear()
+        self._thread = threading.Thread(target=ecrire_periodiquement, name="usage-ecriture", daemon=True)
+        self._thread.start()
+
+    def arreter(self) -> None:
+        self._arret.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.ecrire()
+
+    def _lignes(self, route: Optional[str]) -> Tuple[List[List[Any]], int]:
+        """
+        Lignes cumulées (base et compteurs non encore écrits de ce worker),
+        et nombre de lignes par adresse IP dans la base.
+        """
+        _, deltas = self._non_ecrits()
+        totaux: Dict[Tuple[str, str], List[float]] = {}
+        lignes_ip = 0
+        if self.fichier is not None:
+            try:
+                connexion = self._connexion()
+                try:
+                    for client, route_ligne, *valeurs in connexion.execute("SELECT * FROM usage"):
+                        totaux[(client, route_ligne)] = valeurs
+                        if client.startswith("ip:") and client != CLIENT_AUTRES:
+                            lignes_ip += 1
+                finally:
+                    connexion.close()
+            except sqlite3.Error as e:
+                journal.error("Erreur lors de la lecture de %s: %s", self.fichier, e)
+        for cle, delta in deltas.items():
+            valeurs = totaux.get(cle)
+            totaux[cle] = delta if valeurs is None else [a + b for a, b in zip(valeurs, delta)]
+        return [
+            [client, route_ligne, *valeurs]
+            for (client, route_ligne), valeurs in totaux.items()
+            if route is None or route_ligne.partition(" ")[2].startswith(route)
+        ], lignes_ip
+
+    def rapport(self, tri: str = "duree", route: Optional[str] = None, limite: int = 20) -> Dict[str, Any]:
+        """
+        Renvoie les lignes (client, route) les plus consommatrices, tous
+        workers confondus (lit la base : à appeler hors de la boucle d'événements).
+
+        Args:
+            tri: "requetes", "erreurs", "octets" (envoyés) ou "duree"
+            route: Préfixe du modèle de route, toutes méthodes (ex: /scores)
+            limite: Nombre maximal de lignes
+
+        Returns:
+            Les lignes triées, avec pour chacune sa part du total de sa route
+        """
+        indice = TRIS[tri]
+        lignes, lignes_ip = self._lignes(route)
+
+        totaux_routes: Dict[str, float] = {}
+        for ligne in lignes:
+            totaux_routes[ligne[1]] = totaux_routes.get(ligne[1], 0) + ligne[2 + indice]
+
+        lignes.sort(key=lambda ligne: ligne[2 + indice], reverse=True)
+        resultat = []
+        for client, route_ligne, requetes, erreurs, octets_recus, octets_envoyes, duree_ms in lignes[:limite]:
+            total = totaux_routes[route_ligne]
+            valeur = (requetes, erreurs, octets_recus, octets_envoyes, duree_ms)[indice]
+            resultat.append({
+                "client": client,
+                "route": route_ligne,
+                "requetes": requetes,
+                "erreurs": erreurs,
+                "octets_recus": octets_recus,
+                "octets_envoyes": octets_envoyes,
+                "duree_ms": round(duree_ms, 1),
+                "duree_moyenne_ms": round(duree_ms / requetes, 3) if requetes else None,
+                "part_route": round(valeur / total, 4) if total else None,
+            })
+        return {
+            "depuis": datetime.fromtimestamp(self.depuis).isoformat(),
+            "tri": tri,
+            "lignes_ip": lignes_ip if self.fichier is not None else self._lignes_ip,
+            "lignes_ip_max": self.lignes_ip_max,
+            "lignes": resultat,
+        }
+
+
+class MiddlewareUsage:
+    """
+    Middleware ASGI qui mesure chaque requête HTTP (durée jusqu'au dernier
+    octet envoyé, octets reçus et envoyés) et l'ajoute au compteur, par
+    client et par modèle de route (/personnages/{id}, pas l'URL réelle).
+    """
+
+    def __init__(self, app, compteur: CompteurUsage, registre):
+        self.app = app
+        self.compteur = compteur
+        self.registre = registre
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        debut = time.perf_counter()
+        statut = 500
+        envoyes = 0
+
+        async def envoyer(message):
+            nonlocal statut, envoyes
+            if message["type"] == "http.response.start":
+                statut = message["status"]
+            elif message["type"] == "http.response.body":
+                envoyes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, envoyer)
+        finally:
+            recus = 0
+            for nom, valeur in scope["headers"]:
+                if nom == b"content-length":
+                    recus = int(valeur) if valeur.isdigit() else 0
+                    break
+            route = scope.get("route")
+            methode = scope["method"] if scope["method"] in METHODES else "AUTRE"
+            self.compteur.enregistrer(
+                identifiant_client(scope, self.registre),
+                f"{methode} {route.path if route is not None else '(aucune)'}",
+                statut,
+                recus,
+                envoyes,
+                (time.perf_counter() - debut) * 1000,
+            )
@@ -1,11 +1,16 @@
 import requests
+import argparse
 import json
+import math
+import queue
+import threading
 import time
 import random
 from pprint import pprint
 
 # Configuration
 WEBHOOK_URL = "http://localhost:8000/webhook/personnage"
+WEBHOOK_LOT_URL = "http://localhost:8000/webhook/personnages"
 PERSONNAGES = [
     {"nom": "Naruto", "score": 85},
     {"nom": "Sasuke", "score": 87},
@@ -52,6 +57,53 @@ def envoyer_evenement(personnage):
         print(f"Erreur de connexion: {str(e)}")
         return None
 
+def envoyer_lot(personnages):
+    """
+    Envoie plusieurs événements en une seule requête (route de lot).
+    
+    Args:
+        personnages: Liste de dictionnaires de personnages
+    
+    Returns:
+        La réponse de l'API
+    """
+    try:
+        print(f"Envoi d'un lot de {len(personnages)} événements...")
+        
+        response = requests.post(
+            WEBHOOK_LOT_URL,
+            json=personnages,
+            headers={"Content-Type": "application/json"}
+        )
+        
+        if response.status_code == 200:
+            print(f"Lot envoyé avec succès !")
+            return response.json()
+        else:
+            print(f"Erreur lors de l'envoi du lot: Status code {response.status_code}")
+            print(f"Réponse: {response.text}")
+            return None
+            
+    except requests.RequestException as e:
+        print(f"Erreur de connexion: {str(e)}")
+        return None
+
+def main_lot(taille_lot):
+    """
+    Envoie les personnages par lots de taille_lot via la route de lot.
+    """
+    print("=== Simulateur d'événements webhook pour personnages (mode lot) ===")
+    print(f"URL cible: {WEBHOOK_LOT_URL}\n")
+    
+    for debut in range(0, len(PERSONNAGES), taille_lot):
+        reponse = envoyer_lot(PERSONNAGES[debut:debut + taille_lot])
+        if reponse:
+            print("Réponse reçue:")
+            pprint(reponse)
+            print("=" * 40)
+    
+    print("\nSimulation terminée.")
+
 def main():
     """
     Fonction principale qui simule l'envoi de plusieurs événements webhook.
@@ -79,5 +131,211 @@ def main():
     
     print("\nSimulation terminée.")
 
+# Histogramme de latences à précision relative constante (à la HdrHistogram)
+class HistogrammeLatences:
+    """
+    Compte les valeurs (en microsecondes) dans des seaux dont la largeur
+    double à chaque puissance de deux : l'erreur relative reste inférieure
+    à 1 / 2^(bits - 1) quelle que soit la valeur, pour une mémoire minime.
+    """
+
+    def __init__(self, bits=8):
+        self.bits = bits
+        self.comptes = {}
+        self.total = 0
+        self.somme = 0
+        self.somme_carres = 0
+        self.maximum = 0
+
+    def _index(self, valeur):
+        if valeur < (1 << self.bits):
+            return valeur
+        decalage = valeur.bit_length() - self.bits
+        moitie = 1 << (self.bits - 1)
+        return (1 << self.bits) + (decalage - 1) * moitie + (valeur >> decalage) - moitie
+
+    def _borne_haute(self, index):
+        if index < (1 << self.bits):
+            return index
+        moitie = 1 << (self.bits - 1)
+        j = index - (1 << self.bits)
+        decalage = j // moitie + 1
+        haut = j % moitie + moitie
+        return ((haut + 1) << decalage) - 1
+
+    def enregistrer(self, valeur):
+        valeur = max(0, int(valeur))
+        index = self._index(valeur)
+        self.comptes[index] = self.comptes.get(index, 0) + 1
+        self.total += 1
+        self.somme += valeur
+        self.somme_carres += valeur * valeur
+        self.maximum = max(self.maximum, valeur)
+
+    def fusionner(self, autre):
+        for index, nombre in autre.comptes.items():
+            self.comptes[index] = self.comptes.get(index, 0) + nombre
+        self.total += autre.total
+        self.somme += autre.somme
+        self.somme_carres += autre.somme_carres
+        self.maximum = max(self.maximum, autre.maximum)
+
+    def percentile(self, p):
+        if not self.total:
+            return 0
+        rang = max(1, math.ceil(p / 100 * self.total))
+        cumul = 0
+        for index in sorted(self.comptes):
+            cumul += self.comptes[index]
+            if cumul >= rang:
+                return min(self._borne_haute(index), self.maximum)
+        return self.maximum
+
+    def rapport(self, unite=1000.0):
+        """
+        Distribution des percentiles au format de HdrHistogram
+        (valeurs en millisecondes), suivie du résumé.
+        """
+        lignes = [f"{'Valeur (ms)':>14} {'Percentile':>14} {'Nombre total':>14} {'1/(1-Percentile)':>18}", ""]
+        # Cinq percentiles par moitié restante (0, 0.1, ... 0.5, 0.55, ... 0.75, ...)
+        percentiles = []
+        k = 0
+        while self.total and 0.5 ** k >= 1 / self.total:
+            bas, haut = 1 - 0.5 ** k, 1 - 0.5 ** (k + 1)
+            percentiles.extend(bas + (haut - bas) * t / 5 for t in range(5))
+            k += 1
+        percentiles.append(1.0)
+
+        for p in percentiles:
+            rang = min(self.total, max(1, math.ceil(p * self.total)))
+            inverse = f"{1 / (1 - p):18.2f}" if p < 1 else f"{'inf':>18}"
+            lignes.append(f"{self.percentile(p * 100) / unite:14.3f} {p:14.6f} {rang:14d} {inverse}")
+        moyenne = self.somme / self.total if self.total else 0
+        variance = self.somme_carres / self.total - moyenne ** 2 if self.total else 0
+        lignes.append(f"#[Mean    = {moyenne / unite:12.3f}, StdDeviation   = {math.sqrt(max(0, variance)) / unite:12.3f}]")
+        lignes.append(f"#[Max     = {self.maximum / unite:12.3f}, Total count    = {self.total:12d}]")
+        return "\n".join(lignes)
+
+
+# Fonction pour construire le générateur d'événements synthétiques
+def generateur_evenements(rng, nb_noms, loi_noms, loi_scores):
+    noms = [f"Personnage {i}" for i in range(nb_noms)]
+    poids = None
+    if loi_noms == "zipf":
+        # Quelques personnages très fréquents, une longue traîne de rares
+        cumul = 0.0
+        poids = []
+        for rang in range(1, nb_noms + 1):
+            cumul += 1 / rang
+            poids.append(cumul)
+
+    def evenement():
+        nom = rng.choices(noms, cum_weights=poids)[0] if poids else rng.choice(noms)
+        if loi_scores == "normale":
+            score = min(100, max(0, round(rng.gauss(70, 15))))
+        else:
+            score = rng.randint(0, 100)
+        return {"nom": nom, "score": score}
+
+    return evenement
+
+def main_charge(args):
+    """
+    Génération de charge en boucle ouverte : les envois sont planifiés selon
+    le débit visé, indépendamment des réponses. La latence est mesurée depuis
+    l'instant d'envoi prévu (et non depuis l'envoi effectif), pour ne pas
+    masquer l'attente quand le serveur ou le client prend du retard
+    (« coordinated omission »).
+    """
+    print("=== Simulateur d'événements webhook pour personnages (mode charge) ===")
+    print(f"URL cible: {args.url}")
+    print(f"Débit visé: {args.debit} événements/s ({args.loi_arrivees}), durée: {args.duree} s, "
+          f"concurrence: {args.concurrence}\n")
+
+    rng = random.Random(args.graine)
+    evenement = generateur_evenements(rng, args.noms, args.loi_noms, args.loi_scores)
+    file = queue.Queue()
+    histogrammes = [HistogrammeLatences() for _ in range(args.concurrence)]
+    statuts = [{} for _ in range(args.concurrence)]
+
+    def travailleur(numero):
+        session = requests.Session()
+        histogramme, compte = histogrammes[numero], statuts[numero]
+        while True:
+            element = file.get()
+            if element is None:
+                return
+            prevu, corps = element
+            try:
+                response = session.post(args.url, data=corps, headers={"Content-Type": "application/json"}, timeout=10)
+                statut = response.status_code
+            except requests.RequestException as e:
+                statut = type(e).__name__
+            histogramme.enregistrer((time.perf_counter() - prevu) * 1_000_000)
+            compte[statut] = compte.get(statut, 0) + 1
+
+    threads = [threading.Thread(target=travailleur, args=(i,), daemon=True) for i in range(args.concurrence)]
+    for thread in threads:
+        thread.start()
+
+    debut = time.perf_counter() + 0.1
+    prevu = debut
+    planifies = 0
+    while True:
+        prevu += rng.expovariate(args.debit) if args.loi_arrivees == "poisson" else 1 / args.debit
+        if prevu - debut > args.duree:
+            break
+        attente = prevu - time.perf_counter()
+        if attente > 0:
+            time.sleep(attente)
+        file.put((prevu, json.dumps(evenement())))
+        planifies += 1
+
+    for _ in threads:
+        file.put(None)
+    for thread in threads:
+        thread.join()
+    fin = time.perf_counter()
+
+    histogramme = HistogrammeLatences()
+    compte = {}
+    for h, c in zip(histogrammes, statuts):
+        histogramme.fusionner(h)
+        for statut, nombre in c.items():
+            compte[statut] = compte.get(statut, 0) + nombre
+
+    print(histogramme.rapport())
+    print()
+    print(f"Événements planifiés : {planifies} ({planifies / args.duree:.1f}/s visés)")
+    print(f"Débit obtenu         : {histogramme.total / (fin - debut):.1f} réponses/s")
+    print(f"Réponses par statut  : {dict(sorted(compte.items(), key=lambda e: str(e[0])))}")
+    for p in (50, 90, 99, 99.9):
+        print(f"p{p:<5}: {histogramme.percentile(p) / 1000:.3f} ms")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Simulateur d'événements webhook")
+    parser.add_argument("--mode", choices=["unitaire", "lot", "charge"], default="unitaire",
+                        help="unitaire : un POST par événement ; lot : POST /webhook/personnages ; "
+                             "charge : génération de charge en boucle ouverte")
+    parser.add_argument("--taille-lot", type=int, default=len(PERSONNAGES),
+                        help="Nombre d'événements par lot (mode lot)")
+    parser.add_argument("--url", default=WEBHOOK_URL, help="URL cible (mode charge)")
+    parser.add_argument("--debit", type=float, default=100.0, help="Événements par seconde visés (mode charge)")
+    parser.add_argument("--loi-arrivees", choices=["poisson", "constante"], default="poisson",
+                        help="Arrivées de Poisson ou à intervalle constant (mode charge)")
+    parser.add_argument("--duree", type=float, default=10.0, help="Durée en secondes (mode charge)")
+    parser.add_argument("--concurrence", type=int, default=16, help="Connexions simultanées (mode charge)")
+    parser.add_argument("--noms", type=int, default=1000, help="Nombre de personnages distincts (mode charge)")
+    parser.add_argument("--loi-noms", choices=["uniforme", "zipf"], default="zipf",
+                        help="Répartition des personnages (mode charge)")
+    parser.add_argument("--loi-scores", choices=["uniforme", "normale"], default="normale",
+                        help="Répartition des scores : uniforme sur 0-100 ou normale (70, 15) (mode charge)")
+    parser.add_argument("--graine", type=int, default=None, help="Graine aléatoire (mode charge)")
+    args = parser.parse_args()
+
+    if args.mode == "charge":
+        main_charge(args)
+    elif args.mode == "lot":
+        main_lot(max(1, args.taille_lot))
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from coalescence import Coalesceur
+
+# Flux d'événements : DEBIT par seconde pendant DUREE s, envoyés par paquets
+DEBIT = 2000
+DUREE = 3.0
+INTERVALLE = 0.01
+
+FENETRE_MS = 500
+
+# Mises à jour successives d'un même personnage (1 : aucun doublon)
+DUPLICATIONS = [1, 5, 20]
+
+
+def mesurer(fichier: str, duplication: int, fenetre_ms: float, resume: bool) -> Dict[str, Any]:
+    """
+    Puits fichier (comme notifications.txt) : une écriture par appel, une
+    ligne par notification (une seule ligne par résumé).
+    """
+    duree_puits = 0.0
+
+    def ecrire(evenements: List[Dict[str, Any]], resume: bool):
+        nonlocal duree_puits
+        debut = time.perf_counter()
+        if resume:
+            contenu = "Résumé: " + "; ".join(f"{e['nom']} ({e['score']})" for e in evenements) + "\n"
+        else:
+            contenu = "".join(f"Nouveau personnage: {e['nom']} - Score: {e['score']}\n" for e in evenements)
+        with open(fichier, "a", encoding="utf-8") as f:
+            f.write(contenu)
+            f.flush()
+            os.fsync(f.fileno())
+        duree_puits += time.perf_counter() - debut
+
+    coalesceur = Coalesceur("fichier", ecrire, fenetre_ms, resume)
+    coalesceur.demarrer()
+    par_paquet = int(DEBIT * INTERVALLE)
+    numero = 0
+    debut = time.perf_counter()
+    prochain = debut
+    while prochain - debut < DUREE:
+        paquet = []
+        for _ in range(par_paquet):
+            paquet.append({"nom": f"Personnage {numero // duplication}", "score": numero % 101})
+            numero += 1
+        coalesceur.ajouter(paquet)
+        prochain += INTERVALLE
+        time.sleep(max(0.0, prochain - time.perf_counter()))
+    coalesceur.arreter()
+
+    with open(fichier, "r", encoding="utf-8") as f:
+        lignes = sum(1 for _ in f)
+    os.remove(fichier)
+    return {**coalesceur.statistiques(), "lignes": lignes, "duree_puits": duree_puits}
+
+
+def main_benchmark():
+    print(f"=== Puits fichier (fsync par écriture) : {DEBIT} événements/s pendant {DUREE:.0f} s, fenêtre {FENETRE_MS} ms ===")
+    with tempfile.TemporaryDirectory() as dossier:
+        fichier = os.path.join(dossier, "notifications.txt")
+        for duplication in DUPLICATIONS:
+            print(f"  {duplication} mise(s) à jour par personnage")
+            for nom, fenetre_ms, resume in [
+                ("Sans regroupement", 0, False),
+                ("Regroupement par nom", FENETRE_MS, False),
+                ("Résumé par fenêtre ", FENETRE_MS, True),
+            ]:
+                resultat = mesurer(fichier, duplication, fenetre_ms, resume)
+                print(
+                    f"    {nom} : {resultat['recus']:6} événements -> {resultat['envoyes']:6} notifications, "
+                    f"{resultat['appels']:4} écritures, {resultat['lignes']:6} lignes, "
+                    f"puits occupé {resultat['duree_puits'] * 1000:7.1f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main_benchmark()
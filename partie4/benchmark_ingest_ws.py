@@ -0,0 +1,107 @@
+import asyncio
+import json
+import multiprocessing
+import time
+from typing import List
+
+import httpx
+import websockets
+
+PORT = 8766
+NB_EVENEMENTS = 20_000
+CONCURRENCE_HTTP = 16  # requêtes HTTP en vol (connexions keep-alive)
+FENETRE_WS = 1024      # messages WebSocket envoyés sans attendre d'acquittement
+
+
+def lancer_serveur():
+    import uvicorn
+
+    import main
+
+    # Les puits (log, notifications) sont neutralisés : on ne mesure que l'ingestion
+    main.log_event = lambda event: None
+    main.notify_subscribers = lambda event: None
+    main.log_events = lambda events: None
+    main.ordonnanceur_notifications.envoyer = lambda events, arrivees: None
+    uvicorn.run(main.app, host="127.0.0.1", port=PORT, log_level="warning")
+
+
+def generer_corps(nombre: int) -> List[str]:
+    return [json.dumps({"nom": f"Personnage {i % 500}", "score": i % 101}) for i in range(nombre)]
+
+
+async def attendre_serveur():
+    async with httpx.AsyncClient() as client:
+        for _ in range(100):
+            try:
+                await client.get(f"http://127.0.0.1:{PORT}/")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError("Le serveur n'a pas démarré")
+
+
+async def mesurer_http(corps_liste: List[str]) -> float:
+    limites = httpx.Limits(max_connections=CONCURRENCE_HTTP, max_keepalive_connections=CONCURRENCE_HTTP)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", limits=limites) as client:
+        file = iter(corps_liste)
+
+        async def travailleur():
+            for corps in file:
+                reponse = await client.post(
+                    "/webhook/personnage", content=corps, headers={"content-type": "application/json"}
+                )
+                assert reponse.status_code == 200, reponse.status_code
+
+        debut = time.perf_counter()
+        await asyncio.gather(*(travailleur() for _ in range(CONCURRENCE_HTTP)))
+        return len(corps_liste) / (time.perf_counter() - debut)
+
+
+async def mesurer_ws(corps_liste: List[str]) -> float:
+    async with websockets.connect(f"ws://127.0.0.1:{PORT}/webhook/ws") as ws:
+        acquittes = 0
+        fenetre = asyncio.Semaphore(FENETRE_WS)
+
+        async def lire_acquittements():
+            nonlocal acquittes
+            while acquittes < len(corps_liste):
+                ack = json.loads(await ws.recv())
+                assert not ack["erreurs"], ack["erreurs"]
+                for _ in range(ack["ack"] - acquittes):
+                    fenetre.release()
+                acquittes = ack["ack"]
+
+        debut = time.perf_counter()
+        lecteur = asyncio.create_task(lire_acquittements())
+        for corps in corps_liste:
+            await fenetre.acquire()
+            await ws.send(corps)
+        await lecteur
+        return len(corps_liste) / (time.perf_counter() - debut)
+
+
+async def mesurer(corps_liste: List[str]):
+    await attendre_serveur()
+    # Échauffement des deux chemins
+    await mesurer_http(corps_liste[:500])
+    await mesurer_ws(corps_liste[:500])
+    return await mesurer_http(corps_liste), await mesurer_ws(corps_liste)
+
+
+def main_benchmark():
+    serveur = multiprocessing.Process(target=lancer_serveur, daemon=True)
+    serveur.start()
+    try:
+        http, ws = asyncio.run(mesurer(generer_corps(NB_EVENEMENTS)))
+    finally:
+        serveur.terminate()
+        serveur.join()
+
+    print(f"=== Ingestion de {NB_EVENEMENTS} événements (uvicorn, 1 worker, puits neutralisés) ===")
+    print(f"  POST /webhook/personnage ({CONCURRENCE_HTTP} requêtes en vol) : {http:10,.0f} événements/s")
+    print(f"  WS /webhook/ws (fenêtre de {FENETRE_WS} messages)       : {ws:10,.0f} événements/s   (x{ws / http:.2f})")
+
+
+if __name__ == "__main__":
+    main_benchmark()
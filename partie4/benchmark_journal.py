@@ -0,0 +1,125 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+import httpx
+
+PORT = 8767
+NB_EVENEMENTS = 3_000
+CONCURRENCE_HTTP = 16
+
+# Consommateur lent de la sortie standard : 4 Ko lus toutes les 200 ms (~20 Ko/s),
+# comme un pipe vers un collecteur de logs ou journald qui ne suit pas
+TAILLE_LECTURE = 4096
+PAUSE_LECTURE = 0.2
+
+DOSSIER = os.path.dirname(os.path.abspath(__file__))
+
+SERVEUR = f"""
+import sys
+sys.path.insert(0, {DOSSIER!r})
+import uvicorn
+import main
+uvicorn.run(main.app, host="127.0.0.1", port={PORT}, log_level="warning")
+"""
+
+
+def consommer_lentement(sortie, arret: threading.Event) -> None:
+    descripteur = sortie.fileno()
+    while not arret.is_set():
+        if not os.read(descripteur, TAILLE_LECTURE):
+            return
+        time.sleep(PAUSE_LECTURE)
+
+
+def generer_corps(nombre: int) -> List[str]:
+    return [json.dumps({"nom": f"Personnage {i % 500}", "score": i % 101}) for i in range(nombre)]
+
+
+async def attendre_serveur(client: httpx.AsyncClient):
+    for _ in range(100):
+        try:
+            await client.get("/")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Le serveur n'a pas démarré")
+
+
+async def mesurer(corps_liste: List[str]) -> Dict[str, float]:
+    limites = httpx.Limits(max_connections=CONCURRENCE_HTTP, max_keepalive_connections=CONCURRENCE_HTTP)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", limits=limites, timeout=60) as client:
+        await attendre_serveur(client)
+        file = iter(corps_liste)
+        latences = []
+
+        async def travailleur():
+            for corps in file:
+                debut = time.perf_counter()
+                reponse = await client.post(
+                    "/webhook/personnage", content=corps, headers={"content-type": "application/json"}
+                )
+                latences.append(time.perf_counter() - debut)
+                assert reponse.status_code == 200, reponse.status_code
+
+        debut = time.perf_counter()
+        await asyncio.gather(*(travailleur() for _ in range(CONCURRENCE_HTTP)))
+        duree_reception = time.perf_counter() - debut
+
+        # Les événements sont traités (log, notifications) après la réponse :
+        # on attend que la file de travail soit vide
+        while True:
+            charge = (await client.get("/webhook/charge")).json()
+            if charge["en_attente"] == 0:
+                break
+            await asyncio.sleep(0.05)
+        duree_traitement = time.perf_counter() - debut
+
+    latences.sort()
+    return {
+        "reception": len(corps_liste) / duree_reception,
+        "traitement": len(corps_liste) / duree_traitement,
+        "p99": latences[int(len(latences) * 0.99)] * 1000,
+        "perdus": charge["journal"]["perdus"],
+    }
+
+
+def mesurer_mode(asynchrone: bool, corps_liste: List[str]) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as dossier:
+        environnement = {**os.environ, "LOG_ASYNCHRONE": "1" if asynchrone else "0", "OUTBOX_DURABLE": "0"}
+        serveur = subprocess.Popen(
+            [sys.executable, "-c", SERVEUR], cwd=dossier, env=environnement, stdout=subprocess.PIPE
+        )
+        arret = threading.Event()
+        lecteur = threading.Thread(target=consommer_lentement, args=(serveur.stdout, arret), daemon=True)
+        lecteur.start()
+        try:
+            return asyncio.run(mesurer(corps_liste))
+        finally:
+            arret.set()
+            serveur.terminate()
+            serveur.wait()
+
+
+def main_benchmark():
+    corps_liste = generer_corps(NB_EVENEMENTS)
+    synchrone = mesurer_mode(False, corps_liste)
+    asynchrone = mesurer_mode(True, corps_liste)
+
+    print(f"=== POST /webhook/personnage : {NB_EVENEMENTS} événements, stdout lu à ~{TAILLE_LECTURE / PAUSE_LECTURE / 1000:.0f} Ko/s ===")
+    for nom, resultat in [("Écriture directe (comme print)", synchrone), ("QueueHandler / QueueListener ", asynchrone)]:
+        print(
+            f"  {nom} : reçus {resultat['reception']:6,.0f}/s (p99 {resultat['p99']:6.1f} ms), "
+            f"traités {resultat['traitement']:6,.0f}/s, {resultat['perdus']} message(s) abandonné(s)"
+        )
+    print(f"  Gain sur le traitement : x{asynchrone['traitement'] / synchrone['traitement']:.2f}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,72 @@
+import random
+import time
+from typing import Dict, List
+
+from ordonnancement import OrdonnanceurVoies, lire_valeurs_voies
+from traitement import calculer_niveau
+
+# Puits lent : 2 ms par notification (comme un appel HTTP à /notifier), soit ~500/s
+DUREE_ENVOI = 0.002
+
+# Arrivées à 1,5 fois la capacité pendant DUREE s, par paquets toutes les 10 ms
+DEBIT_ARRIVEES = 750
+DUREE = 6.0
+INTERVALLE = 0.01
+
+POIDS = "légendaire=8,expert=4,intermédiaire=2,débutant=1"
+NIVEAUX = ["légendaire", "expert", "intermédiaire", "débutant"]
+
+
+def mesurer(voies: bool) -> Dict[str, List[float]]:
+    latences: Dict[str, List[float]] = {niveau: [] for niveau in NIVEAUX}
+
+    def envoyer(evenements, arrivees):
+        for evenement in evenements:
+            time.sleep(DUREE_ENVOI)
+            latences[evenement["niveau"]].append((time.perf_counter() - evenement["arrivee"]) * 1000)
+
+    if voies:
+        ordonnanceur = OrdonnanceurVoies(envoyer, lambda e: e["niveau"], lire_valeurs_voies(POIDS))
+    else:
+        ordonnanceur = OrdonnanceurVoies(envoyer, lambda e: "fifo", {"fifo": 1})
+    ordonnanceur.demarrer()
+
+    aleatoire = random.Random(42)
+    par_paquet = int(DEBIT_ARRIVEES * INTERVALLE)
+    debut = time.perf_counter()
+    prochain = debut
+    while prochain - debut < DUREE:
+        maintenant = time.perf_counter()
+        paquet = []
+        for _ in range(par_paquet):
+            score = aleatoire.randint(0, 100)
+            paquet.append({"nom": "Personnage", "score": score, "niveau": calculer_niveau(score), "arrivee": maintenant})
+        ordonnanceur.soumettre(paquet)
+        prochain += INTERVALLE
+        time.sleep(max(0.0, prochain - time.perf_counter()))
+    ordonnanceur.arreter()  # envoie ce qui reste en file
+    return latences
+
+
+def resume(latences: List[float]) -> str:
+    latences = sorted(latences)
+    return (
+        f"p50 {latences[len(latences) // 2]:7.0f} ms, p99 {latences[int(len(latences) * 0.99)]:7.0f} ms "
+        f"({len(latences)} notifications)"
+    )
+
+
+def main_benchmark():
+    print(
+        f"=== Notifications : {DEBIT_ARRIVEES}/s pendant {DUREE:.0f} s, puits à ~{1 / DUREE_ENVOI:.0f}/s "
+        f"(surcharge x{DEBIT_ARRIVEES * DUREE_ENVOI:.1f}) ==="
+    )
+    for nom, voies in [("File unique (FIFO)", False), (f"Voies pondérées ({POIDS})", True)]:
+        latences = mesurer(voies)
+        print(f"  {nom}")
+        for niveau in NIVEAUX:
+            print(f"    {niveau:14} : {resume(latences[niveau])}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
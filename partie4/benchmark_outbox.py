@@ -0,0 +1,111 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import main
+from outbox import Outbox
+
+NB_EVENEMENTS = 20_000
+CONCURRENCE = 64  # requêtes en cours simultanément sur la boucle
+
+# Les puits (log, notifications) sont neutralisés : on ne mesure que l'ingestion
+main.log_events = lambda events: None
+main.ordonnanceur_notifications.envoyer = lambda events, arrivees: None
+
+
+def generer_corps(nombre: int) -> List[bytes]:
+    return [
+        json.dumps({"nom": f"Personnage {i % 500}", "score": i % 101}).encode("utf-8")
+        for i in range(nombre)
+    ]
+
+
+async def envoyer(corps: bytes) -> int:
+    """
+    Appelle l'application ASGI directement (sans réseau), comme le ferait uvicorn.
+    """
+    scope: Dict[str, Any] = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/webhook/personnage",
+        "raw_path": b"/webhook/personnage",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(corps)).encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+    statut = 0
+
+    async def receive():
+        return {"type": "http.request", "body": corps, "more_body": False}
+
+    async def send(message):
+        nonlocal statut
+        if message["type"] == "http.response.start":
+            statut = message["status"]
+
+    await main.app(scope, receive, send)
+    return statut
+
+
+async def mesurer(corps_liste: List[bytes]) -> float:
+    file = iter(corps_liste)
+
+    async def client():
+        for corps in file:
+            statut = await envoyer(corps)
+            assert statut == 200, statut
+
+    debut = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(CONCURRENCE)))
+    return len(corps_liste) / (time.perf_counter() - debut)
+
+
+async def mesurer_outbox(corps_liste: List[bytes], fichier: str, synchrone: str):
+    main.outbox = Outbox(fichier, synchrone=synchrone)
+    main.outbox.demarrer(main.etapes_publication())
+    try:
+        await mesurer(corps_liste[:500])  # échauffement
+        debit = await mesurer(corps_liste)
+    finally:
+        main.outbox.arreter()
+    statistiques = main.outbox.statistiques()
+    main.outbox = None
+    return debit, statistiques
+
+
+def main_benchmark():
+    corps_liste = generer_corps(NB_EVENEMENTS)
+
+    # Chemin en mémoire : pool de travail, rien n'est écrit avant l'acquittement
+    main.outbox = None
+    main.pool_travail.demarrer()
+    asyncio.run(mesurer(corps_liste[:500]))
+    memoire = asyncio.run(mesurer(corps_liste))
+    main.pool_travail.arreter()
+
+    resultats = {}
+    with tempfile.TemporaryDirectory() as dossier:
+        for synchrone in ("NORMAL", "FULL"):
+            fichier = os.path.join(dossier, f"outbox_{synchrone}.db")
+            resultats[synchrone] = asyncio.run(mesurer_outbox(corps_liste, fichier, synchrone))
+
+    print(f"=== POST /webhook/personnage : {NB_EVENEMENTS} événements, {CONCURRENCE} requêtes en vol, 1 cœur ===")
+    print(f"  En mémoire (pool de travail)        : {memoire:10,.0f} événements/s")
+    for synchrone, (debit, statistiques) in resultats.items():
+        print(
+            f"  Outbox SQLite (synchronous={synchrone:6}) : {debit:10,.0f} événements/s   "
+            f"({debit / memoire:.0%}, {statistiques['evenements_par_transaction']} événements/transaction, "
+            f"{statistiques['en_attente']} en attente)"
+        )
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,156 @@
+import asyncio
+import contextlib
+import io
+import json
+import time
+from typing import Any, Dict, List
+
+from fastapi import BackgroundTasks, FastAPI
+
+import main
+from main import PersonnageEvent
+
+NB_EVENEMENTS = 20_000
+
+# Les puits (log, notifications) sont neutralisés : on ne mesure que l'ingestion
+main.log_event = lambda event: None
+main.notify_subscribers = lambda event: None
+main.log_events = lambda events: None
+main.ordonnanceur_notifications.envoyer = lambda events, arrivees: None
+
+# Traitement en mémoire (l'outbox n'est pas démarrée hors du cycle de vie de l'application)
+main.outbox = None
+main.pool_travail.demarrer()
+
+
+# Ancienne version du handler, conservée à l'identique pour comparaison
+ancienne_app = FastAPI()
+
+@ancienne_app.post("/webhook/personnage")
+async def ancien_webhook_personnage(event: PersonnageEvent, background_tasks: BackgroundTasks):
+    print(f"Événement de personnage reçu: {event.dict()}")
+
+    niveau = "débutant"
+    if event.score >= 90:
+        niveau = "légendaire"
+    elif event.score >= 75:
+        niveau = "expert"
+    elif event.score >= 50:
+        niveau = "intermédiaire"
+
+    response = {
+        "message": f"Événement reçu pour le personnage {event.nom}",
+        "personnage": {
+            "nom": event.nom,
+            "score": event.score,
+            "niveau": niveau
+        }
+    }
+
+    event_to_log = response["personnage"]
+    background_tasks.add_task(main.log_event, event_to_log)
+    background_tasks.add_task(main.notify_subscribers, event_to_log)
+
+    return response
+
+
+def generer_corps(nombre: int) -> List[bytes]:
+    return [
+        json.dumps({"nom": f"Personnage {i % 500}", "score": i % 101}).encode("utf-8")
+        for i in range(nombre)
+    ]
+
+
+async def envoyer(app, corps: bytes) -> int:
+    """
+    Appelle l'application ASGI directement (sans réseau), comme le ferait uvicorn.
+    """
+    scope: Dict[str, Any] = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/webhook/personnage",
+        "raw_path": b"/webhook/personnage",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(corps)).encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+    statut = 0
+
+    async def receive():
+        return {"type": "http.request", "body": corps, "more_body": False}
+
+    async def send(message):
+        nonlocal statut
+        if message["type"] == "http.response.start":
+            statut = message["status"]
+
+    await app(scope, receive, send)
+    return statut
+
+
+async def mesurer(app, corps_liste: List[bytes]) -> float:
+    # Échauffement (construction des routes, caches de validation)
+    for corps in corps_liste[:200]:
+        await envoyer(app, corps)
+
+    debut = time.perf_counter()
+    for corps in corps_liste:
+        statut = await envoyer(app, corps)
+        assert statut == 200, statut
+    return len(corps_liste) / (time.perf_counter() - debut)
+
+
+def ingestion_avant(corps: bytes) -> Dict[str, Any]:
+    """
+    Chemin d'ingestion de l'ancien handler : dict, modèle, event.dict() pour le print.
+    """
+    event = PersonnageEvent(**json.loads(corps))
+    print(f"Événement de personnage reçu: {event.model_dump()}")
+    return {
+        "message": f"Événement reçu pour le personnage {event.nom}",
+        "personnage": {"nom": event.nom, "score": event.score, "niveau": main.calculer_niveau(event.score)},
+    }
+
+
+def ingestion_apres(corps: bytes) -> Dict[str, Any]:
+    """
+    Nouveau chemin : validation depuis les octets, un seul dict partagé.
+    """
+    event = main.valider_evenement(corps)
+    personnage = {"nom": event.nom, "score": event.score, "niveau": main.calculer_niveau(event.score)}
+    return {"message": f"Événement reçu pour le personnage {event.nom}", "personnage": personnage}
+
+
+def mesurer_ingestion(fonction, corps_liste: List[bytes]) -> float:
+    debut = time.perf_counter()
+    for corps in corps_liste:
+        fonction(corps)
+    return len(corps_liste) / (time.perf_counter() - debut)
+
+
+def main_benchmark():
+    corps_liste = generer_corps(NB_EVENEMENTS)
+
+    # Le print() de l'ancien code écrit dans un tampon, pas dans un terminal
+    with contextlib.redirect_stdout(io.StringIO()):
+        avant = asyncio.run(mesurer(ancienne_app, corps_liste))
+        ingestion_avant_debit = mesurer_ingestion(ingestion_avant, corps_liste)
+    apres = asyncio.run(mesurer(main.app, corps_liste))
+    ingestion_apres_debit = mesurer_ingestion(ingestion_apres, corps_liste)
+
+    print(f"=== POST /webhook/personnage : {NB_EVENEMENTS} événements, 1 cœur ===")
+    print("Requête ASGI complète (sans réseau) :")
+    print(f"  Avant : {avant:12,.0f} événements/s")
+    print(f"  Après : {apres:12,.0f} événements/s   (x{apres / avant:.2f})")
+    print("Ingestion seule (validation + enrichissement + réponse) :")
+    print(f"  Avant : {ingestion_avant_debit:12,.0f} événements/s")
+    print(f"  Après : {ingestion_apres_debit:12,.0f} événements/s   (x{ingestion_apres_debit / ingestion_avant_debit:.2f})")
+
+
+if __name__ == "__main__":
+    main_benchmark()
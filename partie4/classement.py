@@ -0,0 +1,181 @@
+import threading
+from bisect import bisect_left, insort
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Taille maximale d'un seau de la liste triée avant découpage
+CHARGE_SEAU = 512
+
+
+class ListeTriee:
+    """
+    Liste triée découpée en seaux de taille bornée : l'insertion et la
+    suppression coûtent O(log n) pour trouver le seau, plus un décalage
+    limité à la taille du seau ; lire les K premiers éléments coûte O(K).
+    """
+
+    def __init__(self, charge: int = CHARGE_SEAU):
+        self.charge = charge
+        self._seaux: List[List[Any]] = []
+        self._maximums: List[Any] = []  # dernier élément de chaque seau
+        self._taille = 0
+
+    def __len__(self) -> int:
+        return self._taille
+
+    def ajouter(self, valeur: Any) -> None:
+        if not self._seaux:
+            self._seaux.append([valeur])
+            self._maximums.append(valeur)
+            self._taille = 1
+            return
+
+        i = min(bisect_left(self._maximums, valeur), len(self._seaux) - 1)
+        seau = self._seaux[i]
+        insort(seau, valeur)
+        self._maximums[i] = seau[-1]
+        self._taille += 1
+
+        if len(seau) > 2 * self.charge:
+            # Découpage en deux seaux de taille "charge"
+            self._seaux[i:i + 1] = [seau[:self.charge], seau[self.charge:]]
+            self._maximums[i:i + 1] = [seau[self.charge - 1], seau[-1]]
+
+    def retirer(self, valeur: Any) -> bool:
+        i = bisect_left(self._maximums, valeur)
+        if i == len(self._seaux):
+            return False
+        seau = self._seaux[i]
+        j = bisect_left(seau, valeur)
+        if j == len(seau) or seau[j] != valeur:
+            return False
+
+        del seau[j]
+        self._taille -= 1
+        if seau:
+            self._maximums[i] = seau[-1]
+        else:
+            del self._seaux[i]
+            del self._maximums[i]
+        return True
+
+    def premiers(self, k: int) -> Iterator[Any]:
+        """
+        Parcourt les k plus petits éléments, dans l'ordre.
+        """
+        for seau in self._seaux:
+            for valeur in seau:
+                if k <= 0:
+                    return
+                yield valeur
+                k -= 1
+
+    def rang(self, valeur: Any) -> int:
+        """
+        Nombre d'éléments strictement plus petits (O(nombre de seaux)).
+        """
+        i = bisect_left(self._maximums, valeur)
+        avant = sum(len(seau) for seau in self._seaux[:i])
+        if i < len(self._seaux):
+            avant += bisect_left(self._seaux[i], valeur)
+        return avant
+
+
+class Classement:
+    """
+    Classement en direct des personnages : meilleur score par nom, et top-K
+    global et par niveau. Chaque événement met à jour les listes triées en
+    O(log n) ; la lecture du top-K ne parcourt que K entrées.
+
+    Les entrées sont triées par (-score, nom) : meilleur score d'abord, puis
+    ordre alphabétique en cas d'égalité.
+    """
+
+    def __init__(self, calculer_niveau: Callable[[int], str]):
+        self.calculer_niveau = calculer_niveau
+        self._meilleurs: Dict[str, int] = {}
+        self._global = ListeTriee()
+        self._par_niveau: Dict[str, ListeTriee] = {}
+        self._evenements = 0
+        self._verrou = threading.Lock()
+
+    def ajouter(self, nom: str, score: int) -> bool:
+        """
+        Prend en compte un événement de score.
+
+        Returns:
+            True si le meilleur score du personnage a changé
+        """
+        with self._verrou:
+            self._evenements += 1
+            precedent = self._meilleurs.get(nom)
+            if precedent is not None and score <= precedent:
+                return False
+
+            if precedent is not None:
+                self._global.retirer((-precedent, nom))
+                self._par_niveau[self.calculer_niveau(precedent)].retirer((-precedent, nom))
+
+            self._meilleurs[nom] = score
+            self._global.ajouter((-score, nom))
+            niveau = self.calculer_niveau(score)
+            if niveau not in self._par_niveau:
+                self._par_niveau[niveau] = ListeTriee()
+            self._par_niveau[niveau].ajouter((-score, nom))
+            return True
+
+    def reconstruire(self, evenements: Iterable[Dict[str, Any]]) -> int:
+        """
+        Repart de zéro et rejoue les événements du journal.
+
+        Returns:
+            Le nombre d'événements rejoués
+        """
+        with self._verrou:
+            self._meilleurs = {}
+            self._global = ListeTriee()
+            self._par_niveau = {}
+            self._evenements = 0
+
+        nombre = 0
+        for evenement in evenements:
+            try:
+                self.ajouter(str(evenement["nom"]), int(evenement["score"]))
+                nombre += 1
+            except (KeyError, TypeError, ValueError):
+                continue
+        return nombre
+
+    def top(self, k: int, niveau: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Renvoie les k meilleurs personnages, au total ou pour un niveau.
+        """
+        with self._verrou:
+            liste = self._global if niveau is None else self._par_niveau.get(niveau, ListeTriee())
+            entrees: List[Tuple[int, str]] = list(liste.premiers(k))
+            total = len(liste)
+
+        return {
+            "niveau": niveau,
+            "total": total,
+            "top": [
+                {"rang": rang, "nom": nom, "score": -score, "niveau": self.calculer_niveau(-score)}
+                for rang, (score, nom) in enumerate(entrees, start=1)
+            ],
+        }
+
+    def position(self, nom: str) -> Optional[Dict[str, Any]]:
+        """
+        Renvoie le meilleur score et le rang (global et dans son niveau) d'un personnage.
+        """
+        with self._verrou:
+            score = self._meilleurs.get(nom)
+            if score is None:
+                return None
+            niveau = self.calculer_niveau(score)
+            return {
+                "nom": nom,
+                "score": score,
+                "niveau": niveau,
+                "rang": self._global.rang((-score, nom)) + 1,
+                "rang_niveau": self._par_niveau[niveau].rang((-score, nom)) + 1,
+            }
@@ -0,0 +1,173 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+journal = logging.getLogger(__name__)
+
+# Un envoi emporte aussi les événements dont la fenêtre se termine dans ce
+# délai (part de la fenêtre) : moins d'écritures, un peu en avance
+AVANCE_MAX = 0.1
+
+
+class Coalesceur:
+    """
+    Regroupe les notifications d'un puits (console, fichier, /notifier...)
+    par fenêtre de fenetre_ms : les événements d'un même nom reçus pendant
+    la fenêtre n'en font qu'un, avec le dernier état, envoyé fenetre_ms
+    après le premier. En mode résumé, tout ce qui est arrivé pendant la
+    fenêtre est envoyé en un seul appel (un résumé par fenêtre).
+
+    Avec une fenêtre nulle, chaque lot est transmis tel quel, sans thread ;
+    les événements pour lesquels immediat est vrai (voie prioritaire) le
+    sont aussi, depuis le thread appelant, sans attendre de fenêtre. Un
+    état plus ancien du même nom encore en attente est alors abandonné,
+    pour qu'il ne soit pas envoyé après (le dernier état l'emporte).
+
+    Args:
+        nom: Nom du puits (statistiques, journal)
+        envoyer: Fonction (événements, resume) qui écrit dans le puits
+        fenetre_ms: Durée de la fenêtre de regroupement (millisecondes)
+        resume: True pour un seul envoi par fenêtre
+        cle: Fonction donnant la clé de regroupement d'un événement
+        immediat: Fonction indiquant les événements à ne jamais retarder
+        livraison: Fonction (événements, instants d'arrivée) appelée après
+            chaque écriture réussie, pour mesurer la latence jusqu'au puits
+    """
+
+    def __init__(
+        self,
+        nom: str,
+        envoyer: Callable[[List[Dict[str, Any]], bool], None],
+        fenetre_ms: float = 0,
+        resume: bool = False,
+        cle: Callable[[Dict[str, Any]], Any] = lambda evenement: evenement["nom"],
+        immediat: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        livraison: Optional[Callable[[List[Dict[str, Any]], List[float]], None]] = None,
+    ):
+        self.nom = nom
+        self.envoyer = envoyer
+        self.fenetre = fenetre_ms / 1000
+        self.resume = resume
+        self.cle = cle
+        self.immediat = immediat
+        self.livraison = livraison
+        # clé -> [instant du premier événement, dernier événement, arrivée du
+        # premier] ; l'ordre d'insertion du dict est celui des échéances
+        self._en_attente: Dict[Any, list] = {}
+        self._condition = threading.Condition()
+        self._arret = False
+        self._thread: Optional[threading.Thread] = None
+        self.recus = 0
+        self.envoyes = 0
+        self.appels = 0
+
+    def demarrer(self) -> None:
+        if self.fenetre <= 0:
+            return
+        self._arret = False
+        self._thread = threading.Thread(target=self._boucle, name=f"coalescence-{self.nom}", daemon=True)
+        self._thread.start()
+
+    def arreter(self) -> None:
+        """
+        Arrête le thread après avoir envoyé les notifications en attente.
+        """
+        with self._condition:
+            self._arret = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def ajouter(self, evenements: List[Dict[str, Any]], arrivees: Optional[List[float]] = None) -> None:
+        """
+        Args:
+            evenements: Événements à notifier
+            arrivees: Instants d'arrivée (time.perf_counter), transmis à livraison
+        """
+        if arrivees is None:
+            arrivees = [time.perf_counter()] * len(evenements)
+        if self.fenetre <= 0 or self._thread is None:
+            self.recus += len(evenements)
+            self._envoyer(list(zip(evenements, arrivees)))
+            return
+        immediats = []
+        maintenant = time.monotonic()
+        with self._condition:
+            self.recus += len(evenements)
+            vide = not self._en_attente
+            for evenement, arrivee in zip(evenements, arrivees):
+                cle = self.cle(evenement)
+                if self.immediat is not None and self.immediat(evenement):
+                    self._en_attente.pop(cle, None)
+                    immediats.append((evenement, arrivee))
+                    continue
+                entree = self._en_attente.get(cle)
+                if entree is None:
+                    self._en_attente[cle] = [maintenant, evenement, arrivee]
+                else:
+                    entree[1] = evenement
+            if vide and self._en_attente:
+                self._condition.notify()
+        self._envoyer(immediats)
+
+    def _envoyer(self, echus: List[Tuple[Dict[str, Any], float]]) -> None:
+        if not echus:
+            return
+        evenements = [evenement for evenement, _ in echus]
+        try:
+            self.envoyer(evenements, self.resume)
+            if self.livraison is not None:
+                self.livraison(evenements, [arrivee for _, arrivee in echus])
+        except Exception:
+            journal.exception("Erreur lors de l'envoi des notifications (%s)", self.nom)
+        with self._condition:
+            self.envoyes += len(echus)
+            self.appels += 1
+
+    def _echus(self, maintenant: float) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Retire les événements dont la fenêtre est écoulée (tous en mode
+        résumé, dès que la fenêtre du plus ancien l'est).
+        """
+        echus = []
+        limite = maintenant + self.fenetre * AVANCE_MAX
+        for cle, (premier, evenement, arrivee) in list(self._en_attente.items()):
+            if premier + self.fenetre > (limite if echus else maintenant) and not (self.resume and echus):
+                break
+            echus.append((evenement, arrivee))
+            del self._en_attente[cle]
+        return echus
+
+    def _boucle(self) -> None:
+        while True:
+            with self._condition:
+                while True:
+                    maintenant = time.monotonic()
+                    if self._arret:
+                        echus = [(evenement, arrivee) for _, evenement, arrivee in self._en_attente.values()]
+                        self._en_attente.clear()
+                        break
+                    echus = self._echus(maintenant)
+                    if echus:
+                        break
+                    if self._en_attente:
+                        premier = next(iter(self._en_attente.values()))[0]
+                        self._condition.wait(premier + self.fenetre - maintenant)
+                    else:
+                        self._condition.wait()
+            self._envoyer(echus)
+            if self._arret:
+                return
+
+    def statistiques(self) -> Dict[str, Any]:
+        return {
+            "fenetre_ms": self.fenetre * 1000,
+            "resume": self.resume,
+            "recus": self.recus,
+            "envoyes": self.envoyes,
+            "appels": self.appels,
+            "en_attente": len(self._en_attente),
+            "taux_regroupement": round(1 - self.envoyes / self.recus, 4) if self.recus else None,
+        }
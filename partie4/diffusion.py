@@ -0,0 +1,170 @@
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+# Nombre d'événements gardés pour la reprise via Last-Event-ID
+TAILLE_HISTORIQUE = 1024
+
+# Nombre maximal d'événements en attente par client avant déconnexion
+TAILLE_TAMPON = 256
+
+# Délai entre deux messages de maintien de connexion (secondes)
+INTERVALLE_PING = 15.0
+
+
+class Message:
+    """
+    Événement diffusé, encodé une seule fois pour tous les clients.
+    Son identifiant "epoque-numero" combine l'époque du processus et un
+    numéro croissant : il reste unique d'un redémarrage à l'autre.
+    """
+
+    __slots__ = ("numero", "id", "sse", "texte")
+
+    def __init__(self, epoque: str, numero: int, type_evenement: str, donnees: Dict[str, Any]):
+        self.numero = numero
+        self.id = f"{epoque}-{numero}"
+        corps = json.dumps(donnees, ensure_ascii=False)
+        self.sse = f"id: {self.id}\nevent: {type_evenement}\ndata: {corps}\n\n".encode("utf-8")
+        self.texte = f'{{"id":"{self.id}","type":{json.dumps(type_evenement)},"donnees":{corps}}}'
+
+
+class Abonne:
+    """
+    Client connecté au flux : file bornée d'événements à envoyer.
+    """
+
+    def __init__(self, taille_tampon: int):
+        self.taille_tampon = taille_tampon
+        self.file: Deque[Message] = deque()
+        self.signal = asyncio.Event()
+        self.deconnecte = False
+
+    async def suivant(self, delai: float = INTERVALLE_PING) -> Optional[Message]:
+        """
+        Attend le prochain message ; None si rien n'est arrivé pendant le délai.
+
+        Raises:
+            ConnectionResetError: si le client a été déconnecté car trop lent
+        """
+        while not self.file:
+            if self.deconnecte:
+                raise ConnectionResetError("client trop lent")
+            self.signal.clear()
+            try:
+                await asyncio.wait_for(self.signal.wait(), delai)
+            except asyncio.TimeoutError:
+                return None
+        if self.deconnecte:
+            raise ConnectionResetError("client trop lent")
+        return self.file.popleft()
+
+
+class Diffusion:
+    """
+    Diffusion des événements traités à tous les clients connectés (SSE ou
+    WebSocket). Chaque événement est encodé une fois puis ajouté à la file
+    de chaque client ; un client dont la file est pleine est déconnecté et
+    peut reprendre là où il en était grâce à l'historique circulaire.
+
+    Un client qui présente un identifiant inconnu (émis avant un redémarrage,
+    ou sorti de l'historique) reçoit d'abord un événement "reset" : les
+    événements manqués ne peuvent pas être rejoués et il doit resynchroniser
+    son état (par exemple via /leaderboard).
+
+    Toutes les opérations sur les clients ont lieu dans la boucle asyncio ;
+    publier() peut être appelée depuis un thread (tâches de fond).
+    """
+
+    def __init__(self, taille_historique: int = TAILLE_HISTORIQUE, taille_tampon: int = TAILLE_TAMPON):
+        self.taille_tampon = taille_tampon
+        self._historique: Deque[Message] = deque(maxlen=taille_historique)
+        self._abonnes: Set[Abonne] = set()
+        self._dernier_id = 0
+        self.epoque = str(time.time_ns() // 1_000_000)  # époque du processus (ms)
+        self._boucle: Optional[asyncio.AbstractEventLoop] = None
+
+    def attacher(self, boucle: asyncio.AbstractEventLoop) -> None:
+        self._boucle = boucle
+
+    def publier(self, type_evenement: str, donnees: Dict[str, Any]) -> None:
+        """
+        Publie un événement (sans effet tant qu'aucune boucle n'est attachée).
+        """
+        boucle = self._boucle
+        if boucle is None or boucle.is_closed():
+            return
+        try:
+            courante = asyncio.get_running_loop()
+        except RuntimeError:
+            courante = None
+        if courante is boucle:
+            self._diffuser(type_evenement, donnees)
+        else:
+            boucle.call_soon_threadsafe(self._diffuser, type_evenement, donnees)
+
+    def _diffuser(self, type_evenement: str, donnees: Dict[str, Any]) -> None:
+        self._dernier_id += 1
+        message = Message(self.epoque, self._dernier_id, type_evenement, donnees)
+        self._historique.append(message)
+
+        lents: List[Abonne] = []
+        for abonne in self._abonnes:
+            if len(abonne.file) >= abonne.taille_tampon:
+                lents.append(abonne)
+            else:
+                abonne.file.append(message)
+            abonne.signal.set()
+
+        for abonne in lents:
+            abonne.deconnecte = True
+            self._abonnes.discard(abonne)
+
+    def abonner(self, dernier_id: Optional[Tuple[str, int]] = None) -> Tuple[Abonne, List[Message]]:
+        """
+        Inscrit un client et renvoie les messages à rejouer depuis dernier_id
+        (époque, numéro), ou un seul message "reset" si cet identifiant est
+        inconnu. L'inscription et la lecture de l'historique se font sans
+        point d'attente : aucun message n'est perdu ni envoyé deux fois.
+        """
+        abonne = Abonne(self.taille_tampon)
+        self._abonnes.add(abonne)
+        if dernier_id is None:
+            return abonne, []
+        epoque, numero = dernier_id
+        if epoque != self.epoque:
+            return abonne, [self._reset("redemarrage")]
+        plus_ancien = self._historique[0].numero if self._historique else self._dernier_id + 1
+        if numero > self._dernier_id or numero < plus_ancien - 1:
+            return abonne, [self._reset("historique_depasse")]
+        return abonne, [message for message in self._historique if message.numero > numero]
+
+    def _reset(self, raison: str) -> Message:
+        """
+        Message de resynchronisation (hors historique), avec le dernier
+        identifiant émis : le client reprend ensuite normalement.
+        """
+        return Message(self.epoque, self._dernier_id, "reset", {"raison": raison})
+
+    def desabonner(self, abonne: Abonne) -> None:
+        self._abonnes.discard(abonne)
+
+    def __len__(self) -> int:
+        return len(self._abonnes)
+
+
+# Fonction pour lire un identifiant d'événement "epoque-numero" (en-tête Last-Event-ID)
+def lire_identifiant(valeur: Optional[str]) -> Optional[Tuple[str, int]]:
+    """
+    Renvoie (époque, numéro), ou None sans identifiant. Un identifiant
+    illisible (ancien format compris) donne une époque vide, donc un reset.
+    """
+    if valeur is None or not valeur.strip():
+        return None
+    epoque, _, numero = valeur.strip().rpartition("-")
+    try:
+        return epoque, int(numero)
+    except ValueError:
+        return "", 0
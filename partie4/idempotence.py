@@ -0,0 +1,297 @@
+import asyncio
+import hashlib
+import logging
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+journal = logging.getLogger(__name__)
+
+# Nombre maximal de clés gardées (les plus anciennes sont évincées au-delà)
+CAPACITE = 100_000
+
+# Durée de validité d'une clé (secondes)
+DUREE_VIE = 24 * 3600
+
+# Taille totale maximale des réponses gardées (octets) ; les plus anciennes
+# sont évincées au-delà, et une réponse plus grande n'est pas gardée
+OCTETS_MAX = int(os.environ.get("IDEMPOTENCE_OCTETS_MAX", str(64 * 1024 * 1024)))
+
+# Enregistrement persisté : empreinte de la clé (16 octets), expiration (f64),
+# taille de la réponse (u32), puis la réponse JSON compacte
+ENREGISTREMENT = struct.Struct("<16sdI")
+
+# En-tête du fichier ; un fichier sans cet en-tête (ancien format, taille en
+# u16) est ignoré puis réécrit
+ENTETE = b"IDEMP2\n"
+
+
+# Fonction pour réduire une clé d'idempotence à une empreinte de taille fixe
+def empreinte(cle: bytes) -> bytes:
+    return hashlib.blake2b(cle, digest_size=16).digest()
+
+
+class CacheIdempotence:
+    """
+    Réponses déjà envoyées, par clé d'idempotence, pour renvoyer la même
+    réponse aux réessais sans retraiter l'événement.
+
+    Le cache est borné en durée (TTL), en nombre d'entrées et en octets de
+    réponses : les entrées restent dans l'ordre d'ajout, donc d'expiration,
+    et les plus anciennes sont évincées en premier. Seule l'empreinte de
+    chaque clé est gardée.
+
+    Une clé dont la requête est encore en cours est réservée (reserver) :
+    les réessais concurrents attendent sa réponse au lieu de retraiter
+    l'événement.
+
+    Chaque ajout est aussi écrit à la fin d'un fichier binaire, relu au
+    démarrage pour conserver la fenêtre de déduplication ; le fichier est
+    réécrit sans les entrées mortes dès qu'il dépasse le double de la capacité.
+    Les écritures sont faites par un thread (demarrer / arreter), jamais
+    par la boucle d'événements, et regroupées en un seul flush.
+    """
+
+    def __init__(
+        self,
+        fichier: Optional[str] = "idempotence.bin",
+        capacite: int = CAPACITE,
+        duree_vie: float = DUREE_VIE,
+        octets_max: int = OCTETS_MAX,
+    ):
+        self.fichier = fichier
+        self.capacite = capacite
+        self.duree_vie = duree_vie
+        self.octets_max = octets_max
+        self._entrees: "OrderedDict[bytes, Tuple[float, bytes]]" = OrderedDict()
+        self._octets = 0  # taille totale des réponses gardées
+        self._en_cours: Dict[bytes, asyncio.Future] = {}  # clés réservées -> réponse attendue
+        self._ecrits = 0  # enregistrements présents dans le fichier (ou en file pour y être écrits)
+        self._a_ecrire: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self.succes = 0
+        self.echecs = 0
+        self.evictions = 0
+        self.trop_grandes = 0
+        if fichier is not None:
+            self._charger()
+
+    def _charger(self) -> None:
+        try:
+            with open(self.fichier, "rb") as f:
+                contenu = f.read()
+        except FileNotFoundError:
+            contenu = b""
+        except OSError as e:
+            journal.error("Erreur lors de la lecture de %s: %s", self.fichier, e)
+            contenu = b""
+
+        if contenu and not contenu.startswith(ENTETE):
+            journal.warning("Format de %s non reconnu, fenêtre de déduplication réinitialisée", self.fichier)
+            contenu = b""
+
+        maintenant = time.time()
+        position = len(ENTETE)
+        while position + ENREGISTREMENT.size <= len(contenu):
+            cle, expiration, taille = ENREGISTREMENT.unpack_from(contenu, position)
+            debut = position + ENREGISTREMENT.size
+            if debut + taille > len(contenu):
+                break  # dernier enregistrement tronqué (arrêt pendant l'écriture)
+            if expiration > maintenant and taille <= self.octets_max:
+                self._retirer(cle)
+                self._entrees[cle] = (expiration, contenu[debut:debut + taille])
+                self._octets += taille
+            position = debut + taille
+            self._ecrits += 1
+
+        self._evincer(compter=False)
+        if self._ecrits > len(self._entrees) or not contenu:
+            # Aussi pour écrire l'en-tête d'un nouveau fichier (avant le démarrage du thread)
+            self._reecrire(list(self._entrees.items()))
+
+    def _retirer(self, cle: bytes) -> None:
+        entree = self._entrees.pop(cle, None)
+        if entree is not None:
+            self._octets -= len(entree[1])
+
+    def _evincer(self, compter: bool = True) -> None:
+        """
+        Évince les plus anciennes entrées au-delà de la capacité ou du budget d'octets.
+        """
+        while len(self._entrees) > self.capacite or self._octets > self.octets_max:
+            _, (_, reponse) = self._entrees.popitem(last=False)
+            self._octets -= len(reponse)
+            if compter:
+                self.evictions += 1
+
+    def _reecrire(self, entrees: List[Tuple[bytes, Tuple[float, bytes]]]) -> None:
+        """
+        Réécrit le fichier avec les seules entrées vivantes (copie prise par
+        la boucle d'événements).
+        """
+        try:
+            with open(self.fichier + ".tmp", "wb") as f:
+                f.write(ENTETE)
+                for cle, (expiration, reponse) in entrees:
+                    f.write(ENREGISTREMENT.pack(cle, expiration, len(reponse)) + reponse)
+            os.replace(self.fichier + ".tmp", self.fichier)
+        except OSError as e:
+            journal.error("Erreur lors de la réécriture de %s: %s", self.fichier, e)
+
+    def demarrer(self) -> None:
+        """
+        Lance le thread d'écriture du fichier.
+        """
+        if self.fichier is None or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._ecrire, name="idempotence-ecriture", daemon=True)
+        self._thread.start()
+
+    def arreter(self) -> None:
+        """
+        Écrit les enregistrements encore en file puis arrête le thread.
+        """
+        if self._thread is None:
+            return
+        self._a_ecrire.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _ecrire(self) -> None:
+        sortie = None
+        arret = False
+        while not arret:
+            elements = [self._a_ecrire.get()]
+            # Tout ce qui est déjà en file part dans la même écriture
+            while True:
+                try:
+                    elements.append(self._a_ecrire.get_nowait())
+                except queue.Empty:
+                    break
+
+            enregistrements = []
+            for element in elements:
+                if element is None:
+                    arret = True
+                    break
+                if isinstance(element, list):
+                    # Réécriture : les enregistrements en file avant elle y sont inclus
+                    if sortie is not None:
+                        sortie.close()
+                        sortie = None
+                    enregistrements = []
+                    self._reecrire(element)
+                else:
+                    enregistrements.append(element)
+
+            if not enregistrements:
+                continue
+            try:
+                if sortie is None:
+                    sortie = open(self.fichier, "ab")
+                sortie.write(b"".join(enregistrements))
+                sortie.flush()
+            except OSError as e:
+                journal.error("Erreur lors de l'écriture dans %s: %s", self.fichier, e)
+        if sortie is not None:
+            sortie.close()
+
+    def obtenir(self, cle: bytes) -> Optional[bytes]:
+        """
+        Renvoie la réponse enregistrée pour cette clé, ou None.
+        """
+        entree = self._entrees.get(cle)
+        if entree is not None and entree[0] > time.time():
+            self.succes += 1
+            return entree[1]
+        if entree is not None:
+            self._retirer(cle)
+        self.echecs += 1
+        return None
+
+    def reserver(self, cle: bytes) -> Optional[asyncio.Future]:
+        """
+        Réserve une clé pour la requête en cours (à appeler depuis la boucle
+        d'événements). Renvoie None si la réservation est acquise, sinon la
+        réponse attendue de la requête qui la détient : le résultat est la
+        réponse, ou None si cette requête a échoué (la clé est libérée).
+        """
+        attente = self._en_cours.get(cle)
+        if attente is not None:
+            return attente
+        self._en_cours[cle] = asyncio.get_running_loop().create_future()
+        return None
+
+    def abandonner(self, cle: bytes) -> None:
+        """
+        Libère une clé réservée sans réponse enregistrée (échec, annulation).
+        """
+        attente = self._en_cours.pop(cle, None)
+        if attente is not None and not attente.done():
+            attente.set_result(None)
+
+    def ajouter(self, cle: bytes, reponse: bytes) -> None:
+        # La requête en attente reçoit la réponse même si elle n'est pas gardée
+        attente = self._en_cours.pop(cle, None)
+        if attente is not None and not attente.done():
+            attente.set_result(reponse)
+
+        if len(reponse) > self.octets_max:
+            self.trop_grandes += 1
+            journal.warning("Réponse de %d octets non gardée (budget de %d octets)", len(reponse), self.octets_max)
+            return
+
+        maintenant = time.time()
+        expiration = maintenant + self.duree_vie
+        enregistrement = None
+        if self.fichier is not None:
+            try:
+                enregistrement = ENREGISTREMENT.pack(cle, expiration, len(reponse)) + reponse
+            except struct.error as e:
+                # Réponse trop volumineuse pour le fichier : gardée en mémoire seulement
+                journal.error("Réponse de %d octets non persistée dans %s: %s", len(reponse), self.fichier, e)
+        self._retirer(cle)
+        self._entrees[cle] = (expiration, reponse)
+        self._octets += len(reponse)
+
+        # Entrées expirées (en tête) puis éviction des plus anciennes
+        while self._entrees and next(iter(self._entrees.values()))[0] <= maintenant:
+            _, (_, ancienne) = self._entrees.popitem(last=False)
+            self._octets -= len(ancienne)
+        self._evincer()
+
+        if enregistrement is None:
+            return
+        if self._ecrits >= 2 * self.capacite:
+            # Copie des entrées vivantes (nouvelle incluse), écrite par le thread
+            self._a_ecrire.put(list(self._entrees.items()))
+            self._ecrits = len(self._entrees)
+        else:
+            self._a_ecrire.put(enregistrement)
+            self._ecrits += 1
+
+    def statistiques(self) -> Dict[str, Any]:
+        demandes = self.succes + self.echecs
+        # Estimation : clé, tuple, réponse et emplacement dans l'OrderedDict
+        par_entree = sys.getsizeof(b"\0" * 16) + sys.getsizeof((0.0, b"")) + sys.getsizeof(0.0) + 100
+        octets = sum(par_entree + sys.getsizeof(reponse) for _, reponse in self._entrees.values())
+        return {
+            "entrees": len(self._entrees),
+            "capacite": self.capacite,
+            "duree_vie": self.duree_vie,
+            "succes": self.succes,
+            "echecs": self.echecs,
+            "taux_succes": round(self.succes / demandes, 4) if demandes else None,
+            "evictions": self.evictions,
+            "trop_grandes": self.trop_grandes,
+            "en_cours": len(self._en_cours),
+            "octets_reponses": self._octets,
+            "octets_max": self.octets_max,
+            "memoire_estimee": octets,
+            "enregistrements_fichier": self._ecrits,
+        }
@@ -0,0 +1,273 @@
+import asyncio
+import logging
+import os
+import secrets
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from travail import DELAI_MAX, Surcharge
+
+journal = logging.getLogger(__name__)
+
+# Répertoire des jobs : un sous-répertoire par job (entrée et résultats NDJSON)
+REPERTOIRE_JOBS = os.environ.get("REPERTOIRE_JOBS", ".jobs")
+
+# Jobs exécutés en même temps ; les suivants attendent leur tour, dans la limite de JOBS_EN_ATTENTE_MAX
+JOBS_SIMULTANES = int(os.environ.get("JOBS_SIMULTANES", "2"))
+JOBS_EN_ATTENTE_MAX = int(os.environ.get("JOBS_EN_ATTENTE_MAX", "16"))
+
+# Processus du pool de traitement (partagé par tous les jobs)
+PROCESSUS_JOBS = int(os.environ.get("PROCESSUS_JOBS", str(os.cpu_count() or 1)))
+
+# Taille d'un morceau envoyé au pool (lignes entières, octets)
+TAILLE_MORCEAU = 1 << 20
+
+# Taille maximale de l'entrée d'un job (octets)
+TAILLE_MAX_JOB = int(os.environ.get("TAILLE_MAX_JOB", str(1 << 30)))
+
+# Durée de conservation d'un job terminé avant suppression (secondes)
+RETENTION = 3600
+
+EN_ATTENTE, EN_COURS, TERMINE, ANNULE, ECHEC = "en_attente", "en_cours", "termine", "annule", "echec"
+ETATS_FINAUX = (TERMINE, ANNULE, ECHEC)
+
+
+class EntreeTropVolumineuse(Exception):
+    """
+    Levée quand l'entrée d'un job dépasse TAILLE_MAX_JOB.
+    """
+
+
+class Job:
+    """
+    Un job de traitement : son entrée NDJSON sur disque, ses résultats
+    NDJSON (écrits morceau par morceau, dans l'ordre) et sa progression.
+    """
+
+    def __init__(self, identifiant: str, proprietaire: str, repertoire: str):
+        self.identifiant = identifiant
+        self.proprietaire = proprietaire
+        self.repertoire = repertoire
+        self.entree = os.path.join(repertoire, "entree.ndjson")
+        self.resultats = os.path.join(repertoire, "resultats.ndjson")
+        self.etat = EN_ATTENTE
+        self.cree = time.time()
+        self.debut: Optional[float] = None
+        self.fin: Optional[float] = None
+        self.octets_total = 0
+        self.octets_traites = 0
+        self.lignes_traitees = 0
+        self.erreurs = 0
+        self.message: Optional[str] = None
+        self.tache: Optional[asyncio.Task] = None
+
+    @property
+    def termine(self) -> bool:
+        return self.etat in ETATS_FINAUX
+
+    def statut(self) -> Dict[str, Any]:
+        return {
+            "id": self.identifiant,
+            "etat": self.etat,
+            "progression": round(self.octets_traites / self.octets_total, 4) if self.octets_total else None,
+            "lignes_traitees": self.lignes_traitees,
+            "erreurs": self.erreurs,
+            "octets_total": self.octets_total,
+            "cree": self.cree,
+            "debut": self.debut,
+            "fin": self.fin,
+            "duree": round((self.fin or time.time()) - self.debut, 3) if self.debut else None,
+            "message": self.message,
+        }
+
+
+class GestionnaireJobs:
+    """
+    Reçoit les jobs, les exécute (JOBS_SIMULTANES à la fois) et garde leur
+    état en mémoire. Chaque job est découpé en morceaux de lignes entières
+    traités par un pool de processus partagé ; quelques morceaux par job
+    sont en vol en même temps, et leurs résultats sont écrits dans l'ordre.
+
+    Args:
+        traiter_morceau: Fonction (importable par les processus du pool)
+            (lignes, premiere_ligne) -> (résultats NDJSON, lignes, erreurs)
+    """
+
+    def __init__(
+        self,
+        traiter_morceau: Callable[[bytes, int], Tuple[bytes, int, int]],
+        repertoire: str = REPERTOIRE_JOBS,
+        simultanes: int = JOBS_SIMULTANES,
+        en_attente_max: int = JOBS_EN_ATTENTE_MAX,
+        processus: int = PROCESSUS_JOBS,
+        taille_morceau: int = TAILLE_MORCEAU,
+    ):
+        self.traiter_morceau = traiter_morceau
+        self.repertoire = repertoire
+        self.simultanes = simultanes
+        self.en_attente_max = en_attente_max
+        self.processus = max(processus, 1)
+        self.taille_morceau = taille_morceau
+        self.jobs: Dict[str, Job] = {}
+        self._executeur: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def demarrer(self) -> None:
+        # Les jobs d'une exécution précédente ne sont plus suivis
+        shutil.rmtree(self.repertoire, ignore_errors=True)
+        os.makedirs(self.repertoire, exist_ok=True)
+        self._executeur = ProcessPoolExecutor(max_workers=self.processus)
+        self._semaphore = asyncio.Semaphore(self.simultanes)
+
+    async def arreter(self) -> None:
+        for job in list(self.jobs.values()):
+            self.annuler(job)
+        taches = [job.tache for job in self.jobs.values() if job.tache is not None]
+        await asyncio.gather(*taches, return_exceptions=True)
+        if self._executeur is not None:
+            await run_in_threadpool(self._executeur.shutdown, True, cancel_futures=True)
+            self._executeur = None
+
+    def _nettoyer(self) -> None:
+        limite = time.time() - RETENTION
+        for job in list(self.jobs.values()):
+            if job.termine and job.fin < limite:
+                self.supprimer(job)
+
+    def creer(self, proprietaire: str) -> Job:
+        """
+        Crée un job vide.
+
+        Raises:
+            Surcharge: Si trop de jobs sont déjà en cours ou en attente
+        """
+        self._nettoyer()
+        actifs = sum(1 for job in self.jobs.values() if not job.termine)
+        if actifs >= self.simultanes + self.en_attente_max:
+            raise Surcharge(DELAI_MAX)
+        identifiant = secrets.token_urlsafe(12)
+        job = Job(identifiant, proprietaire, os.path.join(self.repertoire, identifiant))
+        os.makedirs(job.repertoire)
+        self.jobs[identifiant] = job
+        return job
+
+    def supprimer(self, job: Job) -> None:
+        self.jobs.pop(job.identifiant, None)
+        shutil.rmtree(job.repertoire, ignore_errors=True)
+
+    async def recevoir(self, job: Job, morceaux: AsyncIterator[bytes]) -> None:
+        """
+        Écrit l'entrée du job sur disque au fil de sa réception.
+
+        Raises:
+            EntreeTropVolumineuse: Si l'entrée dépasse TAILLE_MAX_JOB
+        """
+        f = await run_in_threadpool(open, job.entree, "wb")
+        try:
+            async for morceau in morceaux:
+                job.octets_total += len(morceau)
+                if job.octets_total > TAILLE_MAX_JOB:
+                    raise EntreeTropVolumineuse(f"Entrée limitée à {TAILLE_MAX_JOB} octets")
+                await run_in_threadpool(f.write, morceau)
+        finally:
+            await run_in_threadpool(f.close)
+
+    def lancer(self, job: Job) -> None:
+        job.tache = asyncio.create_task(self._executer(job))
+
+    def annuler(self, job: Job) -> None:
+        if job.termine:
+            return
+        if job.tache is not None:
+            job.tache.cancel()
+        job.etat = ANNULE
+        job.fin = time.time()
+
+    async def _executer(self, job: Job) -> None:
+        async with self._semaphore:
+            if job.termine:
+                return
+            job.etat = EN_COURS
+            job.debut = time.time()
+            boucle = asyncio.get_running_loop()
+            en_vol: Deque[Tuple[asyncio.Future, int]] = deque()  # (résultat attendu, octets du morceau)
+            try:
+                with open(job.entree, "rb") as entree, open(job.resultats, "wb") as sortie:
+                    reste = b""
+                    ligne = 1
+                    fin_entree = False
+                    while not fin_entree or en_vol:
+                        # Quelques morceaux en vol par job, pour occuper le pool
+                        while not fin_entree and len(en_vol) < self.processus:
+                            donnees = await run_in_threadpool(entree.read, self.taille_morceau)
+                            if donnees:
+                                donnees = reste + donnees
+                                coupure = donnees.rfind(b"\n") + 1
+                                morceau, reste = donnees[:coupure], donnees[coupure:]
+                            else:
+                                fin_entree = True
+                                morceau, reste = reste, b""
+                            if morceau:
+                                futur = boucle.run_in_executor(self._executeur, self.traiter_morceau, morceau, ligne)
+                                en_vol.append((futur, len(morceau)))
+                                ligne += morceau.count(b"\n")
+                        # Entrée terminée par "\n" : la fin arrive sans morceau à envoyer
+                        if not en_vol:
+                            continue
+                        futur, octets = en_vol.popleft()
+                        resultats, lignes, erreurs = await futur
+                        await run_in_threadpool(sortie.write, resultats)
+                        await run_in_threadpool(sortie.flush)
+                        job.octets_traites += octets
+                        job.lignes_traitees += lignes
+                        job.erreurs += erreurs
+                job.etat = TERMINE
+            except asyncio.CancelledError:
+                job.etat = ANNULE
+            except Exception as e:
+                journal.exception("Échec du job %s", job.identifiant)
+                job.etat = ECHEC
+                job.message = str(e)
+            finally:
+                for futur, _ in en_vol:
+                    futur.cancel()
+                job.fin = time.time()
+                journal.info(
+                    "Job terminé",
+                    extra={"job": job.identifiant, "etat": job.etat, "lignes": job.lignes_traitees, "erreurs": job.erreurs},
+                )
+
+    async def lire_resultats(self, job: Job, suivre: bool = True, taille_lecture: int = 64 * 1024) -> AsyncIterator[bytes]:
+        """
+        Renvoie les résultats écrits jusqu'ici ; avec suivre, continue tant
+        que le job n'est pas terminé (les résultats sont écrits par morceaux
+        de lignes entières).
+        """
+        while not os.path.exists(job.resultats):
+            if job.termine or not suivre:
+                return
+            await asyncio.sleep(0.1)
+        f = await run_in_threadpool(open, job.resultats, "rb")
+        try:
+            while True:
+                termine = job.termine
+                donnees = await run_in_threadpool(f.read, taille_lecture)
+                if donnees:
+                    yield donnees
+                elif termine or not suivre:
+                    return
+                else:
+                    await asyncio.sleep(0.1)
+        finally:
+            await run_in_threadpool(f.close)
+
+    def statistiques(self) -> Dict[str, Any]:
+        etats: Dict[str, int] = {}
+        for job in self.jobs.values():
+            etats[job.etat] = etats.get(job.etat, 0) + 1
+        return {"simultanes": self.simultanes, "en_attente_max": self.en_attente_max, "processus": self.processus, "jobs": etats}
@@ -0,0 +1,201 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+# Niveau par défaut, et niveaux par module : "outbox=DEBUG,notifications=WARNING"
+NIVEAU = os.environ.get("LOG_NIVEAU", "INFO")
+NIVEAUX_MODULES = os.environ.get("LOG_NIVEAUX", "")
+
+# Format de sortie : "texte" (lisible) ou "json" (une ligne JSON par message)
+FORMAT = os.environ.get("LOG_FORMAT", "texte")
+
+# Avec 0, les messages sont écrits par le thread qui les émet (comme print)
+ASYNCHRONE = os.environ.get("LOG_ASYNCHRONE", "1") == "1"
+
+# Messages en attente d'écriture ; au-delà, les nouveaux sont abandonnés
+TAILLE_FILE = 10_000
+
+# Un même avertissement ou une même erreur n'est écrit qu'une fois par intervalle (secondes)
+INTERVALLE_REPETITIONS = 10.0
+
+# Attributs standard d'un LogRecord (le reste vient de extra=...)
+_ATTRIBUTS_STANDARD = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+# Fonction pour extraire les champs structurés d'un message (passés par extra=...)
+def champs_structures(record: logging.LogRecord) -> Dict[str, Any]:
+    return {cle: valeur for cle, valeur in vars(record).items() if cle not in _ATTRIBUTS_STANDARD}
+
+
+class FormateurTexte(logging.Formatter):
+    """
+    Ligne lisible : date, niveau, module, message, puis les champs cle=valeur.
+    """
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        ligne = super().format(record)
+        champs = champs_structures(record)
+        if champs:
+            ligne += " " + " ".join(f"{cle}={valeur}" for cle, valeur in champs.items())
+        return ligne
+
+
+class FormateurJSON(logging.Formatter):
+    """
+    Une ligne JSON par message, avec les champs structurés au premier niveau.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        donnees = {
+            "horodatage": datetime.fromtimestamp(record.created).isoformat(),
+            "severite": record.levelname,
+            "module": record.name,
+            "message": record.getMessage(),
+            **champs_structures(record),
+        }
+        if record.exc_info:
+            donnees["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            donnees["exception"] = record.exc_text
+        return json.dumps(donnees, ensure_ascii=False, default=str)
+
+
+class FiltreRepetitions(logging.Filter):
+    """
+    Limite les avertissements et erreurs répétés : un même message (même
+    module, même niveau, même modèle de texte) n'est transmis qu'une fois
+    par intervalle ; le suivant indique combien ont été ignorés entre-temps.
+    """
+
+    def __init__(self, intervalle: float = INTERVALLE_REPETITIONS):
+        super().__init__()
+        self.intervalle = intervalle
+        self.ignores = 0
+        self._derniers: Dict[tuple, list] = {}  # clé -> [dernier envoi, ignorés depuis]
+        self._verrou = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+        cle = (record.name, record.levelno, str(record.msg))
+        maintenant = time.monotonic()
+        with self._verrou:
+            etat = self._derniers.get(cle)
+            if etat is not None and maintenant - etat[0] < self.intervalle:
+                etat[1] += 1
+                self.ignores += 1
+                return False
+            if etat is not None and etat[1]:
+                record.repetitions_ignorees = etat[1]
+            if len(self._derniers) > 1000:
+                self._derniers.clear()
+            self._derniers[cle] = [maintenant, 0]
+        return True
+
+
+class QueueHandlerNonBloquant(logging.handlers.QueueHandler):
+    """
+    Dépose les messages dans une file bornée sans jamais attendre : si la
+    sortie ne suit pas et que la file est pleine, le message est abandonné
+    et compté.
+    """
+
+    def __init__(self, file: "queue.Queue"):
+        super().__init__(file)
+        self.perdus = 0
+        self._formateur_exceptions = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Comme QueueHandler.prepare (message calculé, arguments retirés), mais
+        la trace d'une exception n'est pas ajoutée au message : elle est
+        formatée ici et gardée dans exc_text, que FormateurJSON écrit dans
+        son champ "exception" (et FormateurTexte à la suite du message).
+        """
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._formateur_exceptions.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.perdus += 1
+
+
+_file: Optional["queue.Queue"] = None
+_gestionnaire: Optional[logging.Handler] = None
+_filtre: Optional[FiltreRepetitions] = None
+_ecouteur: Optional[logging.handlers.QueueListener] = None
+
+
+# Fonction pour configurer la journalisation de l'application
+def configurer_journal(
+    niveau: str = NIVEAU,
+    niveaux_modules: str = NIVEAUX_MODULES,
+    format: str = FORMAT,
+    asynchrone: bool = ASYNCHRONE,
+) -> None:
+    """
+    Installe sur le logger racine un QueueHandler non bloquant (le thread
+    appelant ne fait que déposer le message) ; un QueueListener écrit les
+    messages sur la sortie standard dans son propre thread.
+
+    Args:
+        niveau: Niveau par défaut (DEBUG, INFO, WARNING, ERROR)
+        niveaux_modules: Niveaux par module, "module=NIVEAU" séparés par des virgules
+        format: "texte" ou "json"
+        asynchrone: False pour écrire directement depuis le thread appelant
+    """
+    global _file, _gestionnaire, _filtre, _ecouteur
+    if _gestionnaire is not None:
+        return
+
+    sortie = logging.StreamHandler(sys.stdout)
+    sortie.setFormatter(FormateurJSON() if format == "json" else FormateurTexte())
+
+    _filtre = FiltreRepetitions()
+    if asynchrone:
+        _file = queue.Queue(TAILLE_FILE)
+        _gestionnaire = QueueHandlerNonBloquant(_file)
+        _ecouteur = logging.handlers.QueueListener(_file, sortie, respect_handler_level=True)
+        _ecouteur.start()
+        atexit.register(_ecouteur.stop)
+    else:
+        _gestionnaire = sortie
+    _gestionnaire.addFilter(_filtre)
+
+    racine = logging.getLogger()
+    racine.addHandler(_gestionnaire)
+    racine.setLevel(niveau.upper())
+    for element in niveaux_modules.split(","):
+        module, _, niveau_module = element.partition("=")
+        if module.strip() and niveau_module.strip():
+            logging.getLogger(module.strip()).setLevel(niveau_module.strip().upper())
+
+
+# Fonction pour obtenir l'état de la journalisation
+def statistiques_journal() -> Dict[str, Any]:
+    return {
+        "asynchrone": _file is not None,
+        "en_file": _file.qsize() if _file is not None else 0,
+        "perdus": getattr(_gestionnaire, "perdus", 0),
+        "repetitions_ignorees": _filtre.ignores if _filtre is not None else 0,
+    }
@@ -1,10 +1,32 @@
-from fastapi import FastAPI, HTTPException, Header, Depends, BackgroundTasks
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any, Set
+from fastapi import FastAPI, HTTPException, Header, Depends, Request, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from typing import List, Optional, Dict, Any, Set, Awaitable, Callable
+import asyncio
 import json
+import logging
+import math
 import os
+import sqlite3
+import threading
 from datetime import datetime
 
+from classement import Classement
+from coalescence import Coalesceur
+from cles_api import FICHIER_CLES, RegistreCles
+from diffusion import Diffusion, lire_identifiant
+from idempotence import CacheIdempotence, empreinte
+from jobs import EntreeTropVolumineuse, GestionnaireJobs
+from journalisation import configurer_journal, statistiques_journal
+from ordonnancement import OrdonnanceurVoies, lire_valeurs_voies
+from taux import CompteursGlissants
+from outbox import Outbox
+from traitement import PersonnageResponse, PersonnageTraitement, calculer_niveau, traiter, traiter_morceau
+from travail import PoolTravail, Surcharge
+from usage import TRIS, CompteurUsage, MiddlewareUsage
+
 # Modèles Pydantic existants
 class Personnage(BaseModel):
     id: int
@@ -21,18 +43,6 @@ class Score(BaseModel):
     score: int
     category: Optional[str] = None
 
-# Nouveau modèle pour le traitement
-class PersonnageTraitement(BaseModel):
-    nom: str
-    score: int
-    score_double: Optional[int] = None
-
-class PersonnageResponse(BaseModel):
-    nom: str
-    score: int
-    score_double: Optional[int] = None
-    niveau: str
-
 # Modèle pour le webhook
 class PersonnageEvent(BaseModel):
     nom: str
@@ -60,6 +70,38 @@ subscriptions = {
 # Configuration
 TOKEN_VALIDE = "mon_super_token_secret"
 NOTIFICATION_FILE = "notifications.txt"
+LOG_FILE = "webhook_log.json"
+IDEMPOTENCE_FILE = "idempotence.bin"
+OUTBOX_FILE = "outbox.db"
+
+# Registre des clés d'API (empreintes et limites par clé) ; tant qu'aucun
+# registre n'existe, seul TOKEN_VALIDE est accepté, limité comme une clé
+# (DEBIT_CLE_DEFAUT / RAFALE_CLE_DEFAUT, 0 pour ne pas le limiter)
+registre_cles = RegistreCles(FICHIER_CLES, cle_par_defaut=TOKEN_VALIDE)
+
+# Événements acceptés écrits dans une file persistante avant l'acquittement,
+# puis traités depuis cette file (repris au redémarrage) ; avec 0, traitement
+# en mémoire par le pool de travail
+OUTBOX_DURABLE = os.environ.get("OUTBOX_DURABLE", "1") == "1"
+
+# Travail après la réponse : nombre de threads (sans outbox) et nombre
+# maximal d'événements en attente avant de répondre 503 avec Retry-After
+TRAVAILLEURS = int(os.environ.get("TRAVAILLEURS", "2"))
+PROFONDEUR_MAX = int(os.environ.get("PROFONDEUR_MAX", "10000"))
+
+# Notifications envoyées par voie de priorité (niveau) : poids de chaque voie
+# dans le tourniquet (la dernière reçoit les niveaux inconnus) et latence visée
+NOTIFICATIONS_POIDS = os.environ.get("NOTIFICATIONS_POIDS", "légendaire=8,expert=4,intermédiaire=2,débutant=1")
+NOTIFICATIONS_CIBLES_MS = os.environ.get("NOTIFICATIONS_CIBLES_MS", "légendaire=250,expert=1000")
+
+# Journalisation non bloquante (niveaux et format : LOG_NIVEAU, LOG_NIVEAUX, LOG_FORMAT)
+configurer_journal()
+journal = logging.getLogger("webhook")
+journal_notifications = logging.getLogger("notifications")
+
+# Sans en-tête Idempotency-Key, déduplication optionnelle sur le contenu de
+# l'événement (deux événements identiques dans la fenêtre n'en font qu'un)
+CLE_IDEMPOTENCE_DERIVEE = os.environ.get("CLE_IDEMPOTENCE_DERIVEE", "0") == "1"
 
 # Middleware CORS si nécessaire
 from fastapi.middleware.cors import CORSMiddleware
@@ -81,14 +123,42 @@ app.add_middleware(
 
 # Fonction pour vérifier le token
 async def verifier_token(token: Optional[str] = Header(None)):
-    if token is None or token != TOKEN_VALIDE:
+    client = registre_cles.client(token) if token is not None else None
+    if client is None:
         raise HTTPException(
             status_code=401,
             detail="Token d'accès invalide ou manquant",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    attente = client.consommer()
+    if attente:
+        raise HTTPException(
+            status_code=429,
+            detail="Trop de requêtes pour cette clé d'API",
+            headers={"Retry-After": str(math.ceil(attente))},
+        )
     return token
 
+# Fonction pour vérifier que le token est celui d'un client admin
+async def verifier_admin(token: str = Depends(verifier_token)):
+    if not registre_cles.client(token).admin:
+        raise HTTPException(status_code=403, detail="Accès réservé aux clés d'administration")
+    return token
+
+# Usage par client (clé d'API, ou adresse IP pour les webhooks) et par
+# route : requêtes, octets, durée ; ajouté périodiquement à la base
+# FICHIER_USAGE, partagée par les workers
+compteur_usage = CompteurUsage()
+app.add_middleware(MiddlewareUsage, compteur=compteur_usage, registre=registre_cles)
+
+@app.on_event("startup")
+async def demarrer_usage():
+    compteur_usage.demarrer()
+
+@app.on_event("shutdown")
+async def arreter_usage():
+    await run_in_threadpool(compteur_usage.arreter)
+
 # Fonction pour charger les personnages depuis le fichier JSON
 def charger_personnages():
     try:
@@ -99,72 +169,212 @@ def charger_personnages():
             return json.load(f)
         
     except Exception as e:
-        print(f"Erreur lors du chargement des personnages: {e}")
+        journal.error("Erreur lors du chargement des personnages: %s", e)
         return []
 
+# Verrou du fichier de log (les tâches de fond s'exécutent dans des threads)
+verrou_log = threading.Lock()
+
+# Fonction pour formater des événements comme des éléments du tableau JSON du log
+def formater_evenements(events: List[Dict[str, Any]]) -> bytes:
+    elements = []
+    for event in events:
+        texte = json.dumps(event, indent=2, ensure_ascii=False)
+        elements.append("  " + texte.replace("\n", "\n  "))
+    return ",\n".join(elements).encode("utf-8")
+
+# Fonction pour enregistrer des événements dans le fichier de log
+def log_events(events: List[Dict[str, Any]]):
+    """
+    Ajoute les événements au tableau JSON du log en une seule écriture : le
+    "]" final est remplacé par les nouveaux éléments, sans relire ni réécrire
+    les événements déjà présents. Le fichier reste identique à ce que
+    produirait json.dump(..., indent=2).
+    """
+    log_file = LOG_FILE
+
+    # Ajouter un timestamp
+    horodatage = datetime.now().isoformat()
+    events_with_timestamp = [{**event, "timestamp": horodatage} for event in events]
+    elements = formater_evenements(events_with_timestamp)
+
+    with verrou_log:
+        try:
+            with open(log_file, "r+b") as f:
+                # Recherche du "]" final et du dernier caractère significatif avant lui
+                fin = f.seek(0, os.SEEK_END)
+                f.seek(max(0, fin - 4096))
+                queue = f.read().rstrip()
+                debut_queue = max(0, fin - 4096)
+                if queue.endswith(b"]"):
+                    precedent = queue[:-1].rstrip()
+                    position = debut_queue + len(precedent)
+                    if precedent.endswith(b"["):
+                        ajout = b"\n" + elements + b"\n]"  # tableau vide
+                    elif precedent.endswith(b"}"):
+                        ajout = b",\n" + elements + b"\n]"
+                    else:
+                        ajout = None
+                    if ajout is not None:
+                        f.seek(position)
+                        f.write(ajout)
+                        f.truncate()
+                        journal.info("%d événement(s) enregistré(s)", len(events), extra={"fichier": log_file})
+                        return
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            journal.error("Erreur lors de l'écriture du fichier de log: %s", e)
+            return
+
+        # Fichier absent, vide ou qui ne se termine pas par un tableau : réécriture complète
+        existants = []
+        try:
+            if os.path.exists(log_file):
+                with open(log_file, "r", encoding="utf-8") as f:
+                    content = f.read().strip()
+                    if content:
+                        existants = json.loads(content)
+        except json.JSONDecodeError:
+            journal.warning("Le fichier de log n'est pas un JSON valide, création d'un nouveau fichier", extra={"fichier": log_file})
+        except Exception as e:
+            journal.error("Erreur lors de la lecture du fichier de log: %s", e)
+
+        try:
+            with open(log_file, "w", encoding="utf-8") as f:
+                json.dump(existants + events_with_timestamp, f, indent=2, ensure_ascii=False)
+            journal.info("%d événement(s) enregistré(s)", len(events), extra={"fichier": log_file})
+        except Exception as e:
+            journal.error("Erreur lors de l'écriture du fichier de log: %s", e)
+
 # Fonction pour enregistrer l'événement dans un fichier de log
 def log_event(event: Dict[str, Any]):
-    log_file = "webhook_log.json"
-    
-    # Ajouter un timestamp
-    event_with_timestamp = event.copy()
-    event_with_timestamp["timestamp"] = datetime.now().isoformat()
-    
-    # Lire les événements existants
-    events = []
+    log_events([event])
+
+# Fonction pour relire le journal des événements
+def lire_journal() -> List[Dict[str, Any]]:
     try:
-        if os.path.exists(log_file):
-            with open(log_file, "r", encoding="utf-8") as f:
-                content = f.read().strip()
-                if content:
-                    events = json.loads(content)
-    except json.JSONDecodeError:
-        print(f"Le fichier existe mais n'est pas un JSON valide. Création d'un nouveau fichier.")
+        if not os.path.exists(LOG_FILE):
+            return []
+
+        with open(LOG_FILE, "r", encoding="utf-8") as f:
+            content = f.read().strip()
+            return json.loads(content) if content else []
+
     except Exception as e:
-        print(f"Erreur lors de la lecture du fichier de log: {e}")
-    
-    # Ajouter le nouvel événement
-    events.append(event_with_timestamp)
-    
-    # Écrire les événements mis à jour
+        journal.error("Erreur lors de la lecture du fichier de log: %s", e)
+        return []
+
+# Fonction pour la notification console (déposée dans la file du journal, écrite par un autre thread)
+def notifier_console(events: List[Dict[str, Any]], resume: bool):
+    if not journal_notifications.isEnabledFor(logging.INFO):
+        return
+    if resume:
+        journal_notifications.info(
+            "Résumé des personnages ajoutés",
+            extra={
+                "personnages": len(events),
+                "detail": ", ".join(f"{event['nom']} ({event.get('score')}, {event.get('niveau', 'N/A')})" for event in events),
+            },
+        )
+        return
+    for event in events:
+        journal_notifications.info(
+            "Nouveau personnage ajouté",
+            extra={"nom": event["nom"], "score": event.get("score"), "niveau": event.get("niveau", "N/A")},
+        )
+
+# Fonction pour la notification fichier (une seule écriture pour le lot)
+def notifier_fichier(events: List[Dict[str, Any]], resume: bool):
     try:
-        with open(log_file, "w", encoding="utf-8") as f:
-            json.dump(events, f, indent=2, ensure_ascii=False)
-        print(f"Événement enregistré dans {log_file}")
+        horodatage = datetime.now().isoformat()
+        if resume:
+            contenu = f"{horodatage} - Résumé: {len(events)} personnage(s): " + "; ".join(
+                f"{event['nom']} (Score: {event.get('score', 'N/A')}, Niveau: {event.get('niveau', 'N/A')})"
+                for event in events
+            ) + "\n"
+        else:
+            contenu = "".join(
+                f"{horodatage} - Nouveau personnage: {event['nom']} - Score: {event.get('score', 'N/A')} - Niveau: {event.get('niveau', 'N/A')}\n"
+                for event in events
+            )
+        with open(NOTIFICATION_FILE, "a", encoding="utf-8") as f:
+            f.write(contenu)
     except Exception as e:
-        print(f"Erreur lors de l'écriture du fichier de log: {e}")
+        journal_notifications.error("Erreur lors de l'écriture dans le fichier de notification: %s", e)
 
-# Fonction pour notifier les abonnés
-def notify_subscribers(event: Dict[str, Any]):
-    # 1. Notification console
-    if subscriptions["console"]:
-        print(f"NOTIFICATION CONSOLE: Nouveau personnage ajouté - {event['nom']} (Niveau: {event.get('niveau', 'N/A')})")
-    
-    # 2. Notification fichier
-    if subscriptions["file"]:
-        try:
-            with open(NOTIFICATION_FILE, "a", encoding="utf-8") as f:
-                f.write(f"{datetime.now().isoformat()} - Nouveau personnage: {event['nom']} - Score: {event.get('score', 'N/A')} - Niveau: {event.get('niveau', 'N/A')}\n")
-        except Exception as e:
-            print(f"Erreur lors de l'écriture dans le fichier de notification: {e}")
-    
-    # 3. Appel à la route /notifier
+# Fonction pour l'appel à la route /notifier (une connexion réutilisée pour
+# tout le lot ; la route génère un badge par personnage, même en mode résumé)
+def notifier_badges(events: List[Dict[str, Any]], resume: bool):
     try:
         # Appel à la route locale /notifier
         import requests
-        response = requests.get(
-            f"http://localhost:8000/notifier?nom={event['nom']}&niveau={event.get('niveau', 'débutant')}",
-            timeout=2
-        )
-        if response.status_code == 200:
-            badge_info = response.json()
-            print(f"BADGE GÉNÉRÉ: {badge_info.get('display', 'Non disponible')}")
+        with requests.Session() as session:
+            for event in events:
+                response = session.get(
+                    "http://localhost:8000/notifier",
+                    params={"nom": event["nom"], "niveau": event.get("niveau", "débutant")},
+                    timeout=2
+                )
+                if response.status_code == 200:
+                    badge_info = response.json()
+                    journal_notifications.info("Badge généré", extra={"nom": event["nom"], "badge": badge_info.get("display", "Non disponible")})
     except Exception as e:
-        print(f"Erreur lors de l'appel à /notifier: {e}")
-    
-    # 4. Notification webhook
-    if subscriptions["webhook"]:
-        print("Notification webhook non configurée")
+        journal_notifications.error("Erreur lors de l'appel à /notifier: %s", e)
+
+# Fonction pour la notification webhook
+def notifier_webhook(events: List[Dict[str, Any]], resume: bool):
+    journal_notifications.warning("Notification webhook non configurée")
+
+# Fenêtres de regroupement par puits (ms) : les événements d'un même nom
+# reçus pendant la fenêtre donnent une seule notification, avec le dernier
+# état (0, par défaut : envoi immédiat, dans l'ordre des voies) ; les puits
+# listés dans NOTIFICATIONS_RESUMES reçoivent un seul résumé par fenêtre.
+# Les niveaux de NOTIFICATIONS_IMMEDIATES ne sont jamais retardés par une
+# fenêtre : leur cible de latence est plus courte qu'une fenêtre
+# (par exemple "console=500,file=500")
+NOTIFICATIONS_FENETRES_MS = os.environ.get("NOTIFICATIONS_FENETRES_MS", "")
+NOTIFICATIONS_RESUMES = os.environ.get("NOTIFICATIONS_RESUMES", "")
+NOTIFICATIONS_IMMEDIATES = os.environ.get("NOTIFICATIONS_IMMEDIATES", "légendaire")
+
+fenetres_notifications = lire_valeurs_voies(NOTIFICATIONS_FENETRES_MS)
+resumes_notifications = {nom.strip() for nom in NOTIFICATIONS_RESUMES.split(",")}
+niveaux_immediats = {nom.strip() for nom in NOTIFICATIONS_IMMEDIATES.split(",") if nom.strip()}
+
+# Puits où la latence des voies est mesurée, une fois par événement (toujours actif)
+PUITS_LATENCE = "notifier"
+
+# Fonction pour enregistrer la latence des notifications écrites dans le puits PUITS_LATENCE
+def noter_livraison(events: List[Dict[str, Any]], arrivees: List[float]):
+    ordonnanceur_notifications.livrer(events, arrivees)
+
+# Puits de notification, par nom d'abonnement ("notifier" est toujours actif)
+puits_notifications = {
+    nom: Coalesceur(
+        nom,
+        envoyer,
+        fenetres_notifications.get(nom, 0),
+        nom in resumes_notifications,
+        immediat=lambda event: voie_notification(event) in niveaux_immediats,
+        livraison=noter_livraison if nom == PUITS_LATENCE else None,
+    )
+    for nom, envoyer in [
+        ("console", notifier_console),
+        ("file", notifier_fichier),
+        ("notifier", notifier_badges),
+        ("webhook", notifier_webhook),
+    ]
+}
+
+# Fonction pour notifier les abonnés d'un lot d'événements
+def notify_subscribers_batch(events: List[Dict[str, Any]], arrivees: Optional[List[float]] = None):
+    for nom, coalesceur in puits_notifications.items():
+        if subscriptions.get(nom, True):
+            coalesceur.ajouter(events, arrivees)
+
+# Fonction pour notifier les abonnés
+def notify_subscribers(event: Dict[str, Any]):
+    notify_subscribers_batch([event])
 
 # Route pour l'endpoint GET /personnages
 @app.get("/personnages", response_model=List[Personnage], tags=["Personnages"])
@@ -178,40 +388,497 @@ async def get_personnages(token: str = Depends(verifier_token)):
         raise HTTPException(status_code=404, detail="Aucun personnage trouvé")
     return personnages
 
+# Fonction pour obtenir le badge d'un niveau
+def calculer_badge(niveau: str) -> str:
+    if niveau == "légendaire":
+        return "⭐⭐⭐ LÉGENDAIRE ⭐⭐⭐"
+    elif niveau == "expert":
+        return "🥇 EXPERT 🥇"
+    elif niveau == "intermédiaire":
+        return "🔹 INTERMÉDIAIRE 🔹"
+    elif niveau == "débutant":
+        return "🔸 DÉBUTANT 🔸"
+    return "🔶"  # Badge par défaut
+
+# Classement en direct (meilleur score par nom, top-K global et par niveau)
+classement = Classement(calculer_niveau)
+
+# Reconstruction du classement depuis le journal au démarrage
+@app.on_event("startup")
+async def reconstruire_classement():
+    classement.reconstruire(lire_journal())
+
+# Diffusion des événements traités aux clients connectés (SSE / WebSocket)
+diffusion = Diffusion()
+
+# Débits et distribution des scores sur fenêtres glissantes (1 min, 5 min, 1 h),
+# en mémoire fixe, sans relire webhook_log.json
+taux_evenements = CompteursGlissants(["légendaire", "expert", "intermédiaire", "débutant"])
+
+@app.on_event("startup")
+async def attacher_diffusion():
+    diffusion.attacher(asyncio.get_running_loop())
+
+# Fonction pour valider un événement directement depuis le corps brut de la requête
+def valider_evenement(corps: bytes) -> PersonnageEvent:
+    """
+    Valide le JSON brut avec pydantic-core (sans passer par un dict intermédiaire).
+    Les erreurs sont renvoyées en 422, comme pour un paramètre de corps FastAPI.
+    """
+    try:
+        return PersonnageEvent.model_validate_json(corps)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**erreur, "loc": ("body", *erreur["loc"])} for erreur in e.errors(include_url=False)],
+            body=corps,
+        )
+
+# Validateur d'un lot d'événements (tableau JSON)
+LotEvenements = TypeAdapter(List[PersonnageEvent])
+
+# Nombre maximal d'événements par appel à POST /webhook/personnages
+TAILLE_MAX_LOT = 1000
+
+# Fonction pour valider un lot d'événements depuis le corps brut de la requête
+def valider_lot(corps: bytes) -> List[PersonnageEvent]:
+    try:
+        return LotEvenements.validate_json(corps)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**erreur, "loc": ("body", *erreur["loc"])} for erreur in e.errors(include_url=False)],
+            body=corps,
+        )
+
+# Fonction pour enrichir un événement validé avec son niveau
+def enrichir_evenement(event: PersonnageEvent) -> Dict[str, Any]:
+    return {
+        "nom": event.nom,
+        "score": event.score,
+        "niveau": calculer_niveau(event.score)
+    }
+
+# Fonction pour mettre à jour le classement (meilleur score : rejouer un lot est sans effet)
+def classer_lot(personnages: List[Dict[str, Any]]):
+    for personnage in personnages:
+        classement.ajouter(personnage["nom"], personnage["score"])
+
+# Fonction pour diffuser un lot aux clients connectés (SSE / WebSocket)
+def diffuser_lot(personnages: List[Dict[str, Any]]):
+    for personnage in personnages:
+        diffusion.publier("personnage", {**personnage, "badge": calculer_badge(personnage["niveau"])})
+
+# Fonction pour notifier les abonnés d'un lot (par voie de priorité)
+def notifier_lot(personnages: List[Dict[str, Any]]):
+    ordonnanceur_notifications.soumettre(personnages)
+
+# Fonction pour obtenir les étapes de publication d'un lot, dans l'ordre :
+# log, débits, classement, flux, puis notification des abonnés. L'outbox
+# reprend un lot en échec à l'étape qui a échoué, sans rejouer les précédentes
+def etapes_publication() -> List[Callable[[List[Dict[str, Any]]], None]]:
+    return [log_events, taux_evenements.ajouter, classer_lot, diffuser_lot, notifier_lot]
+
+# Fonction pour publier un lot d'événements
+def publier_lot(personnages: List[Dict[str, Any]]):
+    for etape in etapes_publication():
+        etape(personnages)
+
+# Fonction pour publier un événement
+def publier_evenement(personnage: Dict[str, Any]):
+    publier_lot([personnage])
+
+# Fonction pour choisir la voie de notification d'un événement
+def voie_notification(event: Dict[str, Any]) -> str:
+    return event.get("niveau", "débutant")
+
+# Notifications des abonnés, envoyées par un thread dédié voie par voie :
+# un événement légendaire n'attend plus derrière tous les débutants en file.
+# Les latences sont mesurées à l'écriture dans le puits PUITS_LATENCE (noter_livraison)
+ordonnanceur_notifications = OrdonnanceurVoies(
+    notify_subscribers_batch,
+    voie_notification,
+    lire_valeurs_voies(NOTIFICATIONS_POIDS),
+    lire_valeurs_voies(NOTIFICATIONS_CIBLES_MS),
+    livraison_par_puits=True,
+)
+
+# File persistante des événements acceptés, ou pool borné en mémoire
+outbox = Outbox(OUTBOX_FILE, profondeur_max=PROFONDEUR_MAX) if OUTBOX_DURABLE else None
+pool_travail = PoolTravail(TRAVAILLEURS, PROFONDEUR_MAX)
+
+# Démarrage après la reconstruction du classement : les événements repris
+# n'étaient pas encore dans le journal
+@app.on_event("startup")
+async def demarrer_travail():
+    for coalesceur in puits_notifications.values():
+        coalesceur.demarrer()
+    ordonnanceur_notifications.demarrer()
+    if outbox is not None:
+        outbox.demarrer(etapes_publication())
+    else:
+        pool_travail.demarrer()
+
+@app.on_event("shutdown")
+async def arreter_travail():
+    if outbox is not None:
+        await run_in_threadpool(outbox.arreter)
+    else:
+        await run_in_threadpool(pool_travail.arreter)
+    await run_in_threadpool(ordonnanceur_notifications.arreter)
+    for coalesceur in puits_notifications.values():
+        await run_in_threadpool(coalesceur.arreter)
+
+# Fonction pour confier des événements acceptés au traitement en arrière-plan
+async def confier_evenements(personnages: List[Dict[str, Any]]):
+    """
+    Avec l'outbox, attend que les événements soient écrits sur disque ;
+    sinon, les confie au pool de travail. Si trop d'événements attendent
+    déjà (ou si l'écriture échoue), répond 503 avec Retry-After.
+    """
+    try:
+        if outbox is not None:
+            await outbox.ajouter(personnages)
+        else:
+            pool_travail.soumettre(publier_lot, personnages, poids=len(personnages))
+    except Surcharge as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Serveur surchargé, réessayez plus tard",
+            headers={"Retry-After": str(e.delai)},
+        )
+    except sqlite3.Error:
+        raise HTTPException(
+            status_code=503,
+            detail="Impossible d'enregistrer l'événement, réessayez",
+            headers={"Retry-After": "1"},
+        )
+
+# Schéma du corps attendu, pour la documentation OpenAPI (le corps est lu brut)
+CORPS_EVENEMENT = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": PersonnageEvent.model_json_schema()}},
+    }
+}
+
+# Réponses déjà envoyées par clé d'idempotence (fenêtre conservée au redémarrage,
+# écrite par un thread)
+cache_idempotence = CacheIdempotence(IDEMPOTENCE_FILE)
+
+@app.on_event("startup")
+async def demarrer_idempotence():
+    cache_idempotence.demarrer()
+
+@app.on_event("shutdown")
+async def arreter_idempotence():
+    await run_in_threadpool(cache_idempotence.arreter)
+
+# Fonction pour renvoyer une réponse déjà envoyée pour la même clé
+def reponse_rejouee(corps: bytes) -> Response:
+    return Response(content=corps, media_type="application/json", headers={"Idempotent-Replayed": "true"})
+
+# Fonction pour traiter une requête une seule fois par clé d'idempotence
+async def avec_idempotence(cle: Optional[bytes], traitement: Callable[[], Awaitable[JSONResponse]]) -> Response:
+    """
+    Renvoie la réponse déjà enregistrée pour la clé, sinon réserve la clé
+    le temps du traitement : un réessai arrivé pendant que l'original est en
+    cours attend sa réponse au lieu de retraiter les événements. Si
+    l'original échoue, la clé est libérée et le réessai est traité.
+    """
+    if cle is None:
+        return await traitement()
+    while True:
+        deja_envoyee = cache_idempotence.obtenir(cle)
+        if deja_envoyee is not None:
+            return reponse_rejouee(deja_envoyee)
+        attente = cache_idempotence.reserver(cle)
+        if attente is None:
+            break
+        deja_envoyee = await asyncio.shield(attente)
+        if deja_envoyee is not None:
+            return reponse_rejouee(deja_envoyee)
+    try:
+        reponse = await traitement()
+        cache_idempotence.ajouter(cle, reponse.body)
+        return reponse
+    finally:
+        cache_idempotence.abandonner(cle)  # sans effet si la réponse est enregistrée
+
+# Fonction pour accepter un événement validé
+async def accepter_evenement(event: PersonnageEvent) -> JSONResponse:
+    # Enrichissement : le même dict sert à la réponse, au log et aux notifications
+    personnage = enrichir_evenement(event)
+
+    # Enregistrer l'événement et notifier les abonnés (outbox ou pool de travail borné)
+    await confier_evenements([personnage])
+
+    return JSONResponse({
+        "message": f"Événement reçu pour le personnage {event.nom}",
+        "personnage": personnage
+    })
+
 # Route webhook pour recevoir des événements de personnage
-@app.post("/webhook/personnage", tags=["Webhooks"])
-async def webhook_personnage(event: PersonnageEvent, background_tasks: BackgroundTasks):
+@app.post("/webhook/personnage", tags=["Webhooks"], openapi_extra=CORPS_EVENEMENT)
+async def webhook_personnage(request: Request):
     """
     Reçoit un événement webhook contenant des informations sur un personnage.
     Le score est utilisé pour déterminer le niveau du personnage.
+    Un réessai avec le même en-tête Idempotency-Key reçoit la réponse
+    d'origine, sans que l'événement soit enregistré ni notifié à nouveau,
+    y compris s'il arrive pendant que l'original est encore en cours.
     """
-    print(f"Événement de personnage reçu: {event.dict()}")
-    
-    # Enrichissement : ajouter un niveau en fonction du score
-    niveau = "débutant"
-    if event.score >= 90:
-        niveau = "légendaire"
-    elif event.score >= 75:
-        niveau = "expert"
-    elif event.score >= 50:
-        niveau = "intermédiaire"
-    
-    # Créer une réponse enrichie
-    response = {
-        "message": f"Événement reçu pour le personnage {event.nom}",
-        "personnage": {
-            "nom": event.nom,
-            "score": event.score,
-            "niveau": niveau
-        }
+    corps = await request.body()
+
+    cle_client = request.headers.get("idempotency-key")
+    if cle_client is not None:
+        cle = empreinte(b"cle:" + cle_client.encode("utf-8"))
+        return await avec_idempotence(cle, lambda: accepter_evenement(valider_evenement(corps)))
+
+    event = valider_evenement(corps)
+    cle = None
+    if CLE_IDEMPOTENCE_DERIVEE:
+        cle = empreinte(b"evenement:" + json.dumps([event.nom, event.score]).encode("utf-8"))
+    return await avec_idempotence(cle, lambda: accepter_evenement(event))
+
+# Schéma du corps attendu par la route de lot
+CORPS_LOT = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": LotEvenements.json_schema()}},
     }
-    
-    # Enregistrer l'événement et notifier les abonnés
-    event_to_log = response["personnage"]
-    background_tasks.add_task(log_event, event_to_log)
-    background_tasks.add_task(notify_subscribers, event_to_log)
-    
-    return response
+}
+
+# Route webhook pour recevoir un lot d'événements de personnage
+@app.post("/webhook/personnages", tags=["Webhooks"], openapi_extra=CORPS_LOT)
+async def webhook_personnages(request: Request):
+    """
+    Reçoit un tableau d'événements (au plus TAILLE_MAX_LOT). Le lot est
+    validé et classé en une fois, ajouté au log en une seule écriture et
+    transmis aux notifications comme un seul lot.
+    Accepte aussi l'en-tête Idempotency-Key, pour le lot entier.
+    """
+    corps = await request.body()
+
+    async def traitement() -> JSONResponse:
+        events = valider_lot(corps)
+        if len(events) > TAILLE_MAX_LOT:
+            raise HTTPException(status_code=413, detail=f"Lot trop grand: {len(events)} événements (maximum {TAILLE_MAX_LOT})")
+
+        personnages = [enrichir_evenement(event) for event in events]
+        if personnages:
+            await confier_evenements(personnages)
+
+        return JSONResponse({
+            "message": f"{len(personnages)} événement(s) reçu(s)",
+            "personnages": personnages
+        })
+
+    cle = None
+    cle_client = request.headers.get("idempotency-key")
+    if cle_client is not None:
+        cle = empreinte(b"lot:" + cle_client.encode("utf-8"))
+    return await avec_idempotence(cle, traitement)
+
+# Route pour consulter l'état de la file persistante
+@app.get("/webhook/outbox", tags=["Webhooks"])
+async def get_outbox():
+    """
+    Renvoie le nombre d'événements écrits, traités et en attente dans
+    l'outbox, les échecs d'écriture et de traitement, les lots en attente
+    d'un nouvel essai, les événements mis de côté après des échecs répétés,
+    et la taille moyenne des groupes écrits par transaction.
+    """
+    if outbox is None:
+        return {"active": False}
+    return {"active": True, **outbox.statistiques()}
+
+# Route pour consulter la charge du travail en arrière-plan
+@app.get("/webhook/charge", tags=["Webhooks"])
+async def get_charge():
+    """
+    Renvoie la profondeur de la file de travail (outbox ou pool en mémoire),
+    sa limite et le nombre d'événements refusés pour surcharge, ainsi que
+    l'état de la file du journal (messages en attente, perdus, répétitions ignorées).
+    """
+    if outbox is not None:
+        statistiques = outbox.statistiques()
+        return {
+            "mode": "outbox",
+            "en_attente": statistiques["en_attente"],
+            "profondeur_max": statistiques["profondeur_max"],
+            "acceptes": statistiques["acceptes"],
+            "rejetes": statistiques["rejetes"],
+            "traites": statistiques["traites"],
+            "journal": statistiques_journal(),
+        }
+    return {"mode": "memoire", **pool_travail.statistiques(), "journal": statistiques_journal()}
+
+# Route pour consulter l'efficacité du cache d'idempotence
+@app.get("/webhook/idempotence", tags=["Webhooks"])
+async def get_idempotence():
+    """
+    Renvoie le nombre d'entrées, le taux de réessais reconnus, les évictions,
+    les octets de réponses gardés (et leur budget) et la mémoire estimée du
+    cache d'idempotence.
+    """
+    return cache_idempotence.statistiques()
+
+# Nombre maximal d'événements traités (et acquittés) ensemble sur le canal WebSocket
+TAILLE_LOT_WS = 256
+
+# Canal WebSocket d'ingestion pour les producteurs à haut débit
+@app.websocket("/webhook/ws")
+async def webhook_ws(websocket: WebSocket):
+    """
+    Reçoit un flux de messages PersonnageEvent (un objet JSON par message) sur
+    une connexion persistante. Les messages arrivés ensemble sont validés comme
+    sur POST /webhook/personnage, publiés en un lot, puis acquittés par un seul
+    message {"ack": n, "acceptes": k, "erreurs": [...]} où n est le nombre de
+    messages reçus depuis l'ouverture de la connexion.
+    """
+    await websocket.accept()
+    file: asyncio.Queue = asyncio.Queue(maxsize=4 * TAILLE_LOT_WS)
+
+    # Lecture en continu pendant le traitement du lot précédent
+    async def lire():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                await file.put(None)
+                return
+            await file.put(message.get("text") or message.get("bytes") or b"")
+
+    lecteur = asyncio.create_task(lire())
+    recus = 0
+    try:
+        while True:
+            messages = [await file.get()]
+            while len(messages) < TAILLE_LOT_WS and not file.empty():
+                messages.append(file.get_nowait())
+
+            lot, erreurs, termine = [], [], False
+            for corps in messages:
+                if corps is None:
+                    termine = True
+                    break
+                recus += 1
+                try:
+                    lot.append(enrichir_evenement(valider_evenement(corps)))
+                except RequestValidationError as e:
+                    erreurs.append({
+                        "message": recus,
+                        "erreurs": [{"loc": list(erreur["loc"]), "msg": erreur["msg"], "type": erreur["type"]} for erreur in e.errors()],
+                    })
+
+            if lot:
+                # Pas de refus sur ce canal : la fenêtre du producteur attend
+                # l'acquittement, qui attend que la file redescende
+                if outbox is not None:
+                    while outbox.en_attente() >= outbox.profondeur_max:
+                        await asyncio.sleep(0.05)
+                    await outbox.ajouter(lot, limiter=False)
+                else:
+                    while pool_travail.en_attente >= pool_travail.profondeur_max:
+                        await asyncio.sleep(0.05)
+                    # Acquitté une fois traité par le pool (compté dans /webhook/charge)
+                    await pool_travail.executer(publier_lot, lot, poids=len(lot), limiter=False)
+            if termine:
+                return
+            await websocket.send_json({"ack": recus, "acceptes": len(lot), "erreurs": erreurs})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        lecteur.cancel()
+
+# Route pour consulter le classement des personnages
+@app.get("/leaderboard", tags=["Classement"])
+async def get_leaderboard(
+    k: int = Query(10, ge=1, le=1000, description="Nombre de personnages"),
+    niveau: Optional[str] = Query(None, description="Niveau (débutant, intermédiaire, expert, légendaire)"),
+):
+    """
+    Renvoie les k meilleurs personnages (meilleur score de chacun), au total
+    ou pour un niveau. Le classement est mis à jour à chaque événement webhook.
+    """
+    return classement.top(k, niveau)
+
+# Route pour consulter le rang d'un personnage
+@app.get("/leaderboard/{nom}", tags=["Classement"])
+async def get_leaderboard_personnage(nom: str):
+    """
+    Renvoie le meilleur score d'un personnage et son rang, au total et dans son niveau.
+    """
+    position = classement.position(nom)
+    if position is None:
+        raise HTTPException(status_code=404, detail="Personnage absent du classement")
+    return position
+
+# Route pour suivre les événements en direct (Server-Sent Events)
+@app.get("/events/stream", tags=["Événements"])
+async def events_stream(request: Request, last_event_id: Optional[str] = Query(None)):
+    """
+    Flux SSE des événements traités (nom, score, niveau, badge).
+    Après une coupure, le client reprend où il en était grâce à l'en-tête
+    Last-Event-ID (ou au paramètre last_event_id), dans la limite de l'historique.
+    Si cet identifiant est inconnu (redémarrage du serveur, historique
+    dépassé), le flux commence par un événement "reset" : le client doit
+    recharger son état. Un client trop lent pour suivre le flux est déconnecté.
+    """
+    dernier_id = lire_identifiant(request.headers.get("last-event-id") or last_event_id)
+    abonne, rattrapage = diffusion.abonner(dernier_id)
+
+    async def flux():
+        try:
+            yield b"retry: 2000\n\n"
+            for message in rattrapage:
+                yield message.sse
+            while True:
+                message = await abonne.suivant()
+                yield message.sse if message is not None else b": ping\n\n"
+        except ConnectionResetError:
+            return
+        finally:
+            diffusion.desabonner(abonne)
+
+    return StreamingResponse(
+        flux(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Route pour consulter les débits d'événements sur fenêtres glissantes
+@app.get("/events/rates", tags=["Événements"])
+async def events_rates():
+    """
+    Renvoie, pour la dernière minute, les 5 et les 60 dernières minutes, le
+    nombre d'événements traités et leur débit par minute (au total et par
+    niveau), la distribution des scores par tranche de 10 points et le score
+    moyen. Les compteurs sont tenus en mémoire à chaque événement : le coût
+    ne dépend pas de la taille du journal. Ils repartent de zéro au démarrage.
+    """
+    return taux_evenements.statistiques()
+
+# Route WebSocket équivalente au flux SSE
+@app.websocket("/events/ws")
+async def events_ws(websocket: WebSocket, last_event_id: Optional[str] = None):
+    """
+    Même flux que /events/stream, en messages JSON {"id", "type", "donnees"}
+    (type "reset" si last_event_id est inconnu).
+    """
+    await websocket.accept()
+    abonne, rattrapage = diffusion.abonner(lire_identifiant(last_event_id))
+    try:
+        for message in rattrapage:
+            await websocket.send_text(message.texte)
+        while True:
+            message = await abonne.suivant()
+            if message is not None:
+                await websocket.send_text(message.texte)
+    except ConnectionResetError:
+        await websocket.close(code=1008, reason="client trop lent")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        diffusion.desabonner(abonne)
 
 # Route pour s'abonner ou se désabonner aux notifications
 @app.post("/subscribe", tags=["Notifications"])
@@ -240,6 +907,27 @@ async def get_subscriptions():
         "subscriptions": subscriptions
     }
 
+# Route pour consulter les voies de notification
+@app.get("/notifications/voies", tags=["Notifications"])
+async def get_voies_notifications():
+    """
+    Renvoie, pour chaque voie de priorité, son poids, les notifications en
+    attente, envoyées et abandonnées, et les latences récentes (p50, p99,
+    max, part dans la cible) entre l'acceptation et l'écriture dans le puits
+    "notifier" (une mesure par événement), regroupement compris.
+    """
+    return ordonnanceur_notifications.statistiques()
+
+# Route pour consulter le regroupement des notifications par puits
+@app.get("/notifications/puits", tags=["Notifications"])
+async def get_puits_notifications():
+    """
+    Renvoie, pour chaque puits (console, fichier, /notifier, webhook), sa
+    fenêtre de regroupement, le nombre d'événements reçus, de notifications
+    envoyées et d'appels au puits, et la part d'événements regroupés.
+    """
+    return {nom: coalesceur.statistiques() for nom, coalesceur in puits_notifications.items()}
+
 # Route pour générer un badge
 @app.get("/notifier", tags=["Notifications"])
 async def notifier(nom: Optional[str] = None, niveau: Optional[str] = None):
@@ -249,17 +937,8 @@ async def notifier(nom: Optional[str] = None, niveau: Optional[str] = None):
     """
     if nom and niveau:
         # Formatage du badge en fonction du niveau
-        badge = "🔶"  # Badge par défaut
-        
-        if niveau == "légendaire":
-            badge = "⭐⭐⭐ LÉGENDAIRE ⭐⭐⭐"
-        elif niveau == "expert":
-            badge = "🥇 EXPERT 🥇"
-        elif niveau == "intermédiaire":
-            badge = "🔹 INTERMÉDIAIRE 🔹"
-        elif niveau == "débutant":
-            badge = "🔸 DÉBUTANT 🔸"
-        
+        badge = calculer_badge(niveau)
+
         return {
             "badge": badge,
             "message": f"Notification badge: {nom} a atteint le niveau {niveau}!",
@@ -282,27 +961,158 @@ async def traiter_personnage(personnage: PersonnageTraitement):
     Returns:
         Personnage enrichi avec un niveau calculé
     """
-    # Calcul du niveau en fonction du score
-    niveau = "débutant"
-    if personnage.score >= 90:
-        niveau = "légendaire"
-    elif personnage.score >= 75:
-        niveau = "expert"
-    elif personnage.score >= 50:
-        niveau = "intermédiaire"
-    
-    # Créer la réponse enrichie
-    response = {
-        "nom": personnage.nom,
-        "score": personnage.score,
-        "niveau": niveau
+    return traiter(personnage)
+
+# Jobs de traitement : gros volumes (JSON ou NDJSON) traités en arrière-plan
+# par un pool de processus, avec progression et résultats en flux
+gestionnaire_jobs = GestionnaireJobs(traiter_morceau)
+
+@app.on_event("startup")
+async def demarrer_jobs():
+    gestionnaire_jobs.demarrer()
+
+@app.on_event("shutdown")
+async def arreter_jobs():
+    await gestionnaire_jobs.arreter()
+
+# Fonction pour retrouver un job du client
+def job_du_client(id: str, token: str):
+    job = gestionnaire_jobs.jobs.get(id)
+    client = registre_cles.client(token)
+    if job is None or (job.proprietaire != client.nom and not client.admin):
+        raise HTTPException(status_code=404, detail="Job non trouvé")
+    return job
+
+# Fonction pour lire l'entrée d'un job selon son type de contenu
+async def morceaux_entree(request: Request):
+    type_contenu = request.headers.get("content-type", "").split(";")[0].strip()
+    if type_contenu == "multipart/form-data":
+        formulaire = await request.form()
+        fichier = formulaire.get("fichier")
+        if fichier is None or isinstance(fichier, str):
+            raise HTTPException(status_code=400, detail="Champ 'fichier' (NDJSON) manquant")
+        while morceau := await fichier.read(1 << 20):
+            yield morceau
+    elif type_contenu in ("application/x-ndjson", "application/jsonl"):
+        async for morceau in request.stream():
+            yield morceau
+    else:
+        # Tableau JSON : converti en NDJSON (une ligne par personnage)
+        try:
+            personnages = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Corps JSON invalide")
+        if not isinstance(personnages, list):
+            raise HTTPException(status_code=400, detail="Un tableau JSON de personnages est attendu")
+        yield "".join(json.dumps(p, ensure_ascii=False) + "\n" for p in personnages).encode("utf-8")
+
+# Endpoint pour créer un job de traitement
+@app.post("/traitement/jobs", status_code=202, tags=["Traitement"])
+async def creer_job(request: Request, token: str = Depends(verifier_token)):
+    """
+    Crée un job de traitement et renvoie immédiatement son identifiant.
+    L'entrée est un tableau JSON de personnages, un corps NDJSON
+    (Content-Type: application/x-ndjson) ou un fichier NDJSON envoyé en
+    multipart/form-data (champ "fichier"). Chaque ligne reçoit le même
+    traitement que POST /traitement.
+    Nécessite un token d'authentification valide dans l'en-tête.
+    """
+    try:
+        job = gestionnaire_jobs.creer(registre_cles.client(token).nom)
+    except Surcharge as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Trop de jobs en cours, réessayer plus tard",
+            headers={"Retry-After": str(e.delai)},
+        )
+    try:
+        await gestionnaire_jobs.recevoir(job, morceaux_entree(request))
+    except EntreeTropVolumineuse as e:
+        gestionnaire_jobs.supprimer(job)
+        raise HTTPException(status_code=413, detail=str(e))
+    except BaseException:
+        gestionnaire_jobs.supprimer(job)
+        raise
+    gestionnaire_jobs.lancer(job)
+    return {
+        **job.statut(),
+        "statut": f"/traitement/jobs/{job.identifiant}",
+        "resultats": f"/traitement/jobs/{job.identifiant}/results",
     }
-    
-    # Inclure le score_double si présent
-    if personnage.score_double is not None:
-        response["score_double"] = personnage.score_double
-    
-    return response
+
+# Endpoint pour lister les jobs du client
+@app.get("/traitement/jobs", tags=["Traitement"])
+async def lister_jobs(token: str = Depends(verifier_token)):
+    """
+    Liste les jobs du client (tous les jobs pour une clé admin), et la
+    capacité du gestionnaire.
+    Nécessite un token d'authentification valide dans l'en-tête.
+    """
+    client = registre_cles.client(token)
+    return {
+        **gestionnaire_jobs.statistiques(),
+        "liste": [
+            job.statut() for job in gestionnaire_jobs.jobs.values()
+            if job.proprietaire == client.nom or client.admin
+        ],
+    }
+
+# Endpoint pour suivre la progression d'un job
+@app.get("/traitement/jobs/{id}", tags=["Traitement"])
+async def get_job(id: str, token: str = Depends(verifier_token)):
+    """
+    Renvoie l'état d'un job : en_attente, en_cours, termine, annule ou
+    echec, sa progression (part de l'entrée traitée) et le nombre d'erreurs.
+    Nécessite un token d'authentification valide dans l'en-tête.
+    """
+    return job_du_client(id, token).statut()
+
+# Endpoint pour récupérer les résultats d'un job en flux
+@app.get("/traitement/jobs/{id}/results", tags=["Traitement"])
+async def get_resultats_job(
+    id: str,
+    suivre: bool = Query(True, description="Attend les résultats suivants tant que le job n'est pas terminé"),
+    token: str = Depends(verifier_token),
+):
+    """
+    Envoie les résultats en NDJSON, dans l'ordre de l'entrée : un personnage
+    enrichi par ligne, ou {"ligne": n, "erreur": [...]} pour une ligne invalide.
+    Les résultats déjà produits sont envoyés pendant que le job se poursuit.
+    Nécessite un token d'authentification valide dans l'en-tête.
+    """
+    job = job_du_client(id, token)
+    return StreamingResponse(
+        gestionnaire_jobs.lire_resultats(job, suivre),
+        media_type="application/x-ndjson",
+        headers={"X-Job-Etat": job.etat},
+    )
+
+# Endpoint pour annuler un job
+@app.delete("/traitement/jobs/{id}", tags=["Traitement"])
+async def annuler_job(id: str, token: str = Depends(verifier_token)):
+    """
+    Annule un job en attente ou en cours ; les résultats déjà produits
+    restent disponibles.
+    Nécessite un token d'authentification valide dans l'en-tête.
+    """
+    job = job_du_client(id, token)
+    gestionnaire_jobs.annuler(job)
+    return job.statut()
+
+# Endpoint GET pour l'usage par client et par route
+@app.get("/admin/usage", tags=["Administration"])
+async def get_usage(
+    tri: str = Query("duree", pattern=f"^({'|'.join(TRIS)})$", description="requetes, erreurs, octets ou duree"),
+    route: Optional[str] = Query(None, description="Préfixe de route (ex: /webhook)"),
+    limite: int = Query(20, ge=1, le=1000, description="Nombre de lignes"),
+    token: str = Depends(verifier_admin),
+):
+    """
+    Renvoie les couples (client, route) les plus consommateurs, avec leur
+    part du total de la route (requêtes, octets envoyés ou durée cumulée).
+    Nécessite un token d'administration dans l'en-tête.
+    """
+    return await run_in_threadpool(compteur_usage.rapport, tri, route, limite)
 
 # Page d'accueil
 @app.get("/", tags=["Accueil"])
@@ -315,9 +1125,25 @@ async def root():
         "endpoints": {
             "personnages": "GET /personnages - Nécessite un token",
             "webhook": "POST /webhook/personnage - Pour recevoir des événements",
+            "webhook_lot": "POST /webhook/personnages - Pour recevoir un lot d'événements",
+            "webhook_charge": "GET /webhook/charge - Profondeur de la file de travail et événements refusés",
+            "webhook_outbox": "GET /webhook/outbox - État de la file persistante",
+            "webhook_idempotence": "GET /webhook/idempotence - Statistiques de déduplication",
+            "webhook_ws": "WS /webhook/ws - Ingestion continue d'événements, acquittés par lots",
+            "events_stream": "GET /events/stream - Flux SSE des événements (Last-Event-ID)",
+            "events_ws": "WS /events/ws - Flux WebSocket des événements",
+            "events_rates": "GET /events/rates - Débits et scores sur 1 min, 5 min et 1 h",
+            "leaderboard": "GET /leaderboard?k=&niveau= - Classement des personnages",
+            "leaderboard_personnage": "GET /leaderboard/{nom} - Rang d'un personnage",
             "subscribe": "GET/POST /subscribe - Gérer les abonnements",
+            "notifications_voies": "GET /notifications/voies - Latence des notifications par niveau",
+            "notifications_puits": "GET /notifications/puits - Regroupement des notifications par puits",
             "notifier": "GET /notifier - Générer un badge",
-            "traitement": "POST /traitement - Traiter des personnages"
+            "traitement": "POST /traitement - Traiter des personnages",
+            "traitement_jobs": "POST /traitement/jobs - Traiter un gros volume (JSON, NDJSON ou fichier) en arrière-plan (token)",
+            "traitement_job": "GET/DELETE /traitement/jobs/{id} - Progression ou annulation d'un job (token)",
+            "traitement_resultats": "GET /traitement/jobs/{id}/results - Résultats d'un job en flux NDJSON (token)",
+            "usage": "GET /admin/usage?tri=&route=&limite= - Usage par client et par route (token admin)"
         }
     }
 
@@ -0,0 +1,212 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+journal = logging.getLogger(__name__)
+
+# Événements envoyés ensemble à chaque tour (une voie à la fois)
+TAILLE_LOT = 20
+
+# Événements en attente par voie ; au-delà, les nouveaux de cette voie sont abandonnés
+PROFONDEUR_VOIE = 10_000
+
+# Nombre de latences récentes gardées par voie pour les percentiles
+FENETRE_LATENCES = 2048
+
+
+# Fonction pour lire "nom=valeur,..." (poids ou cibles par voie) ; les éléments invalides sont ignorés
+def lire_valeurs_voies(texte: str) -> Dict[str, float]:
+    valeurs = {}
+    for element in texte.split(","):
+        nom, _, valeur = element.partition("=")
+        if not element.strip():
+            continue
+        try:
+            if not nom.strip():
+                raise ValueError("nom manquant")
+            valeurs[nom.strip()] = float(valeur)
+        except ValueError as e:
+            journal.warning("Élément de configuration ignoré %r: %s", element.strip(), e)
+    return valeurs
+
+
+def _percentile(valeurs: List[float], p: float) -> Optional[float]:
+    if not valeurs:
+        return None
+    return round(valeurs[min(len(valeurs) - 1, int(len(valeurs) * p))], 3)
+
+
+class Voie:
+    """
+    File d'attente d'une priorité, avec ses compteurs et ses latences récentes.
+    """
+
+    def __init__(self, nom: str, poids: float, cible_ms: Optional[float]):
+        self.nom = nom
+        self.poids = poids
+        self.cible_ms = cible_ms
+        self.file: Deque[Tuple[float, Dict[str, Any]]] = deque()  # (instant d'arrivée, événement)
+        self.credit = 0.0
+        self.recus = 0
+        self.envoyes = 0
+        self.abandonnes = 0
+        self.latences: Deque[float] = deque(maxlen=FENETRE_LATENCES)
+
+    def statistiques(self) -> Dict[str, Any]:
+        latences = sorted(self.latences)
+        return {
+            "poids": self.poids,
+            "en_attente": len(self.file),
+            "recus": self.recus,
+            "envoyes": self.envoyes,
+            "abandonnes": self.abandonnes,
+            "latence_p50_ms": _percentile(latences, 0.50),
+            "latence_p99_ms": _percentile(latences, 0.99),
+            "latence_max_ms": round(latences[-1], 3) if latences else None,
+            "cible_ms": self.cible_ms,
+            "dans_cible": (
+                round(sum(1 for latence in latences if latence <= self.cible_ms) / len(latences), 4)
+                if latences and self.cible_ms is not None else None
+            ),
+        }
+
+
+class OrdonnanceurVoies:
+    """
+    Répartit les événements dans des voies selon leur priorité (par exemple
+    le niveau) et les envoie depuis un thread dédié, voie par voie, en
+    tourniquet pondéré lissé : parmi les voies non vides, chacune est servie
+    en proportion de son poids. Les voies prioritaires passent devant sans
+    bloquer les autres, qui continuent d'avancer même en surcharge.
+
+    La latence d'une voie est mesurée de l'arrivée à la fin d'envoyer ; avec
+    livraison_par_puits, elle l'est quand le puits appelle livrer, une fois
+    les événements réellement écrits (éventuellement plus tard, après un
+    regroupement). envoyer reçoit pour cela les instants d'arrivée.
+
+    Args:
+        envoyer: Fonction appelée avec chaque lot d'une même voie et les
+            instants d'arrivée (time.perf_counter) de ses événements
+        priorite: Fonction donnant le nom de la voie d'un événement
+        poids: Poids (positif) de chaque voie ; une voie inconnue va dans la
+            dernière. Sans poids valide, une seule voie "defaut" (FIFO)
+        cibles_ms: Latence visée par voie (indicateur de dans_cible)
+        livraison_par_puits: True si le puits appelle livrer
+    """
+
+    def __init__(
+        self,
+        envoyer: Callable[[List[Dict[str, Any]], List[float]], None],
+        priorite: Callable[[Dict[str, Any]], str],
+        poids: Dict[str, float],
+        cibles_ms: Optional[Dict[str, float]] = None,
+        taille_lot: int = TAILLE_LOT,
+        profondeur_voie: int = PROFONDEUR_VOIE,
+        livraison_par_puits: bool = False,
+    ):
+        self.envoyer = envoyer
+        self.priorite = priorite
+        self.taille_lot = taille_lot
+        self.profondeur_voie = profondeur_voie
+        self.livraison_par_puits = livraison_par_puits
+        cibles_ms = cibles_ms or {}
+        invalides = [nom for nom, p in poids.items() if not p > 0]
+        if invalides:
+            journal.warning("Voies ignorées (poids non positif): %s", ", ".join(invalides))
+        poids = {nom: p for nom, p in poids.items() if p > 0}
+        if not poids:
+            journal.warning("Aucun poids de voie valide, voie unique utilisée")
+            poids = {"defaut": 1.0}
+        self.voies: Dict[str, Voie] = {nom: Voie(nom, p, cibles_ms.get(nom)) for nom, p in poids.items()}
+        self._defaut = list(self.voies.values())[-1]
+        self._condition = threading.Condition()
+        self._arret = False
+        self._thread: Optional[threading.Thread] = None
+
+    def demarrer(self) -> None:
+        self._arret = False
+        self._thread = threading.Thread(target=self._boucle, name="notifications", daemon=True)
+        self._thread.start()
+
+    def arreter(self) -> None:
+        """
+        Arrête le thread après avoir envoyé les événements déjà en attente.
+        """
+        with self._condition:
+            self._arret = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def soumettre(self, evenements: List[Dict[str, Any]]) -> None:
+        maintenant = time.perf_counter()
+        with self._condition:
+            for evenement in evenements:
+                voie = self.voies.get(self.priorite(evenement), self._defaut)
+                voie.recus += 1
+                if len(voie.file) >= self.profondeur_voie:
+                    voie.abandonnes += 1
+                    continue
+                voie.file.append((maintenant, evenement))
+            self._condition.notify()
+
+    def _choisir(self) -> Optional[Voie]:
+        """
+        Tourniquet pondéré lissé : chaque voie non vide gagne son poids en
+        crédit, la plus créditée est servie et perd le total distribué.
+        """
+        actives = []
+        for voie in self.voies.values():
+            if voie.file:
+                actives.append(voie)
+            else:
+                voie.credit = 0.0  # une voie qui revient ne rattrape pas son absence
+        if not actives:
+            return None
+        total = 0.0
+        for voie in actives:
+            voie.credit += voie.poids
+            total += voie.poids
+        choisie = max(actives, key=lambda voie: voie.credit)
+        choisie.credit -= total
+        return choisie
+
+    def _boucle(self) -> None:
+        while True:
+            with self._condition:
+                voie = self._choisir()
+                while voie is None:
+                    if self._arret:
+                        return
+                    self._condition.wait()
+                    voie = self._choisir()
+                lot = [voie.file.popleft() for _ in range(min(self.taille_lot, len(voie.file)))]
+
+            try:
+                self.envoyer([evenement for _, evenement in lot], [arrivee for arrivee, _ in lot])
+            except Exception:
+                journal.exception("Erreur lors de l'envoi des notifications (voie %s)", voie.nom)
+
+            fin = time.perf_counter()
+            with self._condition:
+                voie.envoyes += len(lot)
+                if not self.livraison_par_puits:
+                    voie.latences.extend((fin - arrivee) * 1000 for arrivee, _ in lot)
+
+    def livrer(self, evenements: List[Dict[str, Any]], arrivees: List[float]) -> None:
+        """
+        Enregistre la latence d'événements écrits dans un puits, depuis leur
+        arrivée dans leur voie (appelée par le puits, depuis n'importe quel thread).
+        """
+        fin = time.perf_counter()
+        with self._condition:
+            for evenement, arrivee in zip(evenements, arrivees):
+                voie = self.voies.get(self.priorite(evenement), self._defaut)
+                voie.latences.append((fin - arrivee) * 1000)
+
+    def statistiques(self) -> Dict[str, Any]:
+        with self._condition:
+            return {nom: voie.statistiques() for nom, voie in self.voies.items()}
@@ -0,0 +1,359 @@
+import asyncio
+import heapq
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from travail import PROFONDEUR_MAX, DebitMesure, Surcharge
+
+journal = logging.getLogger(__name__)
+
+# Nombre maximal d'événements écrits par transaction
+TAILLE_GROUPE = 1024
+
+# Nombre de lignes relues à la fois lors de la reprise au démarrage
+TAILLE_REPRISE = 1024
+
+# Lot dont le traitement échoue : nouvel essai après DELAI_REESSAI secondes,
+# doublé à chaque échec (au plus DELAI_REESSAI_MAX) ; après TENTATIVES_MAX
+# échecs (environ une minute), le lot est mis de côté dans la table
+# evenements_echoues
+DELAI_REESSAI = 0.5
+DELAI_REESSAI_MAX = 30.0
+TENTATIVES_MAX = 8
+
+# Lot en file : (premier id, dernier id, événements, tentatives, étape à reprendre)
+Lot = Tuple[int, int, List[Dict[str, Any]], int, int]
+
+
+class Outbox:
+    """
+    File persistante (SQLite) des événements acceptés mais pas encore traités.
+
+    Les ajouts sont regroupés par un thread d'écriture : tout ce qui arrive
+    pendant une transaction est écrit dans la suivante, en un seul commit
+    (« group commit »). L'appelant n'est acquitté qu'une fois son événement
+    écrit. Les lots écrits sont ensuite transmis aux travailleurs de
+    vidage, qui les traitent puis les suppriment de la file. Au démarrage,
+    les événements encore présents sont traités en premier.
+
+    Au-delà de profondeur_max événements acceptés et pas encore traités, les
+    ajouts sont refusés (Surcharge) plutôt que de laisser le retard croître.
+
+    Le traitement d'un lot est une suite d'étapes. Un lot dont une étape
+    échoue reste en attente et est réessayé avec un délai croissant, à
+    partir de l'étape en échec (les précédentes ne sont pas rejouées) ;
+    pendant ce délai, les travailleurs continuent sur les lots suivants, et
+    les lots dont le nouvel essai est dû passent avant eux, par ordre
+    d'identifiant. Après TENTATIVES_MAX échecs, le lot est mis de côté
+    (table evenements_echoues) et ne compte plus dans la profondeur.
+    """
+
+    def __init__(
+        self,
+        fichier: str = "outbox.db",
+        travailleurs: int = 1,
+        synchrone: str = "NORMAL",
+        profondeur_max: int = PROFONDEUR_MAX,
+    ):
+        self.fichier = fichier
+        self.travailleurs = travailleurs
+        self.profondeur_max = profondeur_max
+        self.synchrone = synchrone  # NORMAL : durable face à un arrêt du processus ; FULL : aussi face à une coupure
+        self._entrees: "queue.Queue" = queue.Queue()
+        self._a_vider: "queue.Queue" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._arret = threading.Event()
+        self._etapes: Sequence[Callable[[List[Dict[str, Any]]], None]] = ()
+        self._reessais: List[Tuple[float, int, Lot]] = []  # tas (échéance, premier id, lot)
+        self._verrou_reessais = threading.Lock()
+        self.acceptes = 0
+        self.rejetes = 0
+        self.echecs_ecriture = 0
+        self.ecrits = 0
+        self.traites = 0
+        self.echecs_traitement = 0
+        self.mis_de_cote = 0
+        self.transactions = 0
+        self.repris = 0
+        self.debit = DebitMesure()
+
+    def _connexion(self) -> sqlite3.Connection:
+        connexion = sqlite3.connect(self.fichier, isolation_level=None, check_same_thread=False)
+        connexion.execute("PRAGMA journal_mode=WAL")
+        connexion.execute(f"PRAGMA synchronous={self.synchrone}")
+        return connexion
+
+    def demarrer(self, etapes: Sequence[Callable[[List[Dict[str, Any]]], None]]) -> None:
+        """
+        Ouvre la file, planifie la reprise des événements non traités et
+        lance les threads d'écriture et de vidage.
+
+        Args:
+            etapes: Fonctions appelées dans l'ordre avec chaque lot d'événements
+                à traiter ; chacune doit pouvoir être rejouée sur un lot pour
+                lequel elle a échoué
+        """
+        self._etapes = list(etapes)
+        self._reessais = []
+        connexion = self._connexion()
+        connexion.execute(
+            "CREATE TABLE IF NOT EXISTS evenements (id INTEGER PRIMARY KEY AUTOINCREMENT, donnees TEXT NOT NULL)"
+        )
+        connexion.execute(
+            "CREATE TABLE IF NOT EXISTS evenements_echoues (id INTEGER PRIMARY KEY, donnees TEXT NOT NULL)"
+        )
+
+        # Reprise : les lignes restantes ont été acquittées mais pas traitées
+        dernier = 0
+        while True:
+            lignes = connexion.execute(
+                "SELECT id, donnees FROM evenements WHERE id > ? ORDER BY id LIMIT ?", (dernier, TAILLE_REPRISE)
+            ).fetchall()
+            if not lignes:
+                break
+            self._a_vider.put((lignes[0][0], lignes[-1][0], [json.loads(donnees) for _, donnees in lignes], 0, 0))
+            self.repris += len(lignes)
+            dernier = lignes[-1][0]
+        connexion.close()
+        if self.repris:
+            journal.info("Reprise de %d événement(s) non traité(s)", self.repris, extra={"fichier": self.fichier})
+
+        self._arret.clear()
+        self._threads = [threading.Thread(target=self._ecrire, name="outbox-ecriture", daemon=True)]
+        self._threads += [
+            threading.Thread(target=self._vider, name=f"outbox-vidage-{i}", daemon=True)
+            for i in range(self.travailleurs)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def arreter(self) -> None:
+        """
+        Termine l'écriture en cours, laisse les travailleurs vider ce qui a été
+        écrit, puis arrête les threads.
+        """
+        if not self._threads:
+            return
+        self._arret.set()  # les lots en échec restent dans la file, repris au prochain démarrage
+        self._entrees.put(None)
+        self._threads[0].join()
+        for _ in self._threads[1:]:
+            self._a_vider.put(None)
+        for thread in self._threads[1:]:
+            thread.join()
+        self._threads = []
+
+    def en_attente(self) -> int:
+        """
+        Nombre d'événements acceptés (ou repris) et pas encore traités.
+        """
+        return self.acceptes + self.repris - self.traites - self.mis_de_cote
+
+    async def ajouter(self, evenements: List[Dict[str, Any]], limiter: bool = True) -> None:
+        """
+        Ajoute des événements à la file et attend qu'ils soient écrits sur disque.
+
+        Args:
+            evenements: Événements à ajouter
+            limiter: Refuser les événements si la file est pleine
+
+        Raises:
+            Surcharge: Si limiter et que profondeur_max événements sont déjà en attente
+        """
+        en_attente = self.en_attente()
+        if limiter and en_attente and en_attente + len(evenements) > self.profondeur_max:
+            self.rejetes += len(evenements)
+            raise Surcharge(self.debit.delai(en_attente, self.travailleurs))
+        self.acceptes += len(evenements)
+        boucle = asyncio.get_running_loop()
+        ecrit = boucle.create_future()
+        self._entrees.put((evenements, boucle, ecrit))
+        await ecrit
+
+    def _ecrire(self) -> None:
+        connexion = self._connexion()
+        while True:
+            element = self._entrees.get()
+            if element is None:
+                break
+
+            # Tout ce qui est déjà en attente part dans la même transaction
+            groupe = [element]
+            nombre = len(element[0])
+            arret = False
+            while nombre < TAILLE_GROUPE:
+                try:
+                    element = self._entrees.get_nowait()
+                except queue.Empty:
+                    break
+                if element is None:
+                    arret = True
+                    break
+                groupe.append(element)
+                nombre += len(element[0])
+
+            evenements = [evenement for evenements, _, _ in groupe for evenement in evenements]
+            try:
+                connexion.execute("BEGIN")
+                connexion.executemany(
+                    "INSERT INTO evenements (donnees) VALUES (?)",
+                    [(json.dumps(evenement, ensure_ascii=False),) for evenement in evenements],
+                )
+                dernier = connexion.execute("SELECT last_insert_rowid()").fetchone()[0]
+                connexion.execute("COMMIT")
+                erreur = None
+            except sqlite3.Error as e:
+                try:
+                    connexion.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+                journal.error("Erreur lors de l'écriture: %s", e, extra={"evenements": len(evenements)})
+                erreur = e
+
+            if erreur is None:
+                self.ecrits += len(evenements)
+                self.transactions += 1
+                # Identifiants contigus : une seule transaction, un seul écrivain
+                self._a_vider.put((dernier - len(evenements) + 1, dernier, evenements, 0, 0))
+
+            for evenements_appel, boucle, ecrit in groupe:
+                if erreur is None:
+                    boucle.call_soon_threadsafe(_resoudre, ecrit, None)
+                else:
+                    boucle.call_soon_threadsafe(self._refuser, len(evenements_appel), ecrit, erreur)
+
+            if arret:
+                break
+        connexion.close()
+
+    def _refuser(self, nombre: int, ecrit: asyncio.Future, erreur: Exception) -> None:
+        """
+        Écriture échouée (sur la boucle, comme le décompte des acceptés) : les
+        événements n'ont pas été écrits, ils ne sont donc plus en attente.
+        """
+        self.acceptes -= nombre
+        self.echecs_ecriture += nombre
+        _resoudre(ecrit, erreur)
+
+    def _prochain_lot(self) -> Optional[Lot]:
+        """
+        Renvoie le lot en échec dont le nouvel essai est dû, sinon le prochain
+        lot de la file (en attendant au plus jusqu'au prochain essai), ou None
+        à l'arrêt.
+        """
+        while True:
+            attente = None
+            with self._verrou_reessais:
+                # À l'arrêt, les lots en échec ne sont plus réessayés
+                if self._reessais and not self._arret.is_set():
+                    maintenant = time.monotonic()
+                    dus = [reessai for reessai in self._reessais if reessai[0] <= maintenant]
+                    if dus:
+                        reessai = min(dus, key=lambda reessai: reessai[1])
+                        self._reessais.remove(reessai)
+                        heapq.heapify(self._reessais)
+                        return reessai[2]
+                    attente = self._reessais[0][0] - maintenant
+            try:
+                return self._a_vider.get(timeout=attente)
+            except queue.Empty:
+                continue
+
+    def _vider(self) -> None:
+        connexion = self._connexion()
+        while True:
+            lot = self._prochain_lot()
+            if lot is None:
+                break
+            premier, dernier, evenements, tentatives, etape = lot
+            debut = time.perf_counter()
+            try:
+                while etape < len(self._etapes):
+                    self._etapes[etape](evenements)
+                    etape += 1
+            except Exception as e:
+                self._echec_traitement(connexion, (premier, dernier, evenements, tentatives, etape), e)
+                continue
+            self.debit.enregistrer(len(evenements), time.perf_counter() - debut)
+            # Le lot est traité même si sa suppression échoue (il sera alors repris au prochain démarrage)
+            self.traites += len(evenements)
+            try:
+                connexion.execute("DELETE FROM evenements WHERE id BETWEEN ? AND ?", (premier, dernier))
+            except sqlite3.Error as e:
+                journal.error(
+                    "Erreur lors du marquage d'un lot, il sera repris au prochain démarrage: %s",
+                    e,
+                    extra={"premier": premier, "dernier": dernier, "evenements": len(evenements)},
+                )
+        connexion.close()
+
+    def _echec_traitement(self, connexion: sqlite3.Connection, lot: Lot, erreur: Exception) -> None:
+        """
+        Planifie un nouvel essai (à partir de l'étape en échec) d'un lot dont
+        le traitement a échoué, après un délai croissant, sans bloquer le
+        travailleur, ou le met de côté après TENTATIVES_MAX échecs. À l'arrêt,
+        le lot reste dans la file et sera repris au prochain démarrage.
+        """
+        premier, dernier, evenements, tentatives, etape = lot
+        tentatives += 1
+        self.echecs_traitement += len(evenements)
+        contexte = {
+            "premier": premier,
+            "dernier": dernier,
+            "evenements": len(evenements),
+            "tentatives": tentatives,
+            "etape": etape,
+        }
+        if tentatives >= TENTATIVES_MAX:
+            journal.error("Lot mis de côté après %d échecs: %s", tentatives, erreur, extra=contexte)
+            try:
+                connexion.execute("BEGIN")
+                connexion.execute(
+                    "INSERT OR REPLACE INTO evenements_echoues SELECT id, donnees FROM evenements WHERE id BETWEEN ? AND ?",
+                    (premier, dernier),
+                )
+                connexion.execute("DELETE FROM evenements WHERE id BETWEEN ? AND ?", (premier, dernier))
+                connexion.execute("COMMIT")
+            except sqlite3.Error as e:
+                try:
+                    connexion.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+                journal.error("Erreur lors de la mise de côté d'un lot: %s", e, extra=contexte)
+            self.mis_de_cote += len(evenements)
+            return
+        delai = min(DELAI_REESSAI * 2 ** (tentatives - 1), DELAI_REESSAI_MAX)
+        journal.error("Erreur lors du traitement d'un lot, nouvel essai dans %.1f s: %s", delai, erreur, extra=contexte)
+        with self._verrou_reessais:
+            heapq.heappush(self._reessais, (time.monotonic() + delai, premier, (premier, dernier, evenements, tentatives, etape)))
+
+    def statistiques(self) -> Dict[str, Any]:
+        return {
+            "acceptes": self.acceptes,
+            "rejetes": self.rejetes,
+            "echecs_ecriture": self.echecs_ecriture,
+            "ecrits": self.ecrits,
+            "traites": self.traites,
+            "echecs_traitement": self.echecs_traitement,
+            "mis_de_cote": self.mis_de_cote,
+            "en_reessai": len(self._reessais),
+            "en_attente": self.en_attente(),
+            "profondeur_max": self.profondeur_max,
+            "transactions": self.transactions,
+            "evenements_par_transaction": round(self.ecrits / self.transactions, 2) if self.transactions else None,
+            "repris_au_demarrage": self.repris,
+        }
+
+
+def _resoudre(futur: asyncio.Future, erreur: Optional[Exception]) -> None:
+    if futur.done():
+        return
+    if erreur is None:
+        futur.set_result(None)
+    else:
+        futur.set_exception(erreur)
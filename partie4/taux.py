@@ -0,0 +1,109 @@
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+# Largeur d'un seau (secondes) et durée couverte par l'anneau (secondes)
+LARGEUR_SEAU = 5
+DUREE_MAX = 3600
+
+# Fenêtres exposées (nom -> secondes)
+FENETRES = {"1m": 60, "5m": 300, "1h": 3600}
+
+# Histogramme des scores : tranches de 10 points (0-9, ..., 90-99, puis 100 et plus)
+TRANCHES = [f"{debut}-{debut + 9}" for debut in range(0, 100, 10)] + ["100+"]
+
+
+def _tranche(score: int) -> int:
+    return min(max(score, 0) // 10, len(TRANCHES) - 1)
+
+
+class CompteursGlissants:
+    """
+    Compteurs d'événements sur des fenêtres glissantes, en mémoire fixe :
+    un anneau de seaux de LARGEUR_SEAU secondes (DUREE_MAX au total),
+    chacun avec le nombre d'événements par niveau, l'histogramme des scores
+    et leur somme. Un événement met à jour un seul seau (O(1)) ; un seau
+    est remis à zéro quand l'anneau repasse dessus. Une lecture additionne
+    les seaux de la fenêtre, sans jamais relire le journal.
+
+    Les seaux sont repérés sur une horloge monotone : un recalage de
+    l'heure système (NTP, changement manuel) ne vide ni ne fige l'anneau.
+    """
+
+    def __init__(
+        self,
+        niveaux: Sequence[str],
+        largeur: int = LARGEUR_SEAU,
+        duree_max: int = DUREE_MAX,
+        horloge=time.monotonic,
+    ):
+        self.niveaux = list(niveaux)
+        self.largeur = largeur
+        self.nombre_seaux = duree_max // largeur
+        self.horloge = horloge
+        self.debut = horloge()
+        self._indices_niveaux = {niveau: i for i, niveau in enumerate(self.niveaux)}
+        # Par seau : [niveau 0, ..., niveau n-1, autres] puis tranches, puis somme des scores
+        self._taille = len(self.niveaux) + 1 + len(TRANCHES) + 1
+        self._seaux: List[List[int]] = [[0] * self._taille for _ in range(self.nombre_seaux)]
+        self._numeros: List[int] = [-1] * self.nombre_seaux  # numéro absolu du seau occupant chaque case
+        self._verrou = threading.Lock()
+
+    def _seau(self, numero: int) -> List[int]:
+        case = numero % self.nombre_seaux
+        if self._numeros[case] != numero:
+            self._seaux[case] = [0] * self._taille
+            self._numeros[case] = numero
+        return self._seaux[case]
+
+    def ajouter(self, evenements: Iterable[Dict[str, Any]]) -> None:
+        """
+        Compte des événements traités (avec "niveau" et "score").
+        """
+        numero = int(self.horloge() // self.largeur)
+        decalage = len(self.niveaux) + 1
+        with self._verrou:
+            seau = self._seau(numero)
+            for evenement in evenements:
+                seau[self._indices_niveaux.get(evenement.get("niveau"), len(self.niveaux))] += 1
+                seau[decalage + _tranche(evenement["score"])] += 1
+                seau[-1] += evenement["score"]
+
+    def fenetre(self, secondes: int) -> Dict[str, Any]:
+        """
+        Renvoie les compteurs des dernières secondes (arrondies au seau) :
+        nombre d'événements et débit par minute, par niveau, distribution
+        et moyenne des scores.
+        """
+        maintenant = self.horloge()
+        numero = int(maintenant // self.largeur)
+        nombre = min(max(secondes // self.largeur, 1), self.nombre_seaux)
+        totaux = [0] * self._taille
+        with self._verrou:
+            for n in range(numero - nombre + 1, numero + 1):
+                case = n % self.nombre_seaux
+                if self._numeros[case] == n:
+                    for i, valeur in enumerate(self._seaux[case]):
+                        totaux[i] += valeur
+
+        # Durée réellement couverte (seau courant entamé, démarrage récent),
+        # au moins un seau pour ne pas extrapoler quelques millisecondes
+        duree = (nombre - 1) * self.largeur + (maintenant - numero * self.largeur)
+        duree = max(min(duree, maintenant - self.debut), self.largeur)
+        par_niveau = totaux[:len(self.niveaux)]
+        total = sum(totaux[:len(self.niveaux) + 1])
+        decalage = len(self.niveaux) + 1
+        return {
+            "secondes": nombre * self.largeur,
+            "evenements": total,
+            "par_minute": round(total * 60 / duree, 2),
+            "par_niveau": {
+                niveau: {"evenements": compte, "par_minute": round(compte * 60 / duree, 2)}
+                for niveau, compte in zip(self.niveaux, par_niveau)
+            },
+            "scores": dict(zip(TRANCHES, totaux[decalage:decalage + len(TRANCHES)])),
+            "score_moyen": round(totaux[-1] / total, 2) if total else None,
+        }
+
+    def statistiques(self, fenetres: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        return {nom: self.fenetre(secondes) for nom, secondes in (fenetres or FENETRES).items()}
@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+from jobs import TERMINE, GestionnaireJobs
+from traitement import traiter_morceau
+
+
+async def executer_job(repertoire: str, processus: int, entree: bytes, taille_morceau: int = 1 << 20) -> list:
+    gestionnaire = GestionnaireJobs(
+        traiter_morceau, repertoire=repertoire, processus=processus, taille_morceau=taille_morceau
+    )
+    gestionnaire.demarrer()
+    try:
+        job = gestionnaire.creer("test")
+
+        async def morceaux():
+            yield entree
+
+        await gestionnaire.recevoir(job, morceaux())
+        gestionnaire.lancer(job)
+        await job.tache
+        assert job.etat == TERMINE, job.statut()
+        resultats = b"".join([donnees async for donnees in gestionnaire.lire_resultats(job, suivre=False)])
+        return [json.loads(ligne) for ligne in resultats.splitlines()]
+    finally:
+        await gestionnaire.arreter()
+
+
+def entree_ndjson(nombre: int) -> bytes:
+    return b"".join(
+        json.dumps({"nom": f"Personnage {i}", "score": i % 101}).encode() + b"\n" for i in range(nombre)
+    )
+
+
+# Test d'un job terminé par "\n" avec un seul processus (hôte à 1 CPU)
+def test_job_un_processus_fin_de_ligne(tmp_path):
+    resultats = asyncio.run(executer_job(str(tmp_path), 1, entree_ndjson(101)))
+    assert len(resultats) == 101
+    assert resultats[-1]["nom"] == "Personnage 100"
+
+
+# Test d'un job en plusieurs morceaux avec un seul processus
+def test_job_un_processus_plusieurs_morceaux(tmp_path):
+    resultats = asyncio.run(executer_job(str(tmp_path), 1, entree_ndjson(500), taille_morceau=1024))
+    assert [resultat["nom"] for resultat in resultats] == [f"Personnage {i}" for i in range(500)]
+
+
+# Test d'une entrée sans "\n" final
+def test_job_sans_fin_de_ligne(tmp_path):
+    resultats = asyncio.run(executer_job(str(tmp_path), 2, entree_ndjson(10).rstrip(b"\n")))
+    assert len(resultats) == 10
@@ -0,0 +1,73 @@
+import json
+from typing import List, Optional, Tuple
+
+from pydantic import BaseModel, ValidationError
+
+# Ce module ne dépend pas de main : il est importé par les processus du pool
+# des jobs de traitement sans recréer l'application.
+
+
+# Modèles du traitement
+class PersonnageTraitement(BaseModel):
+    nom: str
+    score: int
+    score_double: Optional[int] = None
+
+class PersonnageResponse(BaseModel):
+    nom: str
+    score: int
+    score_double: Optional[int] = None
+    niveau: str
+
+
+# Fonction pour calculer le niveau d'un personnage en fonction de son score
+def calculer_niveau(score: int) -> str:
+    if score >= 90:
+        return "légendaire"
+    elif score >= 75:
+        return "expert"
+    elif score >= 50:
+        return "intermédiaire"
+    return "débutant"
+
+
+# Fonction pour traiter un personnage (même résultat que POST /traitement)
+def traiter(personnage: PersonnageTraitement) -> dict:
+    resultat = {
+        "nom": personnage.nom,
+        "score": personnage.score,
+        "niveau": calculer_niveau(personnage.score),
+    }
+    if personnage.score_double is not None:
+        resultat["score_double"] = personnage.score_double
+    return resultat
+
+
+# Fonction pour traiter un morceau de fichier NDJSON (exécutée dans un processus du pool)
+def traiter_morceau(lignes: bytes, premiere_ligne: int) -> Tuple[bytes, int, int]:
+    """
+    Valide et enrichit chaque ligne d'un morceau NDJSON.
+
+    Args:
+        lignes: Lignes NDJSON (une par personnage)
+        premiere_ligne: Numéro de la première ligne du morceau dans le job
+
+    Returns:
+        Les résultats en NDJSON (une ligne par ligne d'entrée non vide, un
+        objet {"ligne", "erreur"} pour une ligne invalide, numérotée comme
+        dans le fichier), le nombre de lignes traitées et le nombre d'erreurs
+    """
+    sortie: List[str] = []
+    erreurs = 0
+    for numero, ligne in enumerate(lignes.split(b"\n"), premiere_ligne):
+        if not ligne.strip():
+            continue
+        try:
+            resultat = traiter(PersonnageTraitement.model_validate_json(ligne))
+        except ValidationError as e:
+            resultat = {"ligne": numero, "erreur": e.errors(include_url=False, include_context=False, include_input=False)}
+            erreurs += 1
+        sortie.append(json.dumps(resultat, ensure_ascii=False))
+    if not sortie:
+        return b"", 0, 0
+    return ("\n".join(sortie) + "\n").encode("utf-8"), len(sortie), erreurs
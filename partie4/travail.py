@@ -0,0 +1,185 @@
+import asyncio
+import math
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+journal = logging.getLogger(__name__)
+
+# Nombre d'événements en attente au-delà duquel les nouveaux sont refusés
+PROFONDEUR_MAX = 10_000
+
+# Bornes du délai conseillé aux clients refusés (en-tête Retry-After, secondes)
+DELAI_MIN = 1
+DELAI_MAX = 60
+
+# Poids de la dernière mesure dans la moyenne mobile du débit
+LISSAGE = 0.2
+
+
+class Surcharge(Exception):
+    """
+    Levée quand la file de travail est pleine ; delai est le nombre de
+    secondes conseillé avant un nouvel essai.
+    """
+
+    def __init__(self, delai: int):
+        super().__init__(f"File de travail pleine, réessayer dans {delai} s")
+        self.delai = delai
+
+
+class DebitMesure:
+    """
+    Débit de traitement (événements par seconde et par travailleur), en
+    moyenne mobile exponentielle, pour estimer le temps de vidage d'une file.
+    """
+
+    def __init__(self):
+        self.debit: Optional[float] = None
+        self._verrou = threading.Lock()
+
+    def enregistrer(self, nombre: int, duree: float) -> None:
+        if duree <= 0:
+            return
+        mesure = nombre / duree
+        with self._verrou:
+            self.debit = mesure if self.debit is None else (1 - LISSAGE) * self.debit + LISSAGE * mesure
+
+    def delai(self, en_attente: int, travailleurs: int) -> int:
+        """
+        Renvoie le temps estimé (secondes, borné) pour traiter en_attente événements.
+        """
+        if not self.debit:
+            return DELAI_MIN
+        secondes = en_attente / (self.debit * max(travailleurs, 1))
+        return min(DELAI_MAX, max(DELAI_MIN, math.ceil(secondes)))
+
+
+class PoolTravail:
+    """
+    Travail différé après la réponse (log, notifications), exécuté par un
+    nombre fixe de threads. La file est bornée en nombre d'événements :
+    au-delà de profondeur_max, soumettre lève Surcharge au lieu d'accepter
+    un travail qui ne pourrait pas être fait à temps.
+    """
+
+    def __init__(self, travailleurs: int = 2, profondeur_max: int = PROFONDEUR_MAX):
+        self.travailleurs = travailleurs
+        self.profondeur_max = profondeur_max
+        # (fonction, arguments, poids, fonction appelée une fois le travail compté)
+        self._file: Deque[Tuple[Callable[..., Any], tuple, int, Optional[Callable[[Optional[Exception]], None]]]] = deque()
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._arret = False
+        self.en_attente = 0  # événements soumis et pas encore traités
+        self.acceptes = 0
+        self.rejetes = 0
+        self.traites = 0
+        self.erreurs = 0
+        self.debit = DebitMesure()
+
+    def demarrer(self) -> None:
+        self._arret = False
+        self._threads = [
+            threading.Thread(target=self._travailler, name=f"travail-{i}", daemon=True)
+            for i in range(self.travailleurs)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def arreter(self) -> None:
+        """
+        Laisse les travailleurs terminer la file, puis arrête les threads.
+        """
+        with self._condition:
+            self._arret = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def soumettre(self, fonction: Callable[..., Any], *arguments: Any, poids: int = 1, limiter: bool = True) -> None:
+        """
+        Ajoute un travail à la file.
+
+        Args:
+            fonction: Fonction à exécuter dans un thread du pool
+            arguments: Arguments de la fonction
+            poids: Nombre d'événements concernés (compté dans la profondeur)
+            limiter: Refuser le travail si la file est pleine
+
+        Raises:
+            Surcharge: Si limiter et que la file contient déjà profondeur_max événements
+        """
+        self._ajouter(fonction, arguments, poids, limiter, None)
+
+    def _ajouter(self, fonction, arguments, poids, limiter, termine) -> None:
+        with self._condition:
+            if limiter and self.en_attente + poids > self.profondeur_max and self.en_attente:
+                self.rejetes += poids
+                raise Surcharge(self.debit.delai(self.en_attente, self.travailleurs))
+            self._file.append((fonction, arguments, poids, termine))
+            self.en_attente += poids
+            self.acceptes += poids
+            self._condition.notify()
+
+    async def executer(self, fonction: Callable[..., Any], *arguments: Any, poids: int = 1, limiter: bool = True) -> None:
+        """
+        Comme soumettre, depuis la boucle d'événements, mais attend que le
+        travail soit fait (son exception éventuelle est levée ici).
+        """
+        boucle = asyncio.get_running_loop()
+        fini = boucle.create_future()
+        self._ajouter(
+            fonction, arguments, poids, limiter,
+            lambda erreur: boucle.call_soon_threadsafe(_resoudre, fini, erreur),
+        )
+        await fini
+
+    def _travailler(self) -> None:
+        while True:
+            with self._condition:
+                while not self._file and not self._arret:
+                    self._condition.wait()
+                if not self._file:
+                    return
+                fonction, arguments, poids, termine = self._file.popleft()
+
+            debut = time.perf_counter()
+            erreur = None
+            try:
+                fonction(*arguments)
+            except Exception as e:
+                erreur = e
+                self.erreurs += 1
+                journal.error("Erreur lors d'un travail en arrière-plan: %s", e, extra={"poids": poids})
+            self.debit.enregistrer(poids, time.perf_counter() - debut)
+
+            with self._condition:
+                self.en_attente -= poids
+                self.traites += poids
+            if termine is not None:
+                termine(erreur)
+
+    def statistiques(self) -> Dict[str, Any]:
+        return {
+            "travailleurs": self.travailleurs,
+            "en_attente": self.en_attente,
+            "profondeur_max": self.profondeur_max,
+            "acceptes": self.acceptes,
+            "rejetes": self.rejetes,
+            "traites": self.traites,
+            "erreurs": self.erreurs,
+            "debit_par_travailleur": round(self.debit.debit, 1) if self.debit.debit else None,
+        }
+
+
+def _resoudre(futur: asyncio.Future, erreur: Optional[Exception]) -> None:
+    if futur.done():
+        return
+    if erreur is None:
+        futur.set_result(None)
+    else:
+        futur.set_exception(erreur)